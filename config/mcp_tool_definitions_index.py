@@ -33,6 +33,7 @@ class MCPToolDefinitions:
             # MCPToolDefinitions._get_execute_python_tool(),
             # MCPToolDefinitions._get_execute_bash_tool(),
             MCPToolDefinitions._get_search_code_references_tool(),
+            MCPToolDefinitions._get_search_code_references_batch_tool(),
             # MCPToolDefinitions._get_search_code_tool(),
             # MCPToolDefinitions._get_file_structure_tool(),
             # MCPToolDefinitions._get_set_workspace_tool(),
@@ -342,6 +343,48 @@ class MCPToolDefinitions:
             },
         }
 
+    @staticmethod
+    def _get_search_code_references_batch_tool() -> Dict[str, Any]:
+        """批量代码参考搜索工具定义 - 一次调用查询多个目标文件"""
+        return {
+            "name": "search_code_references_batch",
+            "description": "Search reference code for several target files in one call. Returns compact JSON with direct relationships and relevant references per target file, e.g. to prefetch references for the next files to implement.",
+            "input_schema": {
+                "type": "object",
+                "properties": {
+                    "indexes_path": {
+                        "type": "string",
+                        "description": "Path to the indexes directory containing JSON index files",
+                    },
+                    "queries": {
+                        "type": "array",
+                        "description": "One query per target file",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "target_file": {
+                                    "type": "string",
+                                    "description": "Target file path to be implemented",
+                                },
+                                "keywords": {
+                                    "type": "string",
+                                    "description": "Search keywords, comma-separated",
+                                    "default": "",
+                                },
+                            },
+                            "required": ["target_file"],
+                        },
+                    },
+                    "max_results": {
+                        "type": "integer",
+                        "description": "Maximum number of references per target file",
+                        "default": 5,
+                    },
+                },
+                "required": ["indexes_path", "queries"],
+            },
+        }
+
     @staticmethod
     def _get_get_indexes_overview_tool() -> Dict[str, Any]:
         """获取索引概览工具定义"""
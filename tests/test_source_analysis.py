@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from tools.source_analysis import excerpt_source
+
+
+def _functions(count: int) -> str:
+    return "".join(
+        f"def function_number_{i}(alpha, beta):\n"
+        + "".join(f"    value_{j} = alpha * {j} + beta\n" for j in range(15))
+        + "    return value_0\n\n"
+        for i in range(count)
+    )
+
+
+def test_excerpt_keeps_signatures_after_form_feed():
+    content = "import os\n\x0c\n" + _functions(20)
+
+    excerpt = excerpt_source(Path("module.py"), content, 1500)
+
+    assert len(excerpt) <= 1500
+    assert excerpt.count("def function_number_") == 20
+
+
+def test_excerpt_keeps_signatures_after_line_separator_in_string():
+    content = 'import os\nTEXT = "first\u2028second"\n' + _functions(20)
+
+    excerpt = excerpt_source(Path("module.py"), content, 1500)
+
+    assert len(excerpt) <= 1500
+    assert excerpt.count("def function_number_") == 20
@@ -0,0 +1,227 @@
+"""
+Adaptive Concurrency Limiter for LLM Requests
+
+Paces concurrent LLM calls with an AIMD (additive increase, multiplicative
+decrease) window, so the indexer saturates whatever rate limit the provider key
+has without per-provider tuning.
+
+Features:
+- Window grows by one request per window of successful, stable-latency calls
+  during which the window was (nearly) full, so idle or sequential phases
+  cannot inflate it untested
+- Window is cut multiplicatively on rate limits (429), timeouts and provider errors
+- One cut per congestion event: failures of requests started before the last
+  cut do not cut again
+- Max-min fair sharing of the window between tenants (e.g. repositories indexed
+  at the same time), so a large tenant cannot starve the others
+- Window size and throughput reporting through the indexer logger
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+# Latency above this multiple of the best observed latency is treated as queueing
+# at the provider, and the window stops growing
+LATENCY_TOLERANCE = 2.0
+
+# Smoothing factor of the exponentially weighted latency average
+LATENCY_SMOOTHING = 0.2
+
+# The window counts as full once this share of it is in flight; only requests
+# that overlapped a full window grow it
+WINDOW_FULL_FRACTION = 0.9
+
+
+def classify_llm_error(error: BaseException) -> str:
+    """Classify an LLM client exception as "rate_limit", "timeout" or "error" """
+    status_code = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    name = type(error).__name__.lower()
+    message = str(error).lower()
+
+    if status_code == 429 or "ratelimit" in name or "rate limit" in message:
+        return "rate_limit"
+    if (
+        isinstance(error, asyncio.TimeoutError)
+        or "timeout" in name
+        or "timed out" in message
+    ):
+        return "timeout"
+    return "error"
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD-controlled limit on the number of in-flight LLM requests"""
+
+    def __init__(
+        self,
+        initial_limit: int = 5,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease_factor: float = 0.5,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.logger = logger
+
+        self.in_flight = 0
+        # Times a request was admitted into a (nearly) full window
+        self.window_full_count = 0
+        self._tenant_in_flight: Counter = Counter()
+        self._tenant_waiting: Counter = Counter()
+        self.peak_window = self.window
+        self.completed = 0
+        self.failures = {"rate_limit": 0, "timeout": 0, "error": 0}
+        self.started_at = time.monotonic()
+
+        self._smoothed_latency: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def window(self) -> int:
+        """Current number of requests allowed in flight"""
+        return int(self.limit)
+
+    def throughput(self) -> float:
+        """Completed requests per second since the limiter was created"""
+        elapsed = time.monotonic() - self.started_at
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created on first use so the condition binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _can_start(self, tenant: Optional[str]) -> bool:
+        if self.in_flight >= self.window:
+            return False
+        # Max-min fairness: waiting tenants with the fewest requests in flight go
+        # first, so a free slot always goes to the least served tenant
+        least_served = min(
+            self._tenant_in_flight[waiting] for waiting in self._tenant_waiting
+        )
+        return self._tenant_in_flight[tenant] <= least_served
+
+    async def acquire(self, tenant: Optional[str] = None):
+        """Wait until a slot in the current window is free for the tenant"""
+        condition = self._get_condition()
+        async with condition:
+            self._tenant_waiting[tenant] += 1
+            try:
+                await condition.wait_for(lambda: self._can_start(tenant))
+            finally:
+                self._tenant_waiting[tenant] -= 1
+                if not self._tenant_waiting[tenant]:
+                    del self._tenant_waiting[tenant]
+                    # Waiters blocked behind this tenant may now be least served
+                    condition.notify_all()
+            self.in_flight += 1
+            self._tenant_in_flight[tenant] += 1
+            if self.in_flight >= self.window * WINDOW_FULL_FRACTION:
+                self.window_full_count += 1
+
+    async def release(self, tenant: Optional[str] = None):
+        """Free a tenant's slot and wake up waiting requests"""
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            self._tenant_in_flight[tenant] -= 1
+            if not self._tenant_in_flight[tenant]:
+                del self._tenant_in_flight[tenant]
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def track(self, tenant: Optional[str] = None):
+        """Hold a slot for one request and feed its outcome back into the window"""
+        window_full_count = self.window_full_count
+        await self.acquire(tenant)
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.record_failure(classify_llm_error(e), started)
+            raise
+        else:
+            self.record_success(
+                time.monotonic() - started,
+                window_full=self.window_full_count > window_full_count,
+            )
+        finally:
+            await self.release(tenant)
+
+    def record_success(self, latency: float, window_full: bool = True):
+        """
+        Additively grow the window while latency stays near its best value.
+
+        window_full tells whether the window filled up while the request was
+        in flight; successes of requests that never saw it full do not show
+        that a larger window would work, and do not grow it.
+        """
+        self.completed += 1
+
+        if self._smoothed_latency is None:
+            self._smoothed_latency = latency
+        else:
+            self._smoothed_latency += LATENCY_SMOOTHING * (
+                latency - self._smoothed_latency
+            )
+        if self._best_latency is None or self._smoothed_latency < self._best_latency:
+            self._best_latency = self._smoothed_latency
+
+        if self._smoothed_latency > self._best_latency * LATENCY_TOLERANCE:
+            return
+        if not window_full:
+            return
+
+        # One extra slot per full window of successes
+        self._set_limit(self.limit + 1.0 / max(self.limit, 1.0))
+
+    def record_failure(self, kind: str, started: float):
+        """Multiplicatively shrink the window, once per congestion event"""
+        self.failures[kind] = self.failures.get(kind, 0) + 1
+
+        # Requests already in flight at the last cut saw the same congestion
+        if started < self._last_decrease:
+            return
+
+        self._last_decrease = time.monotonic()
+        # Latency baseline is re-learned at the new window size
+        self._best_latency = self._smoothed_latency
+        self._set_limit(self.limit * self.decrease_factor, reason=kind)
+
+    def _set_limit(self, new_limit: float, reason: str = None):
+        previous_window = self.window
+        self.limit = min(max(new_limit, float(self.min_limit)), float(self.max_limit))
+        self.peak_window = max(self.peak_window, self.window)
+
+        if self.logger and self.window != previous_window:
+            cause = f" after {reason}" if reason else ""
+            self.logger.info(
+                f"Concurrency window {previous_window} -> {self.window}{cause} "
+                f"(throughput {self.throughput():.2f} req/s)"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters describing the limiter's behaviour"""
+        return {
+            "window": self.window,
+            "peak_window": self.peak_window,
+            "completed_requests": self.completed,
+            "rate_limited": self.failures.get("rate_limit", 0),
+            "timeouts": self.failures.get("timeout", 0),
+            "errors": self.failures.get("error", 0),
+            "throughput_rps": round(self.throughput(), 3),
+        }
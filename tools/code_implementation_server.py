@@ -12,13 +12,14 @@ Usage:
 python tools/code_implementation_server.py
 """
 
+import asyncio
+import functools
 import os
 import subprocess
 import json
 import sys
 import io
 from pathlib import Path
-import re
 from typing import Dict, Any, List
 import tempfile
 import shutil
@@ -40,6 +41,11 @@ if sys.stdout.encoding != "utf-8":
 # Import MCP related modules
 from mcp.server.fastmcp import FastMCP
 
+from tools.code_search import SEARCH_MAX_MATCHES, search_tree
+from tools.process_runner import SPILL_DIRECTORY_NAME, run_process
+from tools.python_worker_pool import PythonWorkerPool
+from tools.trigram_index import WorkspaceSearchIndex
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -52,6 +58,12 @@ WORKSPACE_DIR = None
 OPERATION_HISTORY = []
 CURRENT_FILES = {}
 
+# Warm interpreters for execute_python, with numpy/torch already imported
+PYTHON_WORKERS = PythonWorkerPool()
+
+# Trigram index of the workspace for search_code, built on the first search
+SEARCH_INDEX = WorkspaceSearchIndex()
+
 
 def initialize_workspace(workspace_dir: str = None):
     """
@@ -428,10 +440,12 @@ async def write_file(
             backup_path = full_path.with_suffix(full_path.suffix + ".backup")
             shutil.copy2(full_path, backup_path)
             backup_created = True
+            SEARCH_INDEX.note_written([backup_path])
 
         # Write file
         with open(full_path, "w", encoding="utf-8") as f:
             f.write(content)
+        SEARCH_INDEX.note_written([full_path])
 
         # Update current file record
         CURRENT_FILES[file_path] = {
@@ -577,10 +591,12 @@ async def write_multiple_files(
                     shutil.copy2(full_path, backup_path)
                     backup_created = True
                     results["summary"]["backups_created"] += 1
+                    SEARCH_INDEX.note_written([backup_path])
 
                 # Write file
                 with open(full_path, "w", encoding="utf-8") as f:
                     f.write(content)
+                SEARCH_INDEX.note_written([full_path])
 
                 # Calculate file metrics
                 size_bytes = len(content.encode("utf-8"))
@@ -683,6 +699,22 @@ async def write_multiple_files(
 # ==================== Code Execution Tools ====================
 
 
+def _execution_log_dir() -> Path:
+    """Where the full output of long-running commands is kept for paged reading"""
+    return WORKSPACE_DIR / SPILL_DIRECTORY_NAME
+
+
+def _timeout_output(error: subprocess.TimeoutExpired) -> Dict[str, Any]:
+    """Output a command produced before it was killed at its timeout"""
+    partial = getattr(error, "result", None)
+    if partial is None:
+        return {}
+    output = {"stdout": partial.stdout, "stderr": partial.stderr}
+    if partial.truncation:
+        output["output_truncated"] = partial.truncation
+    return output
+
+
 @mcp.tool()
 async def execute_python(code: str, timeout: int = 30) -> str:
     """
@@ -707,14 +739,12 @@ async def execute_python(code: str, timeout: int = 30) -> str:
             # Ensure workspace directory exists
             ensure_workspace_exists()
 
-            # Execute Python code
-            result = subprocess.run(
-                [sys.executable, temp_file],
+            # Execute Python code in a warm worker (cold interpreter as fallback)
+            result = await PYTHON_WORKERS.run(
+                temp_file,
                 cwd=WORKSPACE_DIR,
-                capture_output=True,
-                text=True,
                 timeout=timeout,
-                encoding="utf-8",
+                spill_dir=_execution_log_dir(),
             )
 
             execution_result = {
@@ -724,6 +754,9 @@ async def execute_python(code: str, timeout: int = 30) -> str:
                 "stderr": result.stderr,
                 "timeout": timeout,
             }
+            if result.truncation:
+                # Head and tail only; full output in the listed log files
+                execution_result["output_truncated"] = result.truncation
 
             if result.returncode != 0:
                 execution_result["message"] = "Python code execution failed"
@@ -736,6 +769,8 @@ async def execute_python(code: str, timeout: int = 30) -> str:
                     "return_code": result.returncode,
                     "stdout_length": len(result.stdout),
                     "stderr_length": len(result.stderr),
+                    "output_truncated": bool(result.truncation),
+                    "warm_start": result.warm_start,
                 },
             )
 
@@ -744,12 +779,15 @@ async def execute_python(code: str, timeout: int = 30) -> str:
         finally:
             # Clean up temporary file
             os.unlink(temp_file)
+            # The script may have changed any file in the workspace
+            SEARCH_INDEX.invalidate()
 
-    except subprocess.TimeoutExpired:
+    except subprocess.TimeoutExpired as e:
         result = {
             "status": "error",
             "message": f"Python code execution timeout ({timeout}秒)",
             "timeout": timeout,
+            **_timeout_output(e),
         }
         log_operation("execute_python_timeout", {"timeout": timeout})
         return json.dumps(result, ensure_ascii=False, indent=2)
@@ -792,16 +830,19 @@ async def execute_bash(command: str, timeout: int = 30) -> str:
         # Ensure workspace directory exists
         ensure_workspace_exists()
 
-        # Execute command
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=WORKSPACE_DIR,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            encoding="utf-8",
-        )
+        # Execute command without blocking other tool calls
+        try:
+            result = await run_process(
+                command,
+                cwd=WORKSPACE_DIR,
+                timeout=timeout,
+                shell=True,
+                spill_dir=_execution_log_dir(),
+                label="execute_bash",
+            )
+        finally:
+            # The command may have changed any file in the workspace
+            SEARCH_INDEX.invalidate()
 
         execution_result = {
             "status": "success" if result.returncode == 0 else "error",
@@ -811,6 +852,9 @@ async def execute_bash(command: str, timeout: int = 30) -> str:
             "command": command,
             "timeout": timeout,
         }
+        if result.truncation:
+            # Head and tail only; full output in the listed log files
+            execution_result["output_truncated"] = result.truncation
 
         if result.returncode != 0:
             execution_result["message"] = "Bash command execution failed"
@@ -824,17 +868,19 @@ async def execute_bash(command: str, timeout: int = 30) -> str:
                 "return_code": result.returncode,
                 "stdout_length": len(result.stdout),
                 "stderr_length": len(result.stderr),
+                "output_truncated": bool(result.truncation),
             },
         )
 
         return json.dumps(execution_result, ensure_ascii=False, indent=2)
 
-    except subprocess.TimeoutExpired:
+    except subprocess.TimeoutExpired as e:
         result = {
             "status": "error",
             "message": f"Bash command execution timeout ({timeout} seconds)",
             "command": command,
             "timeout": timeout,
+            **_timeout_output(e),
         }
         log_operation("execute_bash_timeout", {"command": command, "timeout": timeout})
         return json.dumps(result, ensure_ascii=False, indent=2)
@@ -1194,47 +1240,22 @@ async def search_code(
             }
             return json.dumps(result, ensure_ascii=False, indent=2)
 
-        import glob
-
-        # Get matching files
-        file_paths = glob.glob(str(search_path / "**" / file_pattern), recursive=True)
-
-        matches = []
-        total_files_searched = 0
-
-        for file_path in file_paths:
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    lines = f.readlines()
-
-                total_files_searched += 1
-                relative_path = os.path.relpath(file_path, search_path)
-
-                for line_num, line in enumerate(lines, 1):
-                    if use_regex:
-                        if re.search(pattern, line):
-                            matches.append(
-                                {
-                                    "file": relative_path,
-                                    "line_number": line_num,
-                                    "line_content": line.strip(),
-                                    "match_type": "regex",
-                                }
-                            )
-                    else:
-                        if pattern.lower() in line.lower():
-                            matches.append(
-                                {
-                                    "file": relative_path,
-                                    "line_number": line_num,
-                                    "line_content": line.strip(),
-                                    "match_type": "substring",
-                                }
-                            )
-
-            except Exception as e:
-                logger.warning(f"Error searching file {file_path}: {e}")
-                continue
+        # The workspace is searched through its trigram index once that is
+        # built; other directories are scanned. Both run off the event loop
+        use_index = search_path.resolve() == WORKSPACE_DIR
+        search = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                SEARCH_INDEX.search if use_index else search_tree,
+                search_path,
+                pattern,
+                file_pattern=file_pattern,
+                use_regex=use_regex,
+                max_matches=SEARCH_MAX_MATCHES,
+            ),
+        )
+        matches = search.matches
+        total_files_searched = search.files_searched
 
         result = {
             "status": "success",
@@ -1244,11 +1265,15 @@ async def search_code(
             "search_directory": str(search_path),
             "total_matches": len(matches),
             "total_files_searched": total_files_searched,
-            "matches": matches[:50],  # 限制返回前50个匹配
+            "matches": matches,
         }
 
-        if len(matches) > 50:
-            result["note"] = f"显示前50个匹配，总共找到{len(matches)}个匹配"
+        if search.limit_reached:
+            result["note"] = (
+                f"显示前{SEARCH_MAX_MATCHES}个匹配，已停止搜索，可能还有更多匹配 / "
+                f"Showing the first {SEARCH_MAX_MATCHES} matches; search stopped, "
+                "more matches may exist"
+            )
 
         log_operation(
             "search_code",
@@ -1259,6 +1284,7 @@ async def search_code(
                 "search_directory": str(search_path),
                 "total_matches": len(matches),
                 "files_searched": total_files_searched,
+                "indexed": search.indexed,
             },
         )
 
@@ -1418,6 +1444,9 @@ async def set_workspace(workspace_path: str) -> str:
 
         logger.info(f"New Workspace: {WORKSPACE_DIR}")
 
+        # Start importing heavy modules before the first execute_python call
+        PYTHON_WORKERS.warm_up(WORKSPACE_DIR)
+
         result = {
             "status": "success",
             "message": f"Workspace setup successful: {workspace_path}",
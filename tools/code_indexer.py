@@ -11,20 +11,51 @@ Features:
 - Configurable matching strategies
 - Progress tracking and error handling
 - Automatic LLM provider selection based on API key availability
+- Persistent content-addressed analysis cache shared across runs
+- Incremental re-indexing driven by per-file content manifests
+- Static (non-LLM) extraction of functions, classes and imports, with an offline mode
+- Single-pass, .gitignore-aware repository walk that skips binary and generated files
 """
 
 import asyncio
+import contextvars
+import hashlib
 import json
 import logging
-import os
 import re
+import time
 from datetime import datetime
 from pathlib import Path
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any
+from collections import defaultdict
+from dataclasses import dataclass, asdict, field
+from typing import List, Dict, Any, Optional, Tuple
 
 # MCP Agent imports for LLM
 from utils.llm_utils import get_preferred_llm_class, get_default_models
+from tools.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from tools.index_journal import IndexJournal
+from tools.indexer_cache import LRUAnalysisCache, PersistentAnalysisCache
+from tools.reference_index import reference_artifact_path, write_reference_artifact
+from tools.repo_walker import RepoWalker, RepoWalkResult
+from tools.file_ranking import (
+    build_file_document,
+    parse_target_structure,
+    rank_files_for_target,
+    read_file_head,
+    select_target_candidates,
+)
+from tools.source_analysis import (
+    build_offline_analysis,
+    excerpt_source,
+    extract_static_structure,
+)
+
+# Bump whenever the file analysis prompt changes so stale cache entries are ignored
+ANALYSIS_PROMPT_VERSION = "2"
+
+# Recorded in index metadata and per-file manifests; files analyzed by a different
+# version are re-analyzed on incremental runs
+ANALYZER_VERSION = "1.7.1"
 
 
 @dataclass
@@ -63,6 +94,39 @@ class RepoIndex:
     file_summaries: List[FileSummary]
     relationships: List[FileRelationship]
     analysis_metadata: Dict[str, Any]
+    manifest: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RepoProgress:
+    """Progress and per-repository counters of an indexing run"""
+
+    repo_name: str
+    status: str = "pending"
+    files_total: int = 0
+    files_done: int = 0
+    llm_requests: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    cache_write_tokens: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_evictions: int = 0
+    persistent_cache_hits: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    journal: Optional[IndexJournal] = field(default=None, repr=False)
+    # Shortlisted target file entries per repo file, for relationship prompts
+    target_candidates: Dict[str, List[Dict[str, str]]] = field(
+        default_factory=dict, repr=False
+    )
+
+
+# Progress of the repository being processed by the current task; set per
+# repository so concurrently indexed repositories keep separate counters
+_current_repo_progress: contextvars.ContextVar = contextvars.ContextVar(
+    "current_repo_progress", default=None
+)
 
 
 class CodeIndexer:
@@ -161,6 +225,29 @@ class CodeIndexer:
 
         self.max_file_size = file_analysis_config.get("max_file_size", 1048576)  # 1MB
         self.max_content_length = file_analysis_config.get("max_content_length", 3000)
+        self.content_excerpt_strategy = file_analysis_config.get(
+            "content_excerpt_strategy", "structure"
+        )
+        self.enable_static_extraction = file_analysis_config.get(
+            "enable_static_extraction", True
+        )
+        self.pre_filter_strategy = file_analysis_config.get(
+            "pre_filter_strategy", "lexical"
+        )
+        self.pre_filter_top_n = file_analysis_config.get("pre_filter_top_n", 60)
+        self.respect_ignore_files = file_analysis_config.get(
+            "respect_ignore_files", True
+        )
+        self.skip_binary_files = file_analysis_config.get("skip_binary_files", True)
+        self.skip_generated_files = file_analysis_config.get(
+            "skip_generated_files", True
+        )
+        self.content_sample_bytes = file_analysis_config.get(
+            "content_sample_bytes", 8192
+        )
+        self.max_tree_entries_per_directory = file_analysis_config.get(
+            "max_tree_entries_per_directory", 50
+        )
 
         # Load LLM configuration
         llm_config = self.indexer_config.get("llm", {})
@@ -174,6 +261,8 @@ class CodeIndexer:
         self.request_delay = llm_config.get("request_delay", 0.1)
         self.max_retries = llm_config.get("max_retries", 3)
         self.retry_delay = llm_config.get("retry_delay", 1.0)
+        self.offline_mode = llm_config.get("offline_mode", False)
+        self.enable_prompt_caching = llm_config.get("enable_prompt_caching", True)
 
         # Load relationship configuration
         relationship_config = self.indexer_config.get("relationships", {})
@@ -190,17 +279,51 @@ class CodeIndexer:
                 "utility": 0.4,
             },
         )
+        self.target_candidates_top_k = relationship_config.get(
+            "target_candidates_top_k", 8
+        )
 
         # Load performance configuration
         performance_config = self.indexer_config.get("performance", {})
         self.enable_concurrent_analysis = performance_config.get(
-            "enable_concurrent_analysis", False
+            "enable_concurrent_analysis", True
         )
         self.max_concurrent_files = performance_config.get("max_concurrent_files", 5)
+        self.max_concurrent_repos = performance_config.get("max_concurrent_repos", 4)
+        self.enable_adaptive_concurrency = performance_config.get(
+            "enable_adaptive_concurrency", True
+        )
+        self.max_concurrent_requests = performance_config.get(
+            "max_concurrent_requests", 32
+        )
+        self.concurrency_decrease_factor = performance_config.get(
+            "concurrency_decrease_factor", 0.5
+        )
+        self.enable_combined_analysis = performance_config.get(
+            "enable_combined_analysis", True
+        )
+        self.enable_batch_analysis = performance_config.get(
+            "enable_batch_analysis", True
+        )
+        self.batch_max_file_bytes = performance_config.get("batch_max_file_bytes", 2048)
+        self.batch_token_budget = performance_config.get("batch_token_budget", 6000)
+        self.batch_max_files = performance_config.get("batch_max_files", 8)
+        self.enable_incremental_indexing = performance_config.get(
+            "enable_incremental_indexing", True
+        )
+        self.enable_index_journal = performance_config.get("enable_index_journal", True)
         self.enable_content_caching = performance_config.get(
             "enable_content_caching", False
         )
-        self.max_cache_size = performance_config.get("max_cache_size", 100)
+        self.max_cache_bytes = performance_config.get(
+            "max_cache_bytes", 16 * 1024 * 1024
+        )  # 16MB
+        self.enable_persistent_cache = performance_config.get(
+            "enable_persistent_cache", True
+        )
+        self.persistent_cache_path = performance_config.get(
+            "persistent_cache_path", "deepcode_lab/cache/code_indexer_cache.db"
+        )
 
         # Load debug configuration
         debug_config = self.indexer_config.get("debug", {})
@@ -225,9 +348,29 @@ class CodeIndexer:
         self.stats_filename = output_config.get(
             "stats_filename", "indexing_statistics.json"
         )
+        # Precompiled search structures next to each index, loaded by the
+        # reference server instead of re-parsing the JSON
+        self.emit_reference_artifact = output_config.get(
+            "emit_reference_artifact", True
+        )
+
+        # In-memory LRU cache, created on first use so config overrides applied
+        # after construction are honored
+        self.content_cache = None
 
-        # Initialize caching if enabled
-        self.content_cache = {} if self.enable_content_caching else None
+        # LLM request limiter, created on first use so config overrides applied
+        # after construction are honored
+        self.concurrency_limiter = None
+        self.llm_client_lock = None
+        self.llm_usage: Dict[str, int] = {}
+        self.repo_progress: Dict[str, RepoProgress] = {}
+        # Latest walk of each repository, shared by the file list and the file tree
+        self.repo_walks: Dict[str, RepoWalkResult] = {}
+
+        # Persistent cache is opened lazily so config overrides applied after
+        # construction (e.g. by CodebaseIndexWorkflow) are honored
+        self.persistent_cache = None
+        self.persistent_cache_hits = 0
 
         # Create debug directory if needed
         if self.save_raw_responses:
@@ -243,7 +386,9 @@ class CodeIndexer:
             self.logger.info(f"Model provider: {self.model_provider}")
             self.logger.info(f"Concurrent analysis: {self.enable_concurrent_analysis}")
             self.logger.info(f"Content caching: {self.enable_content_caching}")
+            self.logger.info(f"Persistent cache: {self.enable_persistent_cache}")
             self.logger.info(f"Mock LLM responses: {self.mock_llm_responses}")
+            self.logger.info(f"Offline (no-LLM) mode: {self.offline_mode}")
 
     def _setup_logger(self) -> logging.Logger:
         """Setup logging configuration from config file"""
@@ -310,6 +455,16 @@ class CodeIndexer:
         if self.llm_client is not None:
             return self.llm_client, self.llm_client_type
 
+        # Repositories indexed concurrently must not each probe the providers
+        if self.llm_client_lock is None:
+            self.llm_client_lock = asyncio.Lock()
+        async with self.llm_client_lock:
+            if self.llm_client is not None:
+                return self.llm_client, self.llm_client_type
+            return await self._create_llm_client()
+
+    async def _create_llm_client(self):
+        """Probe the configured providers and keep the first working client"""
         # Check if mock responses are enabled
         if self.mock_llm_responses:
             self.logger.info("Using mock LLM responses for testing")
@@ -378,19 +533,36 @@ class CodeIndexer:
         )
 
     async def _call_llm(
-        self, prompt: str, system_prompt: str = None, max_tokens: int = None
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        max_tokens: int = None,
+        prompt_prefix: str = "",
     ) -> str:
-        """Call LLM for code analysis with retry mechanism and debugging support"""
+        """
+        Call LLM for code analysis with retry mechanism and debugging support.
+
+        prompt_prefix holds the part of the prompt shared by many calls
+        (instructions, output format, target structure). It is sent first so
+        provider-side prompt caching can reuse it; prompt holds the per-call part.
+        """
         if system_prompt is None:
             system_prompt = self.llm_system_prompt
         if max_tokens is None:
             max_tokens = self.llm_max_tokens
 
+        limiter = self._get_concurrency_limiter()
+        progress = _current_repo_progress.get()
+        tenant = progress.repo_name if progress else None
+        if progress:
+            progress.llm_requests += 1
+
         # Mock response for testing
         if self.mock_llm_responses:
-            mock_response = self._generate_mock_response(prompt)
+            async with limiter.track(tenant):
+                mock_response = self._generate_mock_response(prompt_prefix + prompt)
             if self.save_raw_responses:
-                self._save_debug_response("mock", prompt, mock_response)
+                self._save_debug_response("mock", prompt_prefix + prompt, mock_response)
             return mock_response
 
         last_error = None
@@ -405,48 +577,25 @@ class CodeIndexer:
 
                 client, client_type = await self._initialize_llm_client()
 
-                if client_type == "anthropic":
-                    response = await client.messages.create(
-                        model=self.default_models["anthropic"],
-                        system=system_prompt,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=max_tokens,
-                        temperature=self.llm_temperature,
+                # Each attempt holds a slot of the adaptive concurrency window
+                async with limiter.track(tenant):
+                    content, usage = await self._send_llm_request(
+                        client,
+                        client_type,
+                        prompt,
+                        system_prompt,
+                        max_tokens,
+                        prompt_prefix,
                     )
+                self._record_llm_usage(usage)
 
-                    content = ""
-                    for block in response.content:
-                        if block.type == "text":
-                            content += block.text
-
-                    # Save debug response if enabled
-                    if self.save_raw_responses:
-                        self._save_debug_response("anthropic", prompt, content)
-
-                    return content
-
-                elif client_type == "openai":
-                    messages = [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt},
-                    ]
-
-                    response = await client.chat.completions.create(
-                        model=self.default_models["openai"],
-                        messages=messages,
-                        max_tokens=max_tokens,
-                        temperature=self.llm_temperature,
+                # Save debug response if enabled
+                if self.save_raw_responses:
+                    self._save_debug_response(
+                        client_type, prompt_prefix + prompt, content, usage
                     )
 
-                    content = response.choices[0].message.content or ""
-
-                    # Save debug response if enabled
-                    if self.save_raw_responses:
-                        self._save_debug_response("openai", prompt, content)
-
-                    return content
-                else:
-                    raise ValueError(f"Unsupported client type: {client_type}")
+                return content
 
             except Exception as e:
                 last_error = e
@@ -462,9 +611,172 @@ class CodeIndexer:
         self.logger.error(error_msg)
         return f"Error in LLM analysis: {error_msg}"
 
+    async def _send_llm_request(
+        self,
+        client: Any,
+        client_type: str,
+        prompt: str,
+        system_prompt: str,
+        max_tokens: int,
+        prompt_prefix: str = "",
+    ) -> Tuple[str, Dict[str, int]]:
+        """Send a single request to the configured provider, returning text and token usage"""
+        if client_type == "anthropic":
+            if self.enable_prompt_caching:
+                # Cache breakpoints after the system prompt and the shared prefix
+                system = [
+                    {
+                        "type": "text",
+                        "text": system_prompt,
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                ]
+                user_content = [{"type": "text", "text": prompt}]
+                if prompt_prefix:
+                    user_content.insert(
+                        0,
+                        {
+                            "type": "text",
+                            "text": prompt_prefix,
+                            "cache_control": {"type": "ephemeral"},
+                        },
+                    )
+            else:
+                system = system_prompt
+                user_content = prompt_prefix + prompt
+
+            response = await client.messages.create(
+                model=self.default_models["anthropic"],
+                system=system,
+                messages=[{"role": "user", "content": user_content}],
+                max_tokens=max_tokens,
+                temperature=self.llm_temperature,
+            )
+
+            content = ""
+            for block in response.content:
+                if block.type == "text":
+                    content += block.text
+
+            usage = getattr(response, "usage", None)
+            cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+            cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+            return content, {
+                # Anthropic reports uncached input separately from cache reads/writes
+                "prompt_tokens": (getattr(usage, "input_tokens", 0) or 0)
+                + cache_read
+                + cache_write,
+                "cached_tokens": cache_read,
+                "cache_write_tokens": cache_write,
+            }
+
+        elif client_type == "openai":
+            # OpenAI-compatible endpoints cache automatically on an identical
+            # leading token sequence, so the shared prefix must come first
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt_prefix + prompt},
+            ]
+
+            response = await client.chat.completions.create(
+                model=self.default_models["openai"],
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=self.llm_temperature,
+            )
+
+            usage = getattr(response, "usage", None)
+            details = getattr(usage, "prompt_tokens_details", None)
+            return response.choices[0].message.content or "", {
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+                "cache_write_tokens": 0,
+            }
+        else:
+            raise ValueError(f"Unsupported client type: {client_type}")
+
+    def _record_llm_usage(self, usage: Dict[str, int]):
+        """Add one call's prompt token usage to the run and repository totals"""
+        for key, value in usage.items():
+            self.llm_usage[key] = self.llm_usage.get(key, 0) + value
+
+        progress = _current_repo_progress.get()
+        if progress:
+            progress.prompt_tokens += usage.get("prompt_tokens", 0)
+            progress.cached_prompt_tokens += usage.get("cached_tokens", 0)
+            progress.cache_write_tokens += usage.get("cache_write_tokens", 0)
+
+        if self.verbose_output:
+            self.logger.info(
+                f"LLM call usage: {usage.get('prompt_tokens', 0)} prompt tokens, "
+                f"{usage.get('cached_tokens', 0)} read from prompt cache, "
+                f"{usage.get('cache_write_tokens', 0)} written to prompt cache"
+            )
+
+    def _get_concurrency_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """Return the limiter pacing in-flight LLM requests, creating it on first use"""
+        if self.concurrency_limiter is None:
+            if self.enable_adaptive_concurrency:
+                self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+                    initial_limit=self.max_concurrent_files,
+                    min_limit=1,
+                    max_limit=self.max_concurrent_requests,
+                    decrease_factor=self.concurrency_decrease_factor,
+                    logger=self.logger,
+                )
+            else:
+                # Fixed window, equivalent to a plain semaphore
+                self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+                    initial_limit=self.max_concurrent_files,
+                    min_limit=self.max_concurrent_files,
+                    max_limit=self.max_concurrent_files,
+                )
+        return self.concurrency_limiter
+
     def _generate_mock_response(self, prompt: str) -> str:
         """Generate mock LLM response for testing"""
-        if "JSON format" in prompt and "file_type" in prompt:
+        if '"files"' in prompt and "[File " in prompt:
+            # Multi-file batch analysis mock, one entry per file in the prompt
+            files = []
+            for batch_file_path in re.findall(r"^\s*\[File \d+\] (.+)$", prompt, re.M):
+                files.append(
+                    {
+                        "file_path": batch_file_path.strip(),
+                        "file_type": "Python module",
+                        "main_functions": ["main_function"],
+                        "key_concepts": ["configuration"],
+                        "dependencies": [],
+                        "summary": "Mock batched analysis of a small file.",
+                        "relationships": [],
+                    }
+                )
+            return json.dumps({"files": files})
+        elif (
+            "JSON format" in prompt
+            and "key_concepts" in prompt
+            and "relationships" in prompt
+        ):
+            # Combined file analysis + relationship mock
+            return """
+            {
+                "file_type": "Python module",
+                "main_functions": ["main_function", "helper_function"],
+                "key_concepts": ["data_processing", "algorithm"],
+                "dependencies": ["numpy", "pandas"],
+                "summary": "Mock analysis of code file functionality.",
+                "relationships": [
+                    {
+                        "target_file_path": "src/core/mock.py",
+                        "relationship_type": "partial_match",
+                        "confidence_score": 0.8,
+                        "helpful_aspects": ["algorithm implementation", "data structures"],
+                        "potential_contributions": ["core functionality", "utility methods"],
+                        "usage_suggestions": "Mock relationship suggestion for testing."
+                    }
+                ]
+            }
+            """
+        elif "JSON format" in prompt and "key_concepts" in prompt:
             # File analysis mock
             return """
             {
@@ -513,7 +825,13 @@ class CodeIndexer:
         else:
             return "Mock LLM response for testing purposes."
 
-    def _save_debug_response(self, provider: str, prompt: str, response: str):
+    def _save_debug_response(
+        self,
+        provider: str,
+        prompt: str,
+        response: str,
+        usage: Optional[Dict[str, int]] = None,
+    ):
         """Save LLM response for debugging"""
         try:
             import hashlib
@@ -530,6 +848,7 @@ class CodeIndexer:
                 "prompt": prompt[:500] + "..." if len(prompt) > 500 else prompt,
                 "response": response,
                 "full_prompt_length": len(prompt),
+                "usage": usage or {},
             }
 
             debug_file = Path(self.raw_responses_dir) / filename
@@ -539,77 +858,45 @@ class CodeIndexer:
         except Exception as e:
             self.logger.warning(f"Failed to save debug response: {e}")
 
-    def get_all_repo_files(self, repo_path: Path) -> List[Path]:
-        """Recursively get all supported files in a repository"""
-        files = []
+    def _create_repo_walker(self, max_tree_depth: int = 5) -> RepoWalker:
+        return RepoWalker(
+            supported_extensions=self.supported_extensions,
+            skip_directories=self.skip_directories,
+            respect_ignore_files=self.respect_ignore_files,
+            skip_binary_files=self.skip_binary_files,
+            skip_generated_files=self.skip_generated_files,
+            sample_bytes=self.content_sample_bytes,
+            max_tree_depth=max_tree_depth,
+            max_tree_entries_per_directory=self.max_tree_entries_per_directory,
+        )
 
+    def walk_repository(self, repo_path: Path) -> RepoWalkResult:
+        """Walk a repository once, collecting its analyzable files and file tree"""
         try:
-            for root, dirs, filenames in os.walk(repo_path):
-                # Skip common non-code directories
-                dirs[:] = [
-                    d
-                    for d in dirs
-                    if not d.startswith(".") and d not in self.skip_directories
-                ]
-
-                for filename in filenames:
-                    file_path = Path(root) / filename
-                    if file_path.suffix.lower() in self.supported_extensions:
-                        files.append(file_path)
-
+            walk = self._create_repo_walker().walk(repo_path)
         except Exception as e:
             self.logger.error(f"Error traversing {repo_path}: {e}")
+            walk = RepoWalkResult()
+
+        if walk.skipped:
+            skipped = ", ".join(
+                f"{count} {reason}" for reason, count in sorted(walk.skipped.items())
+            )
+            self.logger.info(f"Walk of {repo_path.name} left out: {skipped}")
+        self.repo_walks[str(repo_path)] = walk
+        return walk
 
-        return files
+    def get_all_repo_files(self, repo_path: Path) -> List[Path]:
+        """Recursively get all supported files in a repository"""
+        return self.walk_repository(repo_path).files
 
     def generate_file_tree(self, repo_path: Path, max_depth: int = 5) -> str:
         """Generate file tree structure string for the repository"""
-        tree_lines = []
-
-        def add_to_tree(current_path: Path, prefix: str = "", depth: int = 0):
-            if depth > max_depth:
-                return
-
-            try:
-                items = sorted(
-                    current_path.iterdir(), key=lambda x: (x.is_file(), x.name.lower())
-                )
-                # Filter out irrelevant directories and files
-                items = [
-                    item
-                    for item in items
-                    if not item.name.startswith(".")
-                    and item.name not in self.skip_directories
-                ]
-
-                for i, item in enumerate(items):
-                    is_last = i == len(items) - 1
-                    current_prefix = "└── " if is_last else "├── "
-                    tree_lines.append(f"{prefix}{current_prefix}{item.name}")
-
-                    if item.is_dir():
-                        extension_prefix = "    " if is_last else "│   "
-                        add_to_tree(item, prefix + extension_prefix, depth + 1)
-                    elif item.suffix.lower() in self.supported_extensions:
-                        # Add file size information
-                        try:
-                            size = item.stat().st_size
-                            if size > 1024:
-                                size_str = f" ({size // 1024}KB)"
-                            else:
-                                size_str = f" ({size}B)"
-                            tree_lines[-1] += size_str
-                        except (OSError, PermissionError):
-                            pass
-
-            except PermissionError:
-                tree_lines.append(f"{prefix}├── [Permission Denied]")
-            except Exception as e:
-                tree_lines.append(f"{prefix}├── [Error: {str(e)}]")
-
-        tree_lines.append(f"{repo_path.name}/")
-        add_to_tree(repo_path)
-        return "\n".join(tree_lines)
+        # The file list walk already recorded the tree down to the default depth
+        walk = self.repo_walks.get(str(repo_path))
+        if walk is None or max_depth > 5:
+            walk = self._create_repo_walker(max_tree_depth=max_depth).walk(repo_path)
+        return walk.render_tree(repo_path.name, max_depth)
 
     async def pre_filter_files(self, repo_path: Path, file_tree: str) -> List[str]:
         """Use LLM to pre-filter relevant files based on target structure"""
@@ -693,6 +980,56 @@ class CodeIndexer:
             self.logger.info("Will fallback to analyzing all files")
             return []
 
+    def rank_files_lexically(self, repo_path: Path, all_files: List[Path]) -> List[str]:
+        """Shortlist files by BM25 relevance to the target structure, without LLM calls"""
+        file_heads = {
+            str(file_path.relative_to(repo_path)).replace("\\", "/"): read_file_head(
+                file_path
+            )
+            for file_path in all_files
+        }
+        ranked = rank_files_for_target(file_heads, self.target_structure)
+
+        # Files sharing no token with the target structure are never shortlisted
+        shortlist = [
+            relative_path
+            for relative_path, score in ranked[: self.pre_filter_top_n]
+            if score > 0
+        ]
+        self.logger.info(
+            f"Lexical ranking shortlisted {len(shortlist)} of {len(all_files)} files"
+        )
+        return shortlist
+
+    async def select_relevant_files(
+        self, repo_path: Path, all_files: List[Path]
+    ) -> List[str]:
+        """Pre-select relevant files using the configured pre-filter strategy"""
+        strategy = self.pre_filter_strategy
+        if strategy not in ("lexical", "lexical_llm", "llm"):
+            self.logger.warning(
+                f"Unknown pre_filter_strategy '{strategy}', using lexical ranking"
+            )
+            strategy = "lexical"
+
+        if strategy == "llm" and not self.offline_mode:
+            self.logger.info("Using LLM for file pre-filtering...")
+            file_tree = self.generate_file_tree(repo_path)
+            return await self.pre_filter_files(repo_path, file_tree)
+
+        self.logger.info("Using lexical ranking for file pre-filtering...")
+        shortlist = self.rank_files_lexically(repo_path, all_files)
+        if strategy == "lexical" or self.offline_mode or not shortlist:
+            return shortlist
+
+        # Let the LLM re-rank the shortlist only, keeping the prompt small
+        self.logger.info("Using LLM to re-rank the lexical shortlist...")
+        shortlist_tree = "\n".join([f"{repo_path.name}/"] + shortlist)
+        reranked = await self.pre_filter_files(repo_path, shortlist_tree)
+        shortlisted = set(shortlist)
+        kept = [path for path in reranked if path.replace("\\", "/") in shortlisted]
+        return kept or shortlist
+
     def filter_files_by_paths(
         self, all_files: List[Path], selected_paths: List[str], repo_path: Path
     ) -> List[Path]:
@@ -729,26 +1066,145 @@ class CodeIndexer:
         except (OSError, PermissionError):
             return str(file_path)
 
-    def _manage_cache_size(self):
-        """Manage cache size to stay within limits"""
-        if not self.enable_content_caching or not self.content_cache:
+    def _get_persistent_cache(self) -> Optional[PersistentAnalysisCache]:
+        """Open the persistent analysis cache on first use"""
+        if not self.enable_persistent_cache:
+            return None
+
+        if self.persistent_cache is None:
+            try:
+                self.persistent_cache = PersistentAnalysisCache(
+                    self.persistent_cache_path
+                )
+                self.logger.info(
+                    f"Using persistent analysis cache: {self.persistent_cache_path}"
+                )
+            except Exception as e:
+                self.logger.warning(f"Persistent analysis cache unavailable: {e}")
+                self.enable_persistent_cache = False
+                return None
+
+        return self.persistent_cache
+
+    async def _get_analysis_model_id(self) -> Optional[str]:
+        """Identify the model producing file analyses (part of the cache key)"""
+        if self.mock_llm_responses:
+            return "mock"
+
+        try:
+            _, client_type = await self._initialize_llm_client()
+        except Exception:
+            return None
+        return f"{client_type}:{self.default_models.get(client_type, 'unknown')}"
+
+    def _get_content_cache(self) -> Optional[LRUAnalysisCache]:
+        """Create the in-memory LRU analysis cache on first use"""
+        if not self.enable_content_caching:
+            return None
+
+        if self.content_cache is None:
+            self.content_cache = LRUAnalysisCache(self.max_cache_bytes)
+        return self.content_cache
+
+    def _get_cache_stats(self) -> Dict[str, int]:
+        """Snapshot the in-memory cache counters"""
+        if self.content_cache is None:
+            return {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0}
+        return self.content_cache.stats()
+
+    async def _get_persistent_key(self, content: str) -> Optional[str]:
+        """Compute the persistent cache key for file content, if the cache is in use"""
+        if self._get_persistent_cache() is None:
+            return None
+
+        model_id = await self._get_analysis_model_id()
+        if not model_id:
+            return None
+        prompt_version = ANALYSIS_PROMPT_VERSION
+        if self.enable_static_extraction:
+            prompt_version += "+static"
+        if self.content_excerpt_strategy == "structure":
+            prompt_version += f"+excerpt{self.max_content_length}"
+        return PersistentAnalysisCache.make_key(content, model_id, prompt_version)
+
+    async def _persist_analysis(
+        self, file_path: Path, persistent_key: str, analysis_data: Dict[str, Any]
+    ):
+        """Store a successful analysis in the persistent cache"""
+        if not persistent_key or self.persistent_cache is None:
             return
 
-        if len(self.content_cache) > self.max_cache_size:
-            # Remove oldest entries (simple FIFO strategy)
-            excess_count = len(self.content_cache) - self.max_cache_size + 10
-            keys_to_remove = list(self.content_cache.keys())[:excess_count]
+        # Relationships depend on the target structure and are never persisted
+        persisted_data = {
+            key: value for key, value in analysis_data.items() if key != "relationships"
+        }
+        try:
+            # SQLite may wait on another process's lock; keep the event loop free
+            await asyncio.to_thread(
+                self.persistent_cache.put, persistent_key, persisted_data
+            )
+        except Exception as e:
+            self.logger.warning(f"Failed to persist analysis for {file_path}: {e}")
+
+    def _build_file_summary(
+        self, file_path: Path, content: str, analysis_data: Dict[str, Any]
+    ) -> FileSummary:
+        """Create a FileSummary from parsed analysis data and local file facts"""
+        stats = file_path.stat()
+        lines_of_code = len([line for line in content.split("\n") if line.strip()])
+
+        if self.enable_static_extraction:
+            # Deterministic structural fields take precedence over LLM output
+            analysis_data = {
+                **analysis_data,
+                **extract_static_structure(file_path, content),
+            }
 
-            for key in keys_to_remove:
-                del self.content_cache[key]
+        # Failed analyses are marked after the static fields are merged, so
+        # manifest, journal and caches keep them out and the next run retries
+        file_type = analysis_data.get("file_type", "unknown")
+        if analysis_data.get("analysis_failed"):
+            file_type = "error"
+
+        return FileSummary(
+            file_path=str(file_path.relative_to(self.code_base_path)),
+            file_type=file_type,
+            main_functions=analysis_data.get("main_functions", []),
+            key_concepts=analysis_data.get("key_concepts", []),
+            dependencies=analysis_data.get("dependencies", []),
+            summary=analysis_data.get("summary", "No summary available"),
+            lines_of_code=lines_of_code,
+            last_modified=datetime.fromtimestamp(stats.st_mtime).isoformat(),
+        )
 
-            if self.verbose_output:
-                self.logger.info(
-                    f"Cache cleaned: removed {excess_count} entries, {len(self.content_cache)} entries remaining"
-                )
+    def _cache_file_summary(self, cache_key: str, file_summary: FileSummary):
+        """Store a summary in the in-memory LRU cache, sized by its JSON form"""
+        summary_size = len(
+            json.dumps(asdict(file_summary), ensure_ascii=False).encode("utf-8")
+        )
+        evictions_before = self.content_cache.evictions
+        self.content_cache.put(cache_key, file_summary, summary_size)
+
+        progress = _current_repo_progress.get()
+        if progress:
+            progress.cache_evictions += self.content_cache.evictions - evictions_before
 
     async def analyze_file_content(self, file_path: Path) -> FileSummary:
         """Analyze a single file and create summary with caching support"""
+        file_summary, _ = await self._analyze_file(file_path)
+        return file_summary
+
+    async def _analyze_file(
+        self, file_path: Path, include_relationships: bool = False
+    ) -> Tuple[FileSummary, Optional[List[FileRelationship]]]:
+        """
+        Analyze a single file, optionally extracting target relationships in the
+        same LLM call.
+
+        Returns the file summary and the relationships found, or None for the
+        relationships when they were not produced (cache hit, skipped file or a
+        response without usable relationships) and must be requested separately.
+        """
         try:
             # Check file size before reading
             file_size = file_path.stat().st_size
@@ -756,7 +1212,7 @@ class CodeIndexer:
                 self.logger.warning(
                     f"Skipping file {file_path} - size {file_size} bytes exceeds limit {self.max_file_size}"
                 )
-                return FileSummary(
+                skipped_summary = FileSummary(
                     file_path=str(file_path.relative_to(self.code_base_path)),
                     file_type="skipped - too large",
                     main_functions=[],
@@ -768,87 +1224,80 @@ class CodeIndexer:
                         file_path.stat().st_mtime
                     ).isoformat(),
                 )
+                return skipped_summary, None
 
             # Check cache if enabled
             cache_key = None
-            if self.enable_content_caching:
+            content_cache = self._get_content_cache()
+            if content_cache is not None:
                 cache_key = self._get_cache_key(file_path)
-                if cache_key in self.content_cache:
+                cached_summary = content_cache.get(cache_key)
+                progress = _current_repo_progress.get()
+                if progress:
+                    if cached_summary is None:
+                        progress.cache_misses += 1
+                    else:
+                        progress.cache_hits += 1
+                if cached_summary is not None:
                     if self.verbose_output:
                         self.logger.info(f"Using cached analysis for {file_path.name}")
-                    return self.content_cache[cache_key]
+                    return cached_summary, None
 
             with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
                 content = f.read()
 
-            # Get file stats
-            stats = file_path.stat()
-            lines_of_code = len([line for line in content.split("\n") if line.strip()])
-
-            # Truncate content based on config
-            content_for_analysis = content[: self.max_content_length]
-            content_suffix = "..." if len(content) > self.max_content_length else ""
-
-            # Create analysis prompt
-            analysis_prompt = f"""
-            Analyze this code file and provide a structured summary:
-
-            File: {file_path.name}
-            Content:
-            ```
-            {content_for_analysis}{content_suffix}
-            ```
-
-            Please provide analysis in this JSON format:
-            {{
-                "file_type": "description of what type of file this is",
-                "main_functions": ["list", "of", "main", "functions", "or", "classes"],
-                "key_concepts": ["important", "concepts", "algorithms", "patterns"],
-                "dependencies": ["external", "libraries", "or", "imports"],
-                "summary": "2-3 sentence summary of what this file does"
-            }}
-
-            Focus on the core functionality and potential reusability.
-            """
-
-            # Get LLM analysis with configured parameters
-            llm_response = await self._call_llm(analysis_prompt, max_tokens=1000)
+            if self.offline_mode:
+                file_summary = self._build_file_summary(
+                    file_path, content, build_offline_analysis(file_path, content)
+                )
+                if content_cache is not None and cache_key:
+                    self._cache_file_summary(cache_key, file_summary)
+                return file_summary, []
+
+            # Check persistent content-addressed cache
+            analysis_data = None
+            persistent_key = await self._get_persistent_key(content)
+            if persistent_key:
+                analysis_data = await asyncio.to_thread(
+                    self.persistent_cache.get, persistent_key
+                )
+                if analysis_data is not None:
+                    self.persistent_cache_hits += 1
+                    progress = _current_repo_progress.get()
+                    if progress:
+                        progress.persistent_cache_hits += 1
+                    if self.verbose_output:
+                        self.logger.info(
+                            f"Using persisted analysis for {file_path.name}"
+                        )
 
-            try:
-                # Try to parse JSON response
-                match = re.search(r"\{.*\}", llm_response, re.DOTALL)
-                analysis_data = json.loads(match.group(0))
-            except json.JSONDecodeError:
-                # Fallback to basic analysis if JSON parsing fails
-                analysis_data = {
-                    "file_type": f"{file_path.suffix} file",
-                    "main_functions": [],
-                    "key_concepts": [],
-                    "dependencies": [],
-                    "summary": "File analysis failed - JSON parsing error",
-                }
+            if analysis_data is None:
+                analysis_data = await self._request_file_analysis(
+                    file_path, content, persistent_key, include_relationships
+                )
+            relationship_data = analysis_data.pop("relationships", None)
 
-            file_summary = FileSummary(
-                file_path=str(file_path.relative_to(self.code_base_path)),
-                file_type=analysis_data.get("file_type", "unknown"),
-                main_functions=analysis_data.get("main_functions", []),
-                key_concepts=analysis_data.get("key_concepts", []),
-                dependencies=analysis_data.get("dependencies", []),
-                summary=analysis_data.get("summary", "No summary available"),
-                lines_of_code=lines_of_code,
-                last_modified=datetime.fromtimestamp(stats.st_mtime).isoformat(),
-            )
+            file_summary = self._build_file_summary(file_path, content, analysis_data)
 
             # Cache the result if caching is enabled
-            if self.enable_content_caching and cache_key:
-                self.content_cache[cache_key] = file_summary
-                self._manage_cache_size()
+            if (
+                content_cache is not None
+                and cache_key
+                and file_summary.file_type != "error"
+            ):
+                self._cache_file_summary(cache_key, file_summary)
+
+            relationships = None
+            if isinstance(relationship_data, list):
+                relationships = self._parse_relationships(
+                    file_summary, relationship_data
+                )
 
-            return file_summary
+            return file_summary, relationships
 
         except Exception as e:
             self.logger.error(f"Error analyzing file {file_path}: {e}")
-            return FileSummary(
+            error_summary = FileSummary(
                 file_path=str(file_path.relative_to(self.code_base_path)),
                 file_type="error",
                 main_functions=[],
@@ -858,32 +1307,236 @@ class CodeIndexer:
                 lines_of_code=0,
                 last_modified="",
             )
+            return error_summary, None
 
-    async def find_relationships(
-        self, file_summary: FileSummary
-    ) -> List[FileRelationship]:
-        """Find relationships between a repo file and target structure"""
+    async def _request_file_analysis(
+        self,
+        file_path: Path,
+        content: str,
+        persistent_key: str = None,
+        include_relationships: bool = False,
+    ) -> Dict[str, Any]:
+        """Ask the LLM to analyze file content, persisting successful results"""
+        content_for_analysis = self._fit_content_to_budget(file_path, content)
+
+        if include_relationships:
+            prompt_prefix, analysis_prompt = self._build_combined_analysis_prompt(
+                file_path, content_for_analysis
+            )
+            max_tokens = 2500
+        else:
+            # Create analysis prompt, instructions first so they form a cacheable prefix
+            prompt_prefix = f"""
+        Analyze the code file given at the end of this prompt and provide a structured summary.
+
+        Please provide analysis in this JSON format:
+        {{
+            {self._format_analysis_fields(indent=12)}
+        }}
+
+        Focus on the core functionality and potential reusability.
+"""
+            analysis_prompt = f"""
+        File: {file_path.name}
+        Content:
+        ```
+        {content_for_analysis}
+        ```
+        """
+            max_tokens = 1000
+
+        # Get LLM analysis with configured parameters
+        llm_response = await self._call_llm(
+            analysis_prompt, max_tokens=max_tokens, prompt_prefix=prompt_prefix
+        )
+        if llm_response.startswith("Error in LLM analysis:"):
+            # Retries are exhausted; not persisted, and retried by the next run
+            return {
+                "analysis_failed": True,
+                "summary": "File analysis failed - LLM request error",
+            }
+
+        try:
+            # Try to parse JSON response
+            match = re.search(r"\{.*\}", llm_response, re.DOTALL)
+            analysis_data = json.loads(match.group(0))
+        except (json.JSONDecodeError, AttributeError):
+            if include_relationships:
+                # Fall back to the separate analysis + relationship calls
+                self.logger.warning(
+                    f"Combined analysis response for {file_path.name} could not be parsed, "
+                    "falling back to two-call analysis"
+                )
+                return await self._request_file_analysis(
+                    file_path, content, persistent_key
+                )
+
+            # Fallback to basic analysis if JSON parsing fails (not persisted)
+            return {
+                "analysis_failed": True,
+                "summary": "File analysis failed - JSON parsing error",
+            }
+
+        await self._persist_analysis(file_path, persistent_key, analysis_data)
+        return analysis_data
+
+    def _format_analysis_fields(
+        self,
+        indent: int,
+        summary_hint: str = "2-3 sentence summary of what this file does",
+    ) -> str:
+        """
+        JSON fields the LLM has to produce for a file. With static extraction
+        enabled, file type, functions and dependencies are filled locally and
+        are not requested.
+        """
+        fields = []
+        if not self.enable_static_extraction:
+            fields.append('"file_type": "description of what type of file this is"')
+            fields.append(
+                '"main_functions": ["list", "of", "main", "functions", "or", "classes"]'
+            )
+        fields.append(
+            '"key_concepts": ["important", "concepts", "algorithms", "patterns"]'
+        )
+        if not self.enable_static_extraction:
+            fields.append('"dependencies": ["external", "libraries", "or", "imports"]')
+        fields.append(f'"summary": "{summary_hint}"')
+        return (",\n" + " " * indent).join(fields)
 
-        # Build relationship type description from config
+    def _format_relationship_types(self) -> str:
+        """Build relationship type description from config"""
         relationship_type_desc = []
         for rel_type, weight in self.relationship_types.items():
             relationship_type_desc.append(f"- {rel_type} (priority: {weight})")
+        return "\n".join(relationship_type_desc)
 
-        relationship_prompt = f"""
-        Analyze the relationship between this existing code file and the target project structure.
+    def _build_combined_analysis_prompt(
+        self, file_path: Path, content: str
+    ) -> Tuple[str, str]:
+        """
+        Build a single prompt requesting both file summary and relationships,
+        returned as (shared prefix, per-file part)
+        """
+        shared_target, file_target = self._split_target_context(
+            [str(file_path.relative_to(self.code_base_path))]
+        )
+        prompt_prefix = f"""
+        Analyze the code file given at the end of this prompt, then identify how it relates to the target project structure.
+{shared_target}
+        Available relationship types (with priority weights):
+        {self._format_relationship_types()}
 
-        Existing File Analysis:
-        - Path: {file_summary.file_path}
-        - Type: {file_summary.file_type}
-        - Functions: {', '.join(file_summary.main_functions)}
-        - Concepts: {', '.join(file_summary.key_concepts)}
-        - Summary: {file_summary.summary}
+        Please provide analysis in this JSON format:
+        {{
+            {self._format_analysis_fields(indent=12)},
+            "relationships": [
+                {{
+                    "target_file_path": "path/in/target/structure",
+                    "relationship_type": "direct_match|partial_match|reference|utility",
+                    "confidence_score": 0.0-1.0,
+                    "helpful_aspects": ["specific", "aspects", "that", "could", "help"],
+                    "potential_contributions": ["how", "this", "could", "contribute"],
+                    "usage_suggestions": "detailed suggestion on how to use this file"
+                }}
+            ]
+        }}
 
-        Target Project Structure:
-        {self.target_structure}
+        Focus on the core functionality and potential reusability.
+        Consider the priority weights when determining relationship types. Higher weight types should be preferred when multiple types apply.
+        Only include relationships with confidence > {self.min_confidence_score}; use an empty list if none apply.
+"""
+        prompt = f"""{file_target}
+        File: {file_path.relative_to(self.code_base_path)}
+        Content:
+        ```
+        {content}
+        ```
+        """
+        return prompt_prefix, prompt
+
+    def _select_target_candidates(
+        self, files: List[Path]
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """Shortlist the most plausible target files for each repo file, locally"""
+        target_entries = parse_target_structure(self.target_structure)
+        if len(target_entries) <= self.target_candidates_top_k:
+            # Plan is already small enough to send whole
+            return {}
+
+        file_documents = {
+            str(file_path.relative_to(self.code_base_path)): build_file_document(
+                file_path.relative_to(self.code_base_path).as_posix(),
+                read_file_head(file_path),
+            )
+            for file_path in files
+        }
+        candidates = select_target_candidates(
+            file_documents, target_entries, self.target_candidates_top_k
+        )
+        narrowed = sum(1 for entries in candidates.values() if entries)
+        self.logger.info(
+            f"Target candidates: top {self.target_candidates_top_k} of "
+            f"{len(target_entries)} target files for {narrowed}/{len(files)} files"
+        )
+        return candidates
+
+    def _get_target_context(self, file_paths: List[str]) -> Tuple[str, str]:
+        """
+        Heading and target structure text to embed in a relationship prompt.
+
+        Uses the shortlisted target files of the given repo files when every one
+        of them has candidates, and the full target structure otherwise.
+        """
+        progress = _current_repo_progress.get()
+        candidates = progress.target_candidates if progress else {}
+
+        lines = []
+        for file_path in file_paths:
+            entries = candidates.get(file_path)
+            if not entries:
+                return "Target Project Structure", self.target_structure
+            lines.extend(
+                entry["line"] for entry in entries if entry["line"] not in lines
+            )
+
+        if not lines:
+            return "Target Project Structure", self.target_structure
+        return (
+            "Candidate Target Files (most plausible matches in the target project structure)",
+            "\n        ".join(lines),
+        )
+
+    def _split_target_context(self, file_paths: List[str]) -> Tuple[str, str]:
+        """
+        Target structure section for the shared prompt prefix and for the
+        per-call part. The full structure is identical across calls and belongs
+        in the cacheable prefix; shortlisted candidates differ per file.
+        """
+        target_heading, target_context = self._get_target_context(file_paths)
+        section = f"""
+        {target_heading}:
+        {target_context}
+"""
+        if target_context is self.target_structure:
+            return section, ""
+        return "", section
+
+    async def find_relationships(
+        self, file_summary: FileSummary
+    ) -> List[FileRelationship]:
+        """Find relationships between a repo file and target structure"""
+        if self.offline_mode:
+            return []
 
+        shared_target, file_target = self._split_target_context(
+            [file_summary.file_path]
+        )
+        prompt_prefix = f"""
+        Analyze the relationship between the existing code file described at the end of this prompt and the target project structure.
+{shared_target}
         Available relationship types (with priority weights):
-        {chr(10).join(relationship_type_desc)}
+        {self._format_relationship_types()}
 
         Identify potential relationships and provide analysis in this JSON format:
         {{
@@ -901,18 +1554,43 @@ class CodeIndexer:
 
         Consider the priority weights when determining relationship types. Higher weight types should be preferred when multiple types apply.
         Only include relationships with confidence > {self.min_confidence_score}. Focus on concrete, actionable connections.
+"""
+        relationship_prompt = f"""{file_target}
+        Existing File Analysis:
+        - Path: {file_summary.file_path}
+        - Type: {file_summary.file_type}
+        - Functions: {', '.join(file_summary.main_functions)}
+        - Concepts: {', '.join(file_summary.key_concepts)}
+        - Summary: {file_summary.summary}
         """
 
         try:
-            llm_response = await self._call_llm(relationship_prompt, max_tokens=1500)
+            llm_response = await self._call_llm(
+                relationship_prompt, max_tokens=1500, prompt_prefix=prompt_prefix
+            )
 
             match = re.search(r"\{.*\}", llm_response, re.DOTALL)
             relationship_data = json.loads(match.group(0))
 
-            relationships = []
-            for rel_data in relationship_data.get("relationships", []):
-                confidence_score = float(rel_data.get("confidence_score", 0.0))
-                relationship_type = rel_data.get("relationship_type", "reference")
+            return self._parse_relationships(
+                file_summary, relationship_data.get("relationships", [])
+            )
+
+        except Exception as e:
+            self.logger.error(
+                f"Error finding relationships for {file_summary.file_path}: {e}"
+            )
+            return []
+
+    def _parse_relationships(
+        self, file_summary: FileSummary, relationship_list: List[Dict[str, Any]]
+    ) -> List[FileRelationship]:
+        """Convert raw LLM relationship entries into validated FileRelationship objects"""
+        relationships = []
+        for rel_data in relationship_list:
+            try:
+                confidence_score = float(rel_data.get("confidence_score", 0.0))
+                relationship_type = rel_data.get("relationship_type", "reference")
 
                 # Validate relationship type is in config
                 if relationship_type not in self.relationship_types:
@@ -937,13 +1615,12 @@ class CodeIndexer:
                     )
                     relationships.append(relationship)
 
-            return relationships
+            except (TypeError, ValueError, AttributeError) as e:
+                self.logger.warning(
+                    f"Ignoring malformed relationship for {file_summary.file_path}: {e}"
+                )
 
-        except Exception as e:
-            self.logger.error(
-                f"Error finding relationships for {file_summary.file_path}: {e}"
-            )
-            return []
+        return relationships
 
     async def _analyze_single_file_with_relationships(
         self, file_path: Path, index: int, total: int
@@ -952,62 +1629,702 @@ class CodeIndexer:
         if self.verbose_output:
             self.logger.info(f"Analyzing file {index}/{total}: {file_path.name}")
 
-        # Get file summary
-        file_summary = await self.analyze_file_content(file_path)
+        # Get file summary (and relationships, in combined analysis mode)
+        file_summary, relationships = await self._analyze_file(
+            file_path, include_relationships=self.enable_combined_analysis
+        )
 
-        # Find relationships
-        relationships = await self.find_relationships(file_summary)
+        # Find relationships with a separate call when they were not produced above
+        if relationships is None:
+            relationships = await self.find_relationships(file_summary)
 
+        self._journal_file_result(file_summary, relationships)
+        self._advance_repo_progress(1)
         return file_summary, relationships
 
+    def _journal_file_result(
+        self, file_summary: FileSummary, relationships: List[FileRelationship]
+    ):
+        """Append a finished file to the current repository's journal"""
+        progress = _current_repo_progress.get()
+        if progress is None or progress.journal is None:
+            return
+        # Failed files, including failed or unparseable LLM analyses (marked
+        # "error" by _build_file_summary), are left out so a resumed run
+        # retries them
+        if file_summary.file_type == "error":
+            return
+        progress.journal.append(
+            asdict(file_summary),
+            [asdict(relationship) for relationship in relationships],
+        )
+
+    def _advance_repo_progress(self, files: int):
+        """Count analyzed files of the current repository and log progress steps"""
+        progress = _current_repo_progress.get()
+        if progress is None or files <= 0:
+            return
+
+        files_before = progress.files_done
+        progress.files_done += files
+        total = max(progress.files_total, 1)
+
+        # Log every 10% so concurrently indexed repositories stay readable
+        if self.verbose_output or progress.files_done * 10 // total > (
+            files_before * 10 // total
+        ):
+            self.logger.info(
+                f"[{progress.repo_name}] {progress.files_done}/{progress.files_total} "
+                f"files analyzed ({progress.files_done * 100 // total}%)"
+            )
+
+    def _fit_content_to_budget(self, file_path: Path, content: str) -> str:
+        """Shrink file content to max_content_length characters for a prompt"""
+        if self.content_excerpt_strategy == "structure":
+            return excerpt_source(file_path, content, self.max_content_length)
+        if len(content) > self.max_content_length:
+            return content[: self.max_content_length] + "..."
+        return content
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token estimate (about four characters per token)"""
+        return len(text) // 4 + 1
+
+    async def _plan_small_file_batches(
+        self, files_to_analyze: List[Path]
+    ) -> Tuple[List[List[Tuple[Path, str]]], List[Path]]:
+        """Group small, uncached files into prompt batches within the token budget"""
+        content_cache = self._get_content_cache()
+        candidates = []
+        remaining = []
+
+        for file_path in files_to_analyze:
+            try:
+                if file_path.stat().st_size > self.batch_max_file_bytes:
+                    remaining.append(file_path)
+                    continue
+
+                # Cached files are cheap on the per-file path
+                if (
+                    content_cache is not None
+                    and self._get_cache_key(file_path) in content_cache
+                ):
+                    remaining.append(file_path)
+                    continue
+
+                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                    content = f.read()
+            except (OSError, PermissionError):
+                remaining.append(file_path)
+                continue
+
+            persistent_key = await self._get_persistent_key(content)
+            if persistent_key and await asyncio.to_thread(
+                self.persistent_cache.contains, persistent_key
+            ):
+                remaining.append(file_path)
+                continue
+
+            candidates.append((file_path, content))
+
+        # Sorting by path keeps files of the same package in the same prompt
+        candidates.sort(key=lambda item: str(item[0]))
+
+        batches = []
+        current_batch = []
+        current_tokens = 0
+        for file_path, content in candidates:
+            file_tokens = (
+                self._estimate_tokens(content[: self.max_content_length]) + 20
+            )  # Section header overhead
+            if current_batch and (
+                current_tokens + file_tokens > self.batch_token_budget
+                or len(current_batch) >= self.batch_max_files
+            ):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+            current_batch.append((file_path, content))
+            current_tokens += file_tokens
+
+        if current_batch:
+            batches.append(current_batch)
+
+        # A batch of one saves nothing, such files are analyzed individually
+        for batch in batches:
+            if len(batch) == 1:
+                remaining.append(batch[0][0])
+
+        return [batch for batch in batches if len(batch) > 1], remaining
+
+    def _build_batch_analysis_prompt(
+        self,
+        file_sections: List[str],
+        include_relationships: bool,
+        file_paths: Optional[List[str]] = None,
+    ) -> Tuple[str, str]:
+        """
+        Build a prompt asking for one structured summary per packed file,
+        returned as (shared prefix, per-batch part)
+        """
+        shared_target = ""
+        batch_target = ""
+        relationship_section = ""
+        relationship_format = ""
+        relationship_instructions = ""
+        if include_relationships:
+            shared_target, batch_target = self._split_target_context(file_paths or [])
+            relationship_section = f"""{shared_target}
+        Available relationship types (with priority weights):
+        {self._format_relationship_types()}
+"""
+            relationship_format = """,
+                    "relationships": [
+                        {
+                            "target_file_path": "path/in/target/structure",
+                            "relationship_type": "direct_match|partial_match|reference|utility",
+                            "confidence_score": 0.0-1.0,
+                            "helpful_aspects": ["specific", "aspects", "that", "could", "help"],
+                            "potential_contributions": ["how", "this", "could", "contribute"],
+                            "usage_suggestions": "detailed suggestion on how to use this file"
+                        }
+                    ]"""
+            relationship_instructions = f"""
+        Consider the priority weights when determining relationship types. Higher weight types should be preferred when multiple types apply.
+        Only include relationships with confidence > {self.min_confidence_score}; use an empty list if none apply."""
+
+        prompt_prefix = f"""
+        Analyze each of the small code files given at the end of this prompt and provide a structured summary for every file.
+{relationship_section}
+        Please provide analysis in this JSON format, with exactly one entry per file and
+        "file_path" copied exactly from the [File N] header:
+        {{
+            "files": [
+                {{
+                    "file_path": "path exactly as given in the file header",
+                    {self._format_analysis_fields(indent=20, summary_hint="1-2 sentence summary of what this file does")}{relationship_format}
+                }}
+            ]
+        }}
+
+        Focus on the core functionality and potential reusability.{relationship_instructions}
+"""
+        files_block = "\n\n".join(file_sections)
+        prompt = f"""{batch_target}
+{files_block}
+        """
+        return prompt_prefix, prompt
+
+    async def _analyze_file_batch(
+        self, batch: List[Tuple[Path, str]]
+    ) -> Dict[Path, Tuple[FileSummary, Optional[List[FileRelationship]]]]:
+        """Analyze several small files with one LLM call and demultiplex the results"""
+        include_relationships = self.enable_combined_analysis
+
+        file_sections = []
+        batch_files = {}
+        for i, (file_path, content) in enumerate(batch, 1):
+            relative_path = file_path.relative_to(self.code_base_path).as_posix()
+            batch_files[relative_path] = (file_path, content)
+            file_sections.append(
+                f"        [File {i}] {relative_path}\n"
+                f"```\n{self._fit_content_to_budget(file_path, content)}\n```"
+            )
+
+        prompt_prefix, prompt = self._build_batch_analysis_prompt(
+            file_sections,
+            include_relationships,
+            [str(file_path.relative_to(self.code_base_path)) for file_path, _ in batch],
+        )
+        tokens_per_file = 500 if include_relationships else 250
+        max_tokens = min(self.llm_max_tokens, len(batch) * tokens_per_file + 200)
+        llm_response = await self._call_llm(
+            prompt, max_tokens=max_tokens, prompt_prefix=prompt_prefix
+        )
+
+        try:
+            match = re.search(r"\{.*\}", llm_response, re.DOTALL)
+            batch_data = json.loads(match.group(0))
+        except (json.JSONDecodeError, AttributeError):
+            self.logger.warning(
+                f"Batched analysis response for {len(batch)} files could not be parsed"
+            )
+            return {}
+
+        results = {}
+        for analysis_data in batch_data.get("files", []):
+            if not isinstance(analysis_data, dict):
+                continue
+
+            # Demultiplex by the path echoed back from the [File N] header
+            echoed_path = str(analysis_data.pop("file_path", "")).replace("\\", "/")
+            echoed_path = echoed_path.strip().removeprefix("./")
+            if echoed_path not in batch_files:
+                continue
+
+            file_path, content = batch_files[echoed_path]
+            relationship_data = analysis_data.pop("relationships", None)
+            await self._persist_analysis(
+                file_path, await self._get_persistent_key(content), analysis_data
+            )
+
+            file_summary = self._build_file_summary(file_path, content, analysis_data)
+            if self.content_cache is not None:
+                self._cache_file_summary(self._get_cache_key(file_path), file_summary)
+
+            relationships = None
+            if include_relationships and isinstance(relationship_data, list):
+                relationships = self._parse_relationships(
+                    file_summary, relationship_data
+                )
+            results[file_path] = (file_summary, relationships)
+
+        return results
+
+    async def _process_small_file_batches(
+        self, files_to_analyze: List[Path]
+    ) -> Tuple[List[FileSummary], List[FileRelationship], List[Path], int]:
+        """
+        Analyze small files in packed multi-file prompts.
+
+        Returns the summaries and relationships produced, the files that still
+        need per-file analysis and the number of batched requests made.
+        """
+        batches, remaining_files = await self._plan_small_file_batches(files_to_analyze)
+        if not batches:
+            return [], [], remaining_files, 0
+
+        self.logger.info(
+            f"Packing {sum(len(batch) for batch in batches)} small files into {len(batches)} batched LLM requests"
+        )
+
+        # As on the per-file path: enough slots for the largest window the
+        # limiter may open, which paces the LLM requests themselves
+        parallelism = (
+            self._get_concurrency_limiter().max_limit
+            if self.enable_concurrent_analysis
+            else 1
+        )
+        semaphore = asyncio.Semaphore(parallelism)
+
+        async def _run_batch(batch):
+            async with semaphore:
+                results = await self._analyze_file_batch(batch)
+                await asyncio.sleep(self.request_delay)
+                return results
+
+        batch_results = await asyncio.gather(
+            *[_run_batch(batch) for batch in batches], return_exceptions=True
+        )
+
+        file_summaries = []
+        all_relationships = []
+        pending_relationships = []
+        for batch, results in zip(batches, batch_results):
+            if isinstance(results, Exception):
+                self.logger.warning(f"Batched analysis failed: {results}")
+                results = {}
+
+            for file_path, _ in batch:
+                if file_path not in results:
+                    # Missing from the response, analyze individually
+                    remaining_files.append(file_path)
+                    continue
+
+                file_summary, relationships = results[file_path]
+                file_summaries.append(file_summary)
+                if relationships is None:
+                    pending_relationships.append(file_summary)
+                else:
+                    all_relationships.extend(relationships)
+
+        # Relationships not produced by the batch prompt are requested per file
+        async def _find_with_semaphore(file_summary):
+            async with semaphore:
+                return await self.find_relationships(file_summary)
+
+        for relationships in await asyncio.gather(
+            *[_find_with_semaphore(summary) for summary in pending_relationships]
+        ):
+            all_relationships.extend(relationships)
+
+        return file_summaries, all_relationships, remaining_files, len(batches)
+
+    def _get_index_output_path(self, repo_name: str) -> Path:
+        """Path of the index JSON file for a repository"""
+        output_filename = self.index_filename_pattern.format(repo_name=repo_name)
+        return self.output_dir / output_filename
+
+    def _get_journal_path(self, repo_name: str) -> Path:
+        """Path of the in-progress JSONL journal for a repository"""
+        return self._get_index_output_path(repo_name).with_suffix(".journal.jsonl")
+
+    def _open_journal(
+        self, repo_name: str, content_hashes: Dict[str, Optional[str]]
+    ) -> Tuple[IndexJournal, Dict[str, Dict[str, Any]]]:
+        """Open the repository journal, returning it with the entries to resume"""
+        journal = IndexJournal(
+            self._get_journal_path(repo_name),
+            {
+                "analyzer_version": self._get_file_analyzer_version(),
+                "target_structure_hash": self._get_target_structure_hash(),
+            },
+            content_hashes,
+        )
+        try:
+            journal_entries = journal.load()
+        except (OSError, KeyError, TypeError) as e:
+            self.logger.warning(f"Ignoring unreadable journal {journal.path}: {e}")
+            journal_entries = {}
+        journal.open(resume=bool(journal_entries))
+        return journal, journal_entries
+
+    def _split_by_journal(
+        self,
+        files_to_analyze: List[Path],
+        content_hashes: Dict[str, Optional[str]],
+        journal_entries: Dict[str, Dict[str, Any]],
+    ) -> Tuple[List[FileSummary], List[FileRelationship], List[Path]]:
+        """
+        Resume files finished by an interrupted run.
+
+        Returns the resumed summaries and relationships, and the files that
+        still need analysis.
+        """
+        resumed_summaries = []
+        resumed_relationships = []
+        remaining_files = []
+        for file_path in files_to_analyze:
+            relative_path = str(file_path.relative_to(self.code_base_path))
+            entry = journal_entries.get(relative_path)
+            content_hash = content_hashes.get(relative_path)
+            if (
+                entry is None
+                or content_hash is None
+                or entry.get("content_hash") != content_hash
+                or entry["file_summary"].get("file_type") == "error"
+            ):
+                remaining_files.append(file_path)
+                continue
+
+            try:
+                resumed_summaries.append(FileSummary(**entry["file_summary"]))
+                resumed_relationships.extend(
+                    FileRelationship(**relationship)
+                    for relationship in entry.get("relationships", [])
+                )
+            except TypeError:
+                remaining_files.append(file_path)
+
+        return resumed_summaries, resumed_relationships, remaining_files
+
+    def _get_file_analyzer_version(self) -> str:
+        """Analyzer version recorded per file; includes the analysis mode in use"""
+        version = ANALYZER_VERSION
+        if self.offline_mode:
+            version += "+offline"
+        elif self.enable_static_extraction:
+            version += "+static"
+        return version
+
+    def _get_target_structure_hash(self) -> str:
+        """Hash of the target structure; relationships are only valid for the same one"""
+        return hashlib.sha256((self.target_structure or "").encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _hash_file_content(file_path: Path) -> Optional[str]:
+        """SHA-256 of a file's bytes, or None if it cannot be read"""
+        try:
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        except (OSError, PermissionError):
+            return None
+
+    def _get_repo_files_digest(self, all_files: List[Path]) -> str:
+        """Digest of the repository file list, used to reuse pre-filtering results"""
+        relative_paths = sorted(
+            str(file_path.relative_to(self.code_base_path)) for file_path in all_files
+        )
+        return hashlib.sha256("\n".join(relative_paths).encode("utf-8")).hexdigest()
+
+    def _load_previous_index(self, repo_name: str) -> Optional[Dict[str, Any]]:
+        """Load the existing index if its manifest can seed an incremental run"""
+        index_path = self._get_index_output_path(repo_name)
+        if not index_path.exists():
+            return None
+
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                previous_index = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable previous index {index_path}: {e}")
+            return None
+
+        manifest = previous_index.get("manifest") or {}
+        if not manifest.get("files"):
+            return None
+
+        if manifest.get("target_structure_hash") != self._get_target_structure_hash():
+            self.logger.info(
+                f"Target structure changed since last index of {repo_name}, rebuilding from scratch"
+            )
+            return None
+
+        return previous_index
+
+    def _split_by_manifest(
+        self,
+        files_to_analyze: List[Path],
+        content_hashes: Dict[str, Optional[str]],
+        previous_index: Dict[str, Any],
+    ) -> Tuple[List[FileSummary], List[FileRelationship], List[Path]]:
+        """
+        Reuse analyses of files unchanged since the previous index.
+
+        Returns the reused summaries and relationships, and the files that were
+        added or changed and therefore need analysis.
+        """
+        previous_files = previous_index["manifest"]["files"]
+        previous_summaries = {
+            summary.get("file_path"): summary
+            for summary in previous_index.get("file_summaries", [])
+        }
+        previous_relationships = defaultdict(list)
+        for relationship in previous_index.get("relationships", []):
+            previous_relationships[relationship.get("repo_file_path")].append(
+                relationship
+            )
+
+        reused_summaries = []
+        reused_relationships = []
+        changed_files = []
+        for file_path in files_to_analyze:
+            relative_path = str(file_path.relative_to(self.code_base_path))
+            entry = previous_files.get(relative_path, {})
+            content_hash = content_hashes.get(relative_path)
+            if (
+                content_hash is None
+                or entry.get("content_hash") != content_hash
+                or entry.get("analyzer_version") != self._get_file_analyzer_version()
+                or relative_path not in previous_summaries
+            ):
+                changed_files.append(file_path)
+                continue
+
+            try:
+                reused_summaries.append(
+                    FileSummary(**previous_summaries[relative_path])
+                )
+                reused_relationships.extend(
+                    FileRelationship(**relationship)
+                    for relationship in previous_relationships[relative_path]
+                )
+            except TypeError:
+                # Entry written by an incompatible index format
+                changed_files.append(file_path)
+
+        return reused_summaries, reused_relationships, changed_files
+
     async def process_repository(self, repo_path: Path) -> RepoIndex:
         """Process a single repository and create complete index with optional concurrent processing"""
+        progress = RepoProgress(
+            repo_name=repo_path.name, status="running", started_at=time.time()
+        )
+        self.repo_progress[progress.repo_name] = progress
+        token = _current_repo_progress.set(progress)
+        try:
+            repo_index = await self._build_repository_index(repo_path, progress)
+            progress.status = "completed"
+            return repo_index
+        except Exception:
+            progress.status = "failed"
+            raise
+        finally:
+            progress.finished_at = time.time()
+            if progress.journal is not None:
+                progress.journal.close()
+            self.repo_walks.pop(str(repo_path), None)
+            _current_repo_progress.reset(token)
+
+    async def _build_repository_index(
+        self, repo_path: Path, progress: RepoProgress
+    ) -> RepoIndex:
+        """Run the indexing pipeline for one repository, updating its progress"""
         repo_name = repo_path.name
         self.logger.info(f"Processing repository: {repo_name}")
 
-        # Step 1: Generate file tree
-        self.logger.info("Generating file tree structure...")
-        file_tree = self.generate_file_tree(repo_path)
-
-        # Step 2: Get all files
+        # Step 1: Get all files
         all_files = self.get_all_repo_files(repo_path)
         self.logger.info(f"Found {len(all_files)} files in {repo_name}")
-
-        # Step 3: LLM pre-filtering of relevant files
-        if self.enable_pre_filtering:
-            self.logger.info("Using LLM for file pre-filtering...")
-            selected_file_paths = await self.pre_filter_files(repo_path, file_tree)
+        repo_files_digest = self._get_repo_files_digest(all_files)
+
+        previous_index = None
+        if self.enable_incremental_indexing:
+            previous_index = self._load_previous_index(repo_name)
+        previous_manifest = previous_index["manifest"] if previous_index else {}
+
+        # Step 2: Pre-filter relevant files
+        if (
+            self.enable_pre_filtering
+            and previous_manifest.get("repo_files_digest") == repo_files_digest
+            and previous_manifest.get("pre_filter_strategy") == self.pre_filter_strategy
+            and previous_manifest.get("selected_files")
+        ):
+            # Same file list and target as last run, reuse its selection
+            self.logger.info(
+                "Repository file list unchanged, reusing previous selection"
+            )
+            selected_file_paths = previous_manifest["selected_files"]
+        elif self.enable_pre_filtering:
+            selected_file_paths = await self.select_relevant_files(repo_path, all_files)
         else:
             self.logger.info("Pre-filtering is disabled, will analyze all files")
             selected_file_paths = []
 
-        # Step 4: Filter file list based on filtering results
+        # Step 3: Filter file list based on filtering results
         if selected_file_paths:
             files_to_analyze = self.filter_files_by_paths(
                 all_files, selected_file_paths, repo_path
             )
             self.logger.info(
-                f"After LLM filtering, will analyze {len(files_to_analyze)} relevant files (from {len(all_files)} total)"
+                f"After pre-filtering, will analyze {len(files_to_analyze)} relevant files (from {len(all_files)} total)"
             )
         else:
             files_to_analyze = all_files
-            self.logger.info("LLM filtering failed, will analyze all files")
+            self.logger.info("No files pre-selected, will analyze all files")
 
-        # Step 5: Analyze filtered files (concurrent or sequential)
-        if self.enable_concurrent_analysis and len(files_to_analyze) > 1:
+        progress.files_total = len(files_to_analyze)
+
+        # Step 4: Skip files unchanged since the previous index
+        content_hashes = {
+            str(file_path.relative_to(self.code_base_path)): self._hash_file_content(
+                file_path
+            )
+            for file_path in files_to_analyze
+        }
+        reused_summaries = []
+        reused_relationships = []
+        changed_files = files_to_analyze
+        deleted_files = 0
+        excluded_files = 0
+        if previous_index:
+            (
+                reused_summaries,
+                reused_relationships,
+                changed_files,
+            ) = self._split_by_manifest(
+                files_to_analyze, content_hashes, previous_index
+            )
+            # Files no longer analyzed either left the disk or are now
+            # excluded by the filters (extension, size, ignore rules, selection)
+            for relative_path in set(previous_manifest["files"]) - set(content_hashes):
+                if (self.code_base_path / relative_path).exists():
+                    excluded_files += 1
+                else:
+                    deleted_files += 1
+            self.logger.info(
+                f"Incremental indexing: reusing {len(reused_summaries)} unchanged files, "
+                f"re-analyzing {len(changed_files)} added/changed files, "
+                f"dropping {deleted_files} deleted and {excluded_files} excluded files"
+            )
+            self._advance_repo_progress(len(reused_summaries))
+
+        # Resume files finished by an interrupted run from the journal
+        resumed_summaries = []
+        resumed_relationships = []
+        pending_files = changed_files
+        if self.enable_index_journal:
+            progress.journal, journal_entries = self._open_journal(
+                repo_name, content_hashes
+            )
+            if journal_entries:
+                (
+                    resumed_summaries,
+                    resumed_relationships,
+                    pending_files,
+                ) = self._split_by_journal(
+                    changed_files, content_hashes, journal_entries
+                )
+                self.logger.info(
+                    f"Resuming from journal: {len(resumed_summaries)} files already analyzed, "
+                    f"{len(pending_files)} remaining"
+                )
+                self._advance_repo_progress(len(resumed_summaries))
+
+        # Shortlist target files per repo file so prompts skip the full plan
+        if self.target_candidates_top_k > 0 and not self.offline_mode and pending_files:
+            progress.target_candidates = self._select_target_candidates(pending_files)
+
+        # Step 5: Pack small files into multi-file LLM requests
+        batched_summaries = []
+        batched_relationships = []
+        batch_requests = 0
+        remaining_files = pending_files
+        if (
+            self.enable_batch_analysis
+            and not self.offline_mode
+            and len(pending_files) > 1
+        ):
+            (
+                batched_summaries,
+                batched_relationships,
+                remaining_files,
+                batch_requests,
+            ) = await self._process_small_file_batches(pending_files)
+
+            relationships_by_file = defaultdict(list)
+            for relationship in batched_relationships:
+                relationships_by_file[relationship.repo_file_path].append(relationship)
+            for file_summary in batched_summaries:
+                self._journal_file_result(
+                    file_summary, relationships_by_file[file_summary.file_path]
+                )
+            self._advance_repo_progress(len(batched_summaries))
+
+        # Step 6: Analyze remaining files (concurrent or sequential)
+        if self.enable_concurrent_analysis and len(remaining_files) > 1:
+            limiter = self._get_concurrency_limiter()
             self.logger.info(
-                f"Using concurrent analysis with max {self.max_concurrent_files} parallel files"
+                f"Using concurrent analysis, LLM request window {limiter.window} "
+                f"(max {limiter.max_limit})"
             )
             file_summaries, all_relationships = await self._process_files_concurrently(
-                files_to_analyze
+                remaining_files
             )
         else:
             self.logger.info("Using sequential file analysis")
             file_summaries, all_relationships = await self._process_files_sequentially(
-                files_to_analyze
+                remaining_files
             )
+        # Compact journaled and freshly analyzed results into the final index
+        file_summaries = (
+            reused_summaries + resumed_summaries + batched_summaries + file_summaries
+        )
+        all_relationships = (
+            reused_relationships
+            + resumed_relationships
+            + batched_relationships
+            + all_relationships
+        )
+
+        # Files that failed analysis stay out of the manifest so they are retried
+        manifest_files = {}
+        for file_summary in file_summaries:
+            content_hash = content_hashes.get(file_summary.file_path)
+            if content_hash and file_summary.file_type != "error":
+                manifest_files[file_summary.file_path] = {
+                    "content_hash": content_hash,
+                    "analyzer_version": self._get_file_analyzer_version(),
+                }
+
+        cache_stats = self._get_cache_stats()
+        limiter_stats = self._get_concurrency_limiter().stats()
 
-        # Step 6: Create repository index
+        # Step 7: Create repository index
         repo_index = RepoIndex(
             repo_name=repo_name,
             total_files=len(all_files),  # Record original file count
@@ -1024,8 +2341,11 @@ class CodeIndexer:
                         if r.confidence_score > self.high_confidence_threshold
                     ]
                 ),
-                "analyzer_version": "1.4.0",  # Updated version to reflect augmented LLM support
+                "analyzer_version": ANALYZER_VERSION,
                 "pre_filtering_enabled": self.enable_pre_filtering,
+                "pre_filter_strategy": self.pre_filter_strategy,
+                "static_extraction_enabled": self.enable_static_extraction,
+                "offline_mode": self.offline_mode,
                 "files_before_filtering": len(all_files),
                 "files_after_filtering": len(files_to_analyze),
                 "filtering_efficiency": round(
@@ -1037,8 +2357,52 @@ class CodeIndexer:
                 "min_confidence_score": self.min_confidence_score,
                 "high_confidence_threshold": self.high_confidence_threshold,
                 "concurrent_analysis_used": self.enable_concurrent_analysis,
+                "adaptive_concurrency_enabled": self.enable_adaptive_concurrency,
+                "concurrency_window": limiter_stats["window"],
+                "peak_concurrency_window": limiter_stats["peak_window"],
+                "rate_limited_requests": limiter_stats["rate_limited"],
+                "llm_throughput_rps": limiter_stats["throughput_rps"],
+                "combined_analysis_enabled": self.enable_combined_analysis,
+                "target_candidates_top_k": self.target_candidates_top_k,
+                "target_narrowed_files": sum(
+                    1 for entries in progress.target_candidates.values() if entries
+                ),
+                "batch_analysis_enabled": self.enable_batch_analysis,
+                "batched_files": len(batched_summaries),
+                "batch_requests": batch_requests,
+                "incremental_indexing_used": previous_index is not None,
+                "reused_files": len(reused_summaries),
+                "resumed_files": len(resumed_summaries),
+                "reanalyzed_files": len(pending_files),
+                "deleted_files": deleted_files,
+                "excluded_files": excluded_files,
                 "content_caching_enabled": self.enable_content_caching,
-                "cache_hits": len(self.content_cache) if self.content_cache else 0,
+                "cache_hits": progress.cache_hits,
+                "cache_misses": progress.cache_misses,
+                "cache_evictions": progress.cache_evictions,
+                "cache_entries": cache_stats["entries"],
+                "cache_bytes": cache_stats["bytes"],
+                "persistent_cache_enabled": self.enable_persistent_cache,
+                "persistent_cache_hits": progress.persistent_cache_hits,
+                "llm_requests": progress.llm_requests,
+                "prompt_caching_enabled": self.enable_prompt_caching,
+                "prompt_tokens": progress.prompt_tokens,
+                "cached_prompt_tokens": progress.cached_prompt_tokens,
+                "cache_write_tokens": progress.cache_write_tokens,
+                "processing_seconds": round(time.time() - progress.started_at, 2),
+            },
+            manifest={
+                "analyzer_version": ANALYZER_VERSION,
+                "target_structure_hash": self._get_target_structure_hash(),
+                "repo_files_digest": repo_files_digest,
+                "pre_filter_strategy": self.pre_filter_strategy,
+                "selected_files": [
+                    str(file_path.relative_to(repo_path))
+                    for file_path in files_to_analyze
+                ]
+                if selected_file_paths
+                else [],
+                "files": manifest_files,
             },
         )
 
@@ -1065,123 +2429,67 @@ class CodeIndexer:
         return file_summaries, all_relationships
 
     async def _process_files_concurrently(self, files_to_analyze: list) -> tuple:
-        """Process files concurrently with semaphore limiting"""
-        file_summaries = []
-        all_relationships = []
-
-        # Create semaphore to limit concurrent tasks
-        semaphore = asyncio.Semaphore(self.max_concurrent_files)
-        tasks = []
-
-        async def _process_with_semaphore(file_path: Path, index: int, total: int):
-            async with semaphore:
-                # Add a small delay to space out concurrent requests
-                if index > 1:
-                    await asyncio.sleep(
-                        self.request_delay * 0.5
-                    )  # Reduced delay for concurrent processing
-                return await self._analyze_single_file_with_relationships(
-                    file_path, index, total
-                )
-
-        try:
-            # Create tasks for all files
-            tasks = [
-                _process_with_semaphore(file_path, i, len(files_to_analyze))
-                for i, file_path in enumerate(files_to_analyze, 1)
-            ]
-
-            # Process tasks and collect results
-            if self.verbose_output:
-                self.logger.info(
-                    f"Starting concurrent analysis of {len(tasks)} files..."
-                )
-
-            try:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-
-                for i, result in enumerate(results):
-                    if isinstance(result, Exception):
-                        self.logger.error(
-                            f"Failed to analyze file {files_to_analyze[i]}: {result}"
-                        )
-                        # Create error summary
-                        error_summary = FileSummary(
-                            file_path=str(
-                                files_to_analyze[i].relative_to(self.code_base_path)
-                            ),
-                            file_type="error",
-                            main_functions=[],
-                            key_concepts=[],
-                            dependencies=[],
-                            summary=f"Concurrent analysis failed: {str(result)}",
-                            lines_of_code=0,
-                            last_modified="",
-                        )
-                        file_summaries.append(error_summary)
-                    else:
-                        file_summary, relationships = result
-                        file_summaries.append(file_summary)
-                        all_relationships.extend(relationships)
-
-            except Exception as e:
-                self.logger.error(f"Concurrent processing failed: {e}")
-                # Cancel any remaining tasks
-                for task in tasks:
-                    if not task.done() and not task.cancelled():
-                        task.cancel()
-
-                # Wait for cancelled tasks to complete
+        """Process files concurrently, pacing LLM requests with the adaptive limiter"""
+        limiter = self._get_concurrency_limiter()
+        total = len(files_to_analyze)
+        results = [None] * total
+        pending_files = iter(enumerate(files_to_analyze))
+
+        async def _worker():
+            for position, file_path in pending_files:
+                if not self.enable_adaptive_concurrency and position > 0:
+                    # Fixed window keeps the original spacing between requests
+                    await asyncio.sleep(self.request_delay * 0.5)
                 try:
-                    await asyncio.sleep(0.1)  # Brief wait for cancellation
-                except Exception:
-                    pass
-
-                # Fallback to sequential processing
-                self.logger.info("Falling back to sequential processing...")
-                return await self._process_files_sequentially(files_to_analyze)
-
-            if self.verbose_output:
-                self.logger.info(
-                    f"Concurrent analysis completed: {len(file_summaries)} files processed"
-                )
-
-            return file_summaries, all_relationships
-
-        except Exception as e:
-            # Ensure all tasks are cancelled in case of unexpected errors
-            if tasks:
-                for task in tasks:
-                    if not task.done() and not task.cancelled():
-                        task.cancel()
-
-            # Wait briefly for cancellation to complete
-            try:
-                await asyncio.sleep(0.1)
-            except Exception:
-                pass
+                    results[
+                        position
+                    ] = await self._analyze_single_file_with_relationships(
+                        file_path, position + 1, total
+                    )
+                except Exception as e:
+                    self.logger.error(f"Failed to analyze file {file_path}: {e}")
+                    error_summary = FileSummary(
+                        file_path=str(file_path.relative_to(self.code_base_path)),
+                        file_type="error",
+                        main_functions=[],
+                        key_concepts=[],
+                        dependencies=[],
+                        summary=f"Concurrent analysis failed: {str(e)}",
+                        lines_of_code=0,
+                        last_modified="",
+                    )
+                    results[position] = (error_summary, [])
 
-            self.logger.error(f"Critical error in concurrent processing: {e}")
-            # Fallback to sequential processing
+        # Enough workers to fill the largest window the limiter may open; the
+        # limiter decides how many of their LLM requests run at once
+        worker_count = min(limiter.max_limit, total)
+        if self.verbose_output:
             self.logger.info(
-                "Falling back to sequential processing due to critical error..."
+                f"Starting concurrent analysis of {total} files with {worker_count} workers..."
             )
-            return await self._process_files_sequentially(files_to_analyze)
 
+        workers = [asyncio.create_task(_worker()) for _ in range(worker_count)]
+        try:
+            await asyncio.gather(*workers)
         finally:
-            # Final cleanup: ensure all tasks are properly finished
-            if tasks:
-                for task in tasks:
-                    if not task.done() and not task.cancelled():
-                        task.cancel()
+            for worker in workers:
+                if not worker.done():
+                    worker.cancel()
 
-            # Clear task references to help with garbage collection
-            tasks.clear()
+        file_summaries = []
+        all_relationships = []
+        for file_summary, relationships in results:
+            file_summaries.append(file_summary)
+            all_relationships.extend(relationships)
 
-            # Force garbage collection to help clean up semaphore and related resources
-            import gc
+        limiter_stats = limiter.stats()
+        self.logger.info(
+            f"Concurrent analysis completed: {len(file_summaries)} files, "
+            f"window {limiter_stats['window']} (peak {limiter_stats['peak_window']}), "
+            f"{limiter_stats['throughput_rps']} LLM req/s"
+        )
 
-            gc.collect()
+        return file_summaries, all_relationships
 
     async def build_all_indexes(self) -> Dict[str, str]:
         """Build indexes for all repositories in code_base"""
@@ -1202,56 +2510,41 @@ class CodeIndexer:
 
         self.logger.info(f"Found {len(repo_dirs)} repositories to process")
 
-        # Process each repository
-        output_files = {}
-        statistics_data = []
-
+        # Repositories share one LLM request window (the adaptive limiter), which
+        # splits free slots fairly between them. With concurrent analysis off
+        # they run one at a time, like their files.
         for repo_dir in repo_dirs:
-            try:
-                # Process repository
-                repo_index = await self.process_repository(repo_dir)
-
-                # Generate output filename using configured pattern
-                output_filename = self.index_filename_pattern.format(
-                    repo_name=repo_index.repo_name
-                )
-                output_file = self.output_dir / output_filename
-
-                # Get output configuration
-                output_config = self.indexer_config.get("output", {})
-                json_indent = output_config.get("json_indent", 2)
-                ensure_ascii = not output_config.get("ensure_ascii", False)
-
-                # Save to JSON file
-                with open(output_file, "w", encoding="utf-8") as f:
-                    if self.include_metadata:
-                        json.dump(
-                            asdict(repo_index),
-                            f,
-                            indent=json_indent,
-                            ensure_ascii=ensure_ascii,
-                        )
-                    else:
-                        # Save without metadata if disabled
-                        index_data = asdict(repo_index)
-                        index_data.pop("analysis_metadata", None)
-                        json.dump(
-                            index_data, f, indent=json_indent, ensure_ascii=ensure_ascii
-                        )
+            self.repo_progress[repo_dir.name] = RepoProgress(repo_name=repo_dir.name)
+        max_concurrent_repos = (
+            self.max_concurrent_repos if self.enable_concurrent_analysis else 1
+        )
+        semaphore = asyncio.Semaphore(max(1, max_concurrent_repos))
+        completed_repos = 0
 
-                output_files[repo_index.repo_name] = str(output_file)
-                self.logger.info(
-                    f"Saved index for {repo_index.repo_name} to {output_file}"
-                )
+        async def _index_with_semaphore(repo_dir: Path):
+            nonlocal completed_repos
+            async with semaphore:
+                result = await self._index_and_save_repository(repo_dir)
+            completed_repos += 1
+            self.logger.info(
+                f"Repositories finished: {completed_repos}/{len(repo_dirs)} "
+                f"({repo_dir.name}: {self.repo_progress[repo_dir.name].status})"
+            )
+            return result
 
-                # Collect statistics for report
-                if self.generate_statistics:
-                    stats = self._extract_repository_statistics(repo_index)
-                    statistics_data.append(stats)
+        results = await asyncio.gather(
+            *[_index_with_semaphore(repo_dir) for repo_dir in repo_dirs]
+        )
 
-            except Exception as e:
-                self.logger.error(f"Failed to process repository {repo_dir.name}: {e}")
+        output_files = {}
+        statistics_data = []
+        for result in results:
+            if result is None:
                 continue
+            repo_name, output_file, stats = result
+            output_files[repo_name] = output_file
+            if stats is not None:
+                statistics_data.append(stats)
 
         # Generate additional reports if configured
         if self.generate_summary:
@@ -1264,6 +2557,63 @@ class CodeIndexer:
 
         return output_files
 
+    async def _index_and_save_repository(
+        self, repo_dir: Path
+    ) -> Optional[Tuple[str, str, Optional[Dict[str, Any]]]]:
+        """Index one repository and write its JSON file, returning None on failure"""
+        try:
+            # Process repository
+            repo_index = await self.process_repository(repo_dir)
+
+            # Generate output filename using configured pattern
+            output_file = self._get_index_output_path(repo_index.repo_name)
+
+            # Get output configuration
+            output_config = self.indexer_config.get("output", {})
+            json_indent = output_config.get("json_indent", 2)
+            ensure_ascii = not output_config.get("ensure_ascii", False)
+
+            # Save to JSON file
+            index_data = asdict(repo_index)
+            if not self.include_metadata:
+                # Save without metadata if disabled
+                index_data.pop("analysis_metadata", None)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(index_data, f, indent=json_indent, ensure_ascii=ensure_ascii)
+
+            self.logger.info(f"Saved index for {repo_index.repo_name} to {output_file}")
+
+            # Written after the JSON, since it records the JSON's mtime and size
+            self._save_reference_artifact(output_file, index_data)
+
+            # The index now holds every journaled result
+            self._get_journal_path(repo_index.repo_name).unlink(missing_ok=True)
+
+            # Collect statistics for report
+            stats = None
+            if self.generate_statistics:
+                stats = self._extract_repository_statistics(repo_index)
+
+            return repo_index.repo_name, str(output_file), stats
+
+        except Exception as e:
+            self.logger.error(f"Failed to process repository {repo_dir.name}: {e}")
+            return None
+
+    def _save_reference_artifact(self, output_file: Path, index_data: Dict[str, Any]):
+        """Write (or drop) the precompiled reference artifact of an index file"""
+        try:
+            if self.emit_reference_artifact:
+                artifact_path = write_reference_artifact(output_file, index_data)
+                self.logger.info(f"Saved reference artifact to {artifact_path}")
+            else:
+                # A leftover artifact would be stale and is ignored, but remove it
+                reference_artifact_path(output_file).unlink(missing_ok=True)
+        except Exception as e:
+            self.logger.warning(
+                f"Failed to write reference artifact for {output_file}: {e}"
+            )
+
     def _extract_repository_statistics(self, repo_index: RepoIndex) -> Dict[str, Any]:
         """Extract statistical information from a repository index"""
         metadata = repo_index.analysis_metadata
@@ -1312,7 +2662,16 @@ class CodeIndexer:
             "average_confidence_score": round(avg_confidence, 3),
             "filtering_efficiency": metadata.get("filtering_efficiency", 0),
             "concurrent_analysis_used": metadata.get("concurrent_analysis_used", False),
+            "peak_concurrency_window": metadata.get("peak_concurrency_window", 0),
+            "rate_limited_requests": metadata.get("rate_limited_requests", 0),
             "cache_hits": metadata.get("cache_hits", 0),
+            "cache_misses": metadata.get("cache_misses", 0),
+            "cache_evictions": metadata.get("cache_evictions", 0),
+            "persistent_cache_hits": metadata.get("persistent_cache_hits", 0),
+            "llm_requests": metadata.get("llm_requests", 0),
+            "prompt_tokens": metadata.get("prompt_tokens", 0),
+            "cached_prompt_tokens": metadata.get("cached_prompt_tokens", 0),
+            "processing_seconds": metadata.get("processing_seconds", 0),
             "analysis_date": metadata.get("analysis_date", "unknown"),
         }
 
@@ -1350,16 +2709,21 @@ class CodeIndexer:
             total_relationships / total_repos if total_repos else 0
         )
         avg_lines_per_repo = total_lines / total_repos if total_repos else 0
+        limiter_stats = self._get_concurrency_limiter().stats()
 
         # Build statistics report
         statistics_report = {
             "report_generation_time": datetime.now().isoformat(),
-            "analyzer_version": "1.4.0",
+            "analyzer_version": ANALYZER_VERSION,
             "configuration_used": {
                 "config_file": self.indexer_config_path,
                 "concurrent_analysis_enabled": self.enable_concurrent_analysis,
+                "adaptive_concurrency_enabled": self.enable_adaptive_concurrency,
+                "combined_analysis_enabled": self.enable_combined_analysis,
                 "content_caching_enabled": self.enable_content_caching,
+                "persistent_cache_enabled": self.enable_persistent_cache,
                 "pre_filtering_enabled": self.enable_pre_filtering,
+                "pre_filter_strategy": self.pre_filter_strategy,
                 "min_confidence_score": self.min_confidence_score,
                 "high_confidence_threshold": self.high_confidence_threshold,
             },
@@ -1377,19 +2741,76 @@ class CodeIndexer:
             "relationship_type_distribution": aggregated_rel_types,
             "file_type_distribution": aggregated_file_types,
             "repository_details": statistics_data,
+            "repository_progress": {
+                repo_name: {
+                    "status": progress.status,
+                    "files_total": progress.files_total,
+                    "files_done": progress.files_done,
+                    "llm_requests": progress.llm_requests,
+                    "cached_prompt_tokens": progress.cached_prompt_tokens,
+                    "duration_seconds": round(
+                        progress.finished_at - progress.started_at, 2
+                    )
+                    if progress.started_at and progress.finished_at
+                    else None,
+                }
+                for repo_name, progress in self.repo_progress.items()
+            },
             "performance_metrics": {
                 "concurrent_processing_repos": sum(
                     1
                     for s in statistics_data
                     if s.get("concurrent_analysis_used", False)
                 ),
+                "prompt_caching": {
+                    "enabled": self.enable_prompt_caching,
+                    "total_prompt_tokens": self.llm_usage.get("prompt_tokens", 0),
+                    "total_cached_tokens": self.llm_usage.get("cached_tokens", 0),
+                    "total_cache_write_tokens": self.llm_usage.get(
+                        "cache_write_tokens", 0
+                    ),
+                    "cached_token_ratio": round(
+                        self.llm_usage.get("cached_tokens", 0)
+                        / self.llm_usage["prompt_tokens"],
+                        3,
+                    )
+                    if self.llm_usage.get("prompt_tokens")
+                    else 0,
+                },
+                "concurrency": {
+                    "max_concurrent_repositories": (
+                        self.max_concurrent_repos
+                        if self.enable_concurrent_analysis
+                        else 1
+                    ),
+                    "total_llm_requests": sum(
+                        s.get("llm_requests", 0) for s in statistics_data
+                    ),
+                    "final_window": limiter_stats["window"],
+                    "peak_window": max(
+                        (s.get("peak_concurrency_window", 0) for s in statistics_data),
+                        default=0,
+                    ),
+                    "total_rate_limited_requests": limiter_stats["rate_limited"],
+                    "total_timeouts": limiter_stats["timeouts"],
+                    "llm_throughput_rps": limiter_stats["throughput_rps"],
+                },
                 "cache_efficiency": {
                     "total_cache_hits": sum(
                         s.get("cache_hits", 0) for s in statistics_data
                     ),
+                    "total_cache_misses": sum(
+                        s.get("cache_misses", 0) for s in statistics_data
+                    ),
+                    "total_cache_evictions": sum(
+                        s.get("cache_evictions", 0) for s in statistics_data
+                    ),
                     "repositories_with_caching": sum(
                         1 for s in statistics_data if s.get("cache_hits", 0) > 0
                     ),
+                    "total_persistent_cache_hits": sum(
+                        s.get("persistent_cache_hits", 0) for s in statistics_data
+                    ),
                 },
                 "filtering_efficiency": {
                     "average_filtering_efficiency": round(
@@ -1442,10 +2863,12 @@ class CodeIndexer:
                 "config_file_used": self.indexer_config_path,
                 "api_config_file": self.config_path,
                 "pre_filtering_enabled": self.enable_pre_filtering,
+                "pre_filter_strategy": self.pre_filter_strategy,
                 "min_confidence_score": self.min_confidence_score,
                 "high_confidence_threshold": self.high_confidence_threshold,
                 "max_file_size": self.max_file_size,
                 "max_content_length": self.max_content_length,
+                "content_excerpt_strategy": self.content_excerpt_strategy,
                 "request_delay": self.request_delay,
                 "supported_extensions_count": len(self.supported_extensions),
                 "skip_directories_count": len(self.skip_directories),
@@ -1537,7 +2960,7 @@ async def main():
             f"🗄️  Content caching: {'enabled' if indexer.enable_content_caching else 'disabled'}"
         )
         print(
-            f"🔍 Pre-filtering: {'enabled' if indexer.enable_pre_filtering else 'disabled'}"
+            f"🔍 Pre-filtering: {indexer.pre_filter_strategy if indexer.enable_pre_filtering else 'disabled'}"
         )
         print(f"🐛 Debug mode: {'enabled' if indexer.verbose_output else 'disabled'}")
         print(
@@ -1578,7 +3001,12 @@ async def main():
 
         # Performance information
         if indexer.enable_content_caching and indexer.content_cache:
-            print(f"🗄️  Cache performance: {len(indexer.content_cache)} items cached")
+            cache_stats = indexer.content_cache.stats()
+            print(
+                f"🗄️  Cache performance: {cache_stats['hits']} hits, "
+                f"{cache_stats['misses']} misses, {cache_stats['evictions']} evictions, "
+                f"{cache_stats['entries']} items ({cache_stats['bytes']} bytes) cached"
+            )
 
         print("\n🎉 Code indexing process completed successfully!")
 
@@ -1619,20 +3047,40 @@ def print_usage_example():
 
     3. Enable concurrent processing:
        - Set performance.enable_concurrent_analysis: true
-       - Adjust performance.max_concurrent_files as needed
+       - performance.max_concurrent_files is the starting LLM request window
+       - Set performance.enable_adaptive_concurrency: true to grow the window up to
+         performance.max_concurrent_requests and back off on 429s/timeouts
+       - performance.max_concurrent_repos repositories share that window fairly
+         (repositories are indexed one at a time when concurrent analysis is off)
+       - Set performance.enable_combined_analysis: true for one LLM call per file
 
     4. Enable caching:
        - Set performance.enable_content_caching: true
-       - Adjust performance.max_cache_size as needed
+       - Adjust performance.max_cache_bytes as needed (LRU byte budget)
+       - Set performance.enable_persistent_cache: true to reuse analyses across runs
+       - Adjust performance.persistent_cache_path to share the cache database
+       - Set performance.enable_index_journal: true to resume interrupted runs
 
     5. Mock mode for testing:
        - Set debug.mock_llm_responses: true
        - No API calls will be made
 
-    6. Custom output:
+    6. Offline (no-LLM) indexing:
+       - Set llm.offline_mode: true
+       - Summaries come from static extraction and docstrings, no relationships
+
+    7. Choose how files are pre-selected:
+       - file_analysis.pre_filter_strategy: "lexical" (no LLM), "lexical_llm" or "llm"
+       - Adjust file_analysis.pre_filter_top_n to size the lexical shortlist
+
+    8. Custom output:
        - Modify output.index_filename_pattern
        - Set output.generate_statistics: true for detailed reports
 
+    9. Offline throughput benchmark (simulated LLM, no API calls):
+       - Run from the repository root: python -m tools.indexer_benchmark --files 200
+       - Tune --latency, --error-rate, --languages and --modes
+
     📋 Configuration file location: tools/indexer_config.yaml
     """)
 
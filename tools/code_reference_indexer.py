@@ -15,14 +15,38 @@ Key Improvement:
 - Single tool call that handles all steps internally
 - Agent only needs to provide indexes_path and target_file
 - No dependency on calling order or global state management
+- Parsed indexes stay resident between calls, re-read only when a file's
+  mtime or size changes
+- BM25 over postings lists built once per index load, with heap top-k selection
+- Relationships hashed by normalized target path; substring matching only on a miss
+- Batch tool answering many target files in one call with compact JSON
+- Precompiled .refidx artifacts next to the JSON skip parsing and index
+  building on a cold start
 """
 
+import heapq
 import json
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 import logging
 
+from tools.file_ranking import tokenize
+from tools.reference_index import (  # noqa: F401 - re-exported for callers
+    CodeReference,
+    CompiledReferenceIndex,
+    RelationshipInfo,
+    build_reference_search_index,
+    build_relationship_lookup,
+    compile_reference_index,
+    extract_code_references,
+    extract_relationships,
+    load_reference_artifact,
+    normalize_target_path,
+    path_suffixes,
+    references_matching_name,
+)
+
 # Import MCP modules
 from mcp.server.fastmcp import FastMCP
 
@@ -35,190 +59,257 @@ mcp = FastMCP("code-reference-indexer")
 
 
 @dataclass
-class CodeReference:
-    """Code reference information structure"""
-
-    file_path: str
-    file_type: str
-    main_functions: List[str]
-    key_concepts: List[str]
-    dependencies: List[str]
-    summary: str
-    lines_of_code: int
-    repo_name: str
-    confidence_score: float = 0.0
-
-
-@dataclass
-class RelationshipInfo:
-    """Relationship information structure"""
-
-    repo_file_path: str
-    target_file_path: str
-    relationship_type: str
-    confidence_score: float
-    helpful_aspects: List[str]
-    potential_contributions: List[str]
-    usage_suggestions: str
-
-
-def load_index_files_from_directory(indexes_directory: str) -> Dict[str, Dict]:
-    """Load all index files from specified directory"""
-    indexes_path = Path(indexes_directory).resolve()
+class LoadedIndex:
+    """Index file kept resident, with its compiled search structures"""
+
+    name: str
+    path: Path
+    mtime_ns: int
+    size: int
+    compiled: CompiledReferenceIndex
+    # Parsed JSON; read on demand when the index came from its artifact
+    data: Optional[Dict] = None
+    from_artifact: bool = False
+
+    def get_data(self) -> Dict:
+        """Parsed index JSON"""
+        if self.data is None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        return self.data
+
+
+class ResidentIndexCache:
+    """
+    Parsed index files kept in the server process between tool calls.
 
-    if not indexes_path.exists():
-        logger.warning(f"Indexes directory does not exist: {indexes_path}")
-        return {}
+    Each file is re-parsed only when its mtime or size changes, so repeated
+    searches against the same indexes directory cost one stat per file.
+    """
 
-    index_cache = {}
+    def __init__(self):
+        self._entries: Dict[Path, LoadedIndex] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load_directory(
+        self, indexes_directory: str
+    ) -> Tuple[Dict[str, LoadedIndex], Dict[str, int]]:
+        """
+        Return the indexes of a directory, re-parsing only changed files.
+
+        Returns:
+            (mapping of index name to loaded index, hit/miss counts of this call)
+        """
+        indexes_path = Path(indexes_directory).resolve()
+        call_stats = {"cache_hits": 0, "cache_misses": 0, "artifact_loads": 0}
+
+        if not indexes_path.exists():
+            logger.warning(f"Indexes directory does not exist: {indexes_path}")
+            return {}, call_stats
+
+        loaded = {}
+        seen = set()
+        for index_file in indexes_path.glob("*.json"):
+            try:
+                stat = index_file.stat()
+            except OSError as e:
+                logger.error(f"Failed to stat index file {index_file.name}: {e}")
+                continue
+            seen.add(index_file)
+
+            entry = self._entries.get(index_file)
+            if (
+                entry is not None
+                and entry.mtime_ns == stat.st_mtime_ns
+                and entry.size == stat.st_size
+            ):
+                call_stats["cache_hits"] += 1
+                loaded[entry.name] = entry
+                continue
+
+            call_stats["cache_misses"] += 1
+            entry = self._load_index_file(index_file, stat)
+            if entry is None:
+                self._entries.pop(index_file, None)
+                continue
+            if entry.from_artifact:
+                call_stats["artifact_loads"] += 1
+            self._entries[index_file] = entry
+            loaded[entry.name] = entry
+
+        # Forget files deleted from this directory
+        for cached_path in list(self._entries):
+            if cached_path.parent == indexes_path and cached_path not in seen:
+                del self._entries[cached_path]
+
+        self.hits += call_stats["cache_hits"]
+        self.misses += call_stats["cache_misses"]
+        if call_stats["cache_misses"]:
+            logger.info(f"Loaded {len(loaded)} index files from {indexes_path}")
+        return loaded, call_stats
+
+    @staticmethod
+    def _load_index_file(index_file: Path, stat) -> Optional[LoadedIndex]:
+        """Load one index, from its precompiled artifact when that is current"""
+        compiled = load_reference_artifact(index_file, stat)
+        if compiled is not None:
+            logger.info(f"Loaded compiled index: {index_file.name}")
+            return LoadedIndex(
+                name=index_file.stem,
+                path=index_file,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                compiled=compiled,
+                from_artifact=True,
+            )
 
-    for index_file in indexes_path.glob("*.json"):
         try:
             with open(index_file, "r", encoding="utf-8") as f:
                 index_data = json.load(f)
-                index_cache[index_file.stem] = index_data
-                logger.info(f"Loaded index file: {index_file.name}")
         except Exception as e:
             logger.error(f"Failed to load index file {index_file.name}: {e}")
-
-    logger.info(f"Loaded {len(index_cache)} index files from {indexes_path}")
-    return index_cache
-
-
-def extract_code_references(index_data: Dict) -> List[CodeReference]:
-    """Extract code reference information from index data"""
-    references = []
-
-    repo_name = index_data.get("repo_name", "Unknown")
-    file_summaries = index_data.get("file_summaries", [])
-
-    for file_summary in file_summaries:
-        reference = CodeReference(
-            file_path=file_summary.get("file_path", ""),
-            file_type=file_summary.get("file_type", ""),
-            main_functions=file_summary.get("main_functions", []),
-            key_concepts=file_summary.get("key_concepts", []),
-            dependencies=file_summary.get("dependencies", []),
-            summary=file_summary.get("summary", ""),
-            lines_of_code=file_summary.get("lines_of_code", 0),
-            repo_name=repo_name,
+            return None
+
+        logger.info(f"Loaded index file: {index_file.name}")
+        return LoadedIndex(
+            name=index_file.stem,
+            path=index_file,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            compiled=compile_reference_index(index_data, index_file.stem),
+            data=index_data,
         )
-        references.append(reference)
 
-    return references
+    def stats(self) -> Dict[str, int]:
+        """Cumulative counters since the server started"""
+        return {
+            "resident_indexes": len(self._entries),
+            "total_cache_hits": self.hits,
+            "total_cache_misses": self.misses,
+        }
 
 
-def extract_relationships(index_data: Dict) -> List[RelationshipInfo]:
-    """Extract relationship information from index data"""
-    relationships = []
+# Shared by all tool calls for the lifetime of the server process
+resident_index_cache = ResidentIndexCache()
 
-    relationship_list = index_data.get("relationships", [])
-
-    for rel in relationship_list:
-        relationship = RelationshipInfo(
-            repo_file_path=rel.get("repo_file_path", ""),
-            target_file_path=rel.get("target_file_path", ""),
-            relationship_type=rel.get("relationship_type", ""),
-            confidence_score=rel.get("confidence_score", 0.0),
-            helpful_aspects=rel.get("helpful_aspects", []),
-            potential_contributions=rel.get("potential_contributions", []),
-            usage_suggestions=rel.get("usage_suggestions", ""),
-        )
-        relationships.append(relationship)
 
-    return relationships
+def load_index_files_from_directory(indexes_directory: str) -> Dict[str, Dict]:
+    """Load all index files from specified directory"""
+    loaded, _ = resident_index_cache.load_directory(indexes_directory)
+    return {name: entry.get_data() for name, entry in loaded.items()}
 
 
-def calculate_relevance_score(
-    target_file: str, reference: CodeReference, keywords: List[str] = None
+def _path_score(
+    target_name: str, target_extension: str, ref_name: str, ref_extension: str
 ) -> float:
-    """Calculate relevance score between reference code and target file"""
+    """File name and file type part of the relevance score"""
     score = 0.0
 
     # File name similarity
-    target_name = Path(target_file).stem.lower()
-    ref_name = Path(reference.file_path).stem.lower()
-
     if target_name in ref_name or ref_name in target_name:
         score += 0.3
 
     # File type matching
-    target_extension = Path(target_file).suffix
-    ref_extension = Path(reference.file_path).suffix
-
     if target_extension == ref_extension:
         score += 0.2
 
+    return score
+
+
+def calculate_relevance_score(
+    target_file: str, reference: CodeReference, keyword_score: float = 0.0
+) -> float:
+    """
+    Calculate relevance score between reference code and target file
+
+    Args:
+        target_file: Target file path
+        reference: Candidate reference
+        keyword_score: BM25 score of the keywords, normalized to [0, 1]
+    """
+    score = _path_score(
+        Path(target_file).stem.lower(),
+        Path(target_file).suffix,
+        Path(reference.file_path).stem.lower(),
+        Path(reference.file_path).suffix,
+    )
+
     # Keyword matching
-    if keywords:
-        keyword_matches = 0
-        total_searchable_text = (
-            " ".join(reference.key_concepts)
-            + " "
-            + " ".join(reference.main_functions)
-            + " "
-            + reference.summary
-            + " "
-            + reference.file_type
-        ).lower()
-
-        for keyword in keywords:
-            if keyword.lower() in total_searchable_text:
-                keyword_matches += 1
-
-        if keywords:
-            score += (keyword_matches / len(keywords)) * 0.5
+    score += keyword_score * 0.5
 
     return min(score, 1.0)
 
 
 def find_relevant_references_in_cache(
     target_file: str,
-    index_cache: Dict[str, Dict],
+    index_cache: Dict[str, LoadedIndex],
     keywords: List[str] = None,
     max_results: int = 10,
 ) -> List[Tuple[CodeReference, float]]:
     """Find reference code relevant to target file from provided cache"""
-    all_references = []
-
-    # Collect reference information from all index files
-    for repo_name, index_data in index_cache.items():
-        references = extract_code_references(index_data)
-        for ref in references:
-            relevance_score = calculate_relevance_score(target_file, ref, keywords)
+    target_name = Path(target_file).stem.lower()
+    target_extension = Path(target_file).suffix
+    keyword_tokens = tokenize(" ".join(keywords or []))
+    name_tokens = tokenize(target_name)
+
+    scored_references = []
+    candidates_by_repo = {}
+    for repo_name, loaded_index in index_cache.items():
+        compiled = loaded_index.compiled
+        search_index = compiled.search_index
+
+        # Only references sharing a keyword or a name token with the target, or
+        # whose file name contains / is contained in the target's, are scored,
+        # so query cost follows the postings, not the index size
+        keyword_scores = search_index.score_documents(keyword_tokens)
+        full_match_score = search_index.full_match_score(keyword_tokens) or 1.0
+        candidates = (
+            set(keyword_scores)
+            | search_index.documents_containing(name_tokens)
+            | references_matching_name(compiled, target_name)
+        )
+        candidates_by_repo[repo_name] = candidates
+
+        for index in candidates:
+            # Matching every keyword once counts fully, as the substring check did
+            keyword_score = min(keyword_scores.get(index, 0.0) / full_match_score, 1.0)
+            relevance_score = min(
+                _path_score(
+                    target_name, target_extension, *compiled.reference_names[index]
+                )
+                + keyword_score * 0.5,
+                1.0,
+            )
             if relevance_score > 0.1:  # Only keep results with certain relevance
-                all_references.append((ref, relevance_score))
+                scored_references.append((compiled.references[index], relevance_score))
 
-    # Sort by relevance score
-    all_references.sort(key=lambda x: x[1], reverse=True)
+    # Too few strong matches: fill up with references of the same file type
+    # (0.2 each), stopping as soon as they could no longer make the top k
+    missing = max_results - sum(1 for _, score in scored_references if score >= 0.2)
+    for repo_name, loaded_index in index_cache.items():
+        if missing <= 0:
+            break
+        compiled = loaded_index.compiled
+        candidates = candidates_by_repo[repo_name]
+        for index, (_, ref_extension) in enumerate(compiled.reference_names):
+            if ref_extension == target_extension and index not in candidates:
+                scored_references.append((compiled.references[index], 0.2))
+                missing -= 1
+                if missing <= 0:
+                    break
 
-    return all_references[:max_results]
+    return heapq.nlargest(max_results, scored_references, key=lambda x: x[1])
 
 
-def find_direct_relationships_in_cache(
-    target_file: str, index_cache: Dict[str, Dict]
+def _find_relationships_fuzzy(
+    target_file: str, normalized_target: str, index_cache: Dict[str, LoadedIndex]
 ) -> List[RelationshipInfo]:
-    """Find direct relationships with target file from provided cache"""
+    """Substring matching over every relationship, used when no path matches exactly"""
     relationships = []
-
-    # Normalize target file path (remove common prefixes if exists)
-    common_prefixes = ["src/", "core/", "lib/", "main/", "./"]
-    normalized_target = target_file.strip("/")
-    for prefix in common_prefixes:
-        if normalized_target.startswith(prefix):
-            normalized_target = normalized_target[len(prefix) :]
-            break
-
-    # Collect relationship information from all index files
-    for repo_name, index_data in index_cache.items():
-        repo_relationships = extract_relationships(index_data)
-        for rel in repo_relationships:
-            # Normalize target file path in relationship
-            normalized_rel_target = rel.target_file_path.strip("/")
-            for prefix in common_prefixes:
-                if normalized_rel_target.startswith(prefix):
-                    normalized_rel_target = normalized_rel_target[len(prefix) :]
-                    break
+    for repo_name, loaded_index in index_cache.items():
+        for rel in loaded_index.compiled.relationships:
+            normalized_rel_target = normalize_target_path(rel.target_file_path)
 
             # Check target file path matching (support multiple matching methods)
             if (
@@ -229,6 +320,33 @@ def find_direct_relationships_in_cache(
                 or rel.target_file_path in target_file
             ):
                 relationships.append(rel)
+    return relationships
+
+
+def find_direct_relationships_in_cache(
+    target_file: str, index_cache: Dict[str, LoadedIndex]
+) -> List[RelationshipInfo]:
+    """Find direct relationships with target file from provided cache"""
+    normalized_target = normalize_target_path(target_file)
+
+    # Relationship paths ending with the target, or the target ending with a
+    # relationship path: one probe plus one per leading directory of the target
+    relationships = []
+    seen = set()
+    for repo_name, loaded_index in index_cache.items():
+        compiled = loaded_index.compiled
+        matches = list(compiled.relationships_by_path_suffix.get(normalized_target, []))
+        for suffix in path_suffixes(normalized_target)[1:]:
+            matches.extend(compiled.relationships_by_full_path.get(suffix, []))
+        for rel in matches:
+            if id(rel) not in seen:
+                seen.add(id(rel))
+                relationships.append(rel)
+
+    if not relationships:
+        relationships = _find_relationships_fuzzy(
+            target_file, normalized_target, index_cache
+        )
 
     # Sort by confidence score
     relationships.sort(key=lambda x: x.confidence_score, reverse=True)
@@ -349,9 +467,8 @@ async def search_code_references(
         Formatted reference code information JSON string
     """
     try:
-        # Step 1: Load index files from specified directory
-        logger.info(f"Loading index files from: {indexes_path}")
-        index_cache = load_index_files_from_directory(indexes_path)
+        # Step 1: Load index files from specified directory (resident between calls)
+        index_cache, cache_stats = resident_index_cache.load_directory(indexes_path)
 
         if not index_cache:
             result = {
@@ -363,9 +480,7 @@ async def search_code_references(
             return json.dumps(result, ensure_ascii=False, indent=2)
 
         # Step 2: Parse keywords
-        keyword_list = (
-            [kw.strip() for kw in keywords.split(",") if kw.strip()] if keywords else []
-        )
+        keyword_list = _parse_keywords(keywords)
 
         # Step 3: Find relevant reference code
         relevant_refs = find_relevant_references_in_cache(
@@ -390,6 +505,7 @@ async def search_code_references(
             "formatted_content": formatted_output,
             "indexes_loaded": list(index_cache.keys()),
             "total_indexes_loaded": len(index_cache),
+            "index_cache": {**cache_stats, **resident_index_cache.stats()},
         }
 
         logger.info(
@@ -408,6 +524,112 @@ async def search_code_references(
         return json.dumps(result, ensure_ascii=False, indent=2)
 
 
+def _parse_keywords(keywords: Union[str, List[str], None]) -> List[str]:
+    """Accept comma-separated keywords or a list of keywords"""
+    if not keywords:
+        return []
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    return [str(kw).strip() for kw in keywords if str(kw).strip()]
+
+
+def compact_search_result(
+    target_file: str,
+    relevant_refs: List[Tuple[CodeReference, float]],
+    relationships: List[RelationshipInfo],
+) -> Dict[str, Any]:
+    """Trimmed, unformatted search result for batch responses"""
+    return {
+        "target_file": target_file,
+        "relationships": [
+            {
+                "repo_file_path": rel.repo_file_path,
+                "type": rel.relationship_type,
+                "confidence": round(rel.confidence_score, 2),
+                "helpful_aspects": rel.helpful_aspects[:3],
+                "usage_suggestions": rel.usage_suggestions[:200],
+            }
+            for rel in relationships[:3]
+        ],
+        "references": [
+            {
+                "file_path": ref.file_path,
+                "repo": ref.repo_name,
+                "relevance": round(score, 2),
+                "main_functions": ref.main_functions[:5],
+                "key_concepts": ref.key_concepts[:5],
+                "dependencies": ref.dependencies[:5],
+                "summary": ref.summary[:200],
+            }
+            for ref, score in relevant_refs
+        ],
+    }
+
+
+@mcp.tool()
+async def search_code_references_batch(
+    indexes_path: str, queries: List[Dict[str, Any]], max_results: int = 5
+) -> str:
+    """
+    Search reference code for several target files in one call.
+
+    Answers every query against the resident indexes within this one tool call
+    and returns compact JSON (no formatted report), so references for the next
+    files to implement can be prefetched in a single round trip.
+
+    Args:
+        indexes_path: Path to the indexes directory containing JSON index files
+        queries: List of {"target_file": str, "keywords": str or list of str}
+        max_results: Maximum number of references per target file
+
+    Returns:
+        Compact JSON string with one result per query, in query order
+    """
+    try:
+        index_cache, cache_stats = resident_index_cache.load_directory(indexes_path)
+        if not index_cache:
+            result = {
+                "status": "error",
+                "message": f"No index files found or failed to load from: {indexes_path}",
+                "indexes_path": indexes_path,
+            }
+            return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+        results = []
+        for query in queries:
+            target_file = query.get("target_file", "")
+            if not target_file:
+                results.append({"error": "Query without target_file"})
+                continue
+
+            keyword_list = _parse_keywords(query.get("keywords"))
+            relevant_refs = find_relevant_references_in_cache(
+                target_file, index_cache, keyword_list, max_results
+            )
+            relationships = find_direct_relationships_in_cache(target_file, index_cache)
+            results.append(
+                compact_search_result(target_file, relevant_refs, relationships)
+            )
+
+        logger.info(f"Answered {len(results)} batched reference queries")
+        result = {
+            "status": "success",
+            "results": results,
+            "total_indexes_loaded": len(index_cache),
+            "index_cache": cache_stats,
+        }
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+    except Exception as e:
+        logger.error(f"Error in search_code_references_batch: {str(e)}")
+        result = {
+            "status": "error",
+            "message": f"Failed to search reference code: {str(e)}",
+            "indexes_path": indexes_path,
+        }
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+
 @mcp.tool()
 async def get_indexes_overview(indexes_path: str) -> str:
     """
@@ -420,8 +642,8 @@ async def get_indexes_overview(indexes_path: str) -> str:
         Overview information of all available reference code JSON string
     """
     try:
-        # Load index files from specified directory
-        index_cache = load_index_files_from_directory(indexes_path)
+        # Load index files from specified directory (resident between calls)
+        index_cache, cache_stats = resident_index_cache.load_directory(indexes_path)
 
         if not index_cache:
             result = {
@@ -433,36 +655,16 @@ async def get_indexes_overview(indexes_path: str) -> str:
 
         overview = {"total_repos": len(index_cache), "repositories": {}}
 
-        for repo_name, index_data in index_cache.items():
-            repo_info = {
-                "repo_name": index_data.get("repo_name", repo_name),
-                "total_files": index_data.get("total_files", 0),
-                "file_types": [],
-                "main_concepts": [],
-                "total_relationships": len(index_data.get("relationships", [])),
-            }
-
-            # Collect file types and concepts
-            file_summaries = index_data.get("file_summaries", [])
-            file_types = set()
-            concepts = set()
-
-            for file_summary in file_summaries:
-                file_types.add(file_summary.get("file_type", "Unknown"))
-                concepts.update(file_summary.get("key_concepts", []))
-
-            repo_info["file_types"] = sorted(list(file_types))
-            repo_info["main_concepts"] = sorted(list(concepts))[
-                :20
-            ]  # Limit concept count
-
-            overview["repositories"][repo_name] = repo_info
+        for repo_name, loaded_index in index_cache.items():
+            # Computed when the index is compiled, so no JSON is needed here
+            overview["repositories"][repo_name] = dict(loaded_index.compiled.overview)
 
         result = {
             "status": "success",
             "overview": overview,
             "indexes_directory": str(Path(indexes_path).resolve()),
             "total_indexes_loaded": len(index_cache),
+            "index_cache": {**cache_stats, **resident_index_cache.stats()},
         }
 
         return json.dumps(result, ensure_ascii=False, indent=2)
@@ -484,7 +686,10 @@ def main():
         "1. search_code_references(indexes_path, target_file, keywords, max_results) - UNIFIED TOOL"
     )
     logger.info(
-        "2. get_indexes_overview(indexes_path) - Get overview of available indexes"
+        "2. search_code_references_batch(indexes_path, queries, max_results) - Many target files in one call"
+    )
+    logger.info(
+        "3. get_indexes_overview(indexes_path) - Get overview of available indexes"
     )
 
     # Run MCP server
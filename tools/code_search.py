@@ -0,0 +1,372 @@
+"""
+Code Search
+
+Line-oriented pattern search over a directory tree, used by the search_code
+tool of the code implementation server.
+
+Features:
+- Pattern compiled once; each file is scanned whole by the regex engine and
+  candidate lines are re-checked on their own, so results match a
+  line-by-line search
+- One buffered read per file; binary (NUL byte) and non-UTF-8 files skipped
+- Hidden, dependency and .gitignore'd directories pruned during the walk
+- Files searched on a thread pool in path order, stopping as soon as the
+  match limit is reached
+"""
+
+import fnmatch
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path, PurePath
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools.repo_walker import IgnoreRules
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MAX_MATCHES = 50
+
+# Never searched, in addition to hidden directories and .gitignore'd paths
+SEARCH_SKIP_DIRECTORIES = {"__pycache__", "node_modules", "venv", "site-packages"}
+
+# A NUL byte in the first bytes of a file marks it as binary
+BINARY_SAMPLE_BYTES = 8192
+
+# String anchors and negative lookarounds can match a line on its own but not
+# inside the whole file; such patterns are searched line by line
+_LINE_BOUNDARY_SENSITIVE_RE = re.compile(r"\\[AZ]|\(\?<?!")
+
+# Files read ahead of the one whose results are being consumed
+SEARCH_PREFETCH_PER_WORKER = 4
+
+
+@dataclass
+class SearchResult:
+    """Matches in path order, with how much of the tree was searched"""
+
+    matches: List[Dict[str, Any]] = field(default_factory=list)
+    files_searched: int = 0
+    limit_reached: bool = False
+    # Files chosen by the workspace trigram index (tools/trigram_index.py)
+    indexed: bool = False
+
+
+def compile_search_pattern(
+    pattern: str, use_regex: bool
+) -> Tuple[Optional["re.Pattern"], "re.Pattern"]:
+    """
+    Compile a search pattern.
+
+    Returns:
+        (pattern for scanning whole files, pattern for checking single lines).
+        The scan pattern is None when whole-file matches could miss a line,
+        and files are then searched line by line. Substring patterns are
+        matched case-insensitively; regular expressions as written.
+
+    Raises:
+        re.error: Invalid regular expression
+    """
+    expression = pattern if use_regex else re.escape(pattern)
+    flags = 0 if use_regex else re.IGNORECASE
+    line_pattern = re.compile(expression, flags)
+    if use_regex and _LINE_BOUNDARY_SENSITIVE_RE.search(pattern):
+        return None, line_pattern
+    # MULTILINE lets ^ and $ match at line boundaries of the whole file; every
+    # line they find is confirmed with the single-line pattern
+    return re.compile(expression, flags | re.MULTILINE), line_pattern
+
+
+def normalize_file_pattern(file_pattern: str) -> str:
+    """Strip leading "**/": the search is recursive already (glob's root/**/pattern)"""
+    while file_pattern.startswith("**/"):
+        file_pattern = file_pattern[3:]
+    return file_pattern
+
+
+def matches_file_pattern(relative_path: str, file_pattern: str) -> bool:
+    """Whether a "/"-separated path relative to the search root matches file_pattern"""
+    file_pattern = normalize_file_pattern(file_pattern)
+    if "/" in file_pattern:
+        # Same as glob's "**/<file_pattern>": match the trailing path components
+        return PurePath(relative_path).match(file_pattern)
+    return fnmatch.fnmatch(relative_path.rsplit("/", 1)[-1], file_pattern)
+
+
+def _is_excluded_directory(name: str, relative_path: str, rules: IgnoreRules) -> bool:
+    if name.startswith(".") or name in SEARCH_SKIP_DIRECTORIES:
+        return True
+    return bool(rules.rules) and rules.is_ignored(relative_path, True)
+
+
+def _is_excluded_file(
+    name: str, relative_path: str, file_pattern: str, rules: IgnoreRules
+) -> bool:
+    if name.startswith(".") and not file_pattern.startswith("."):
+        return True
+    if not matches_file_pattern(relative_path, file_pattern):
+        return True
+    return bool(rules.rules) and rules.is_ignored(relative_path, False)
+
+
+def walk_search_files(root: Path, file_pattern: str) -> Iterator[Tuple[str, Path]]:
+    """
+    (relative path, path) of the files under root matching file_pattern.
+
+    Relative paths are "/"-separated. Files come in sorted order, each
+    directory's files before its subdirectories.
+    """
+    file_pattern = normalize_file_pattern(file_pattern)
+
+    def walk(directory: Path, relative_directory: str, rules: IgnoreRules):
+        rules = rules.extended(directory, relative_directory)
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            return
+
+        subdirectories = []
+        for entry in entries:
+            name = entry.name
+            relative_path = (
+                f"{relative_directory}/{name}" if relative_directory else name
+            )
+            try:
+                is_directory = entry.is_dir(follow_symlinks=False)
+                if not is_directory and not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            if is_directory:
+                if not _is_excluded_directory(name, relative_path, rules):
+                    subdirectories.append((entry, relative_path))
+            elif not _is_excluded_file(name, relative_path, file_pattern, rules):
+                yield relative_path, Path(entry.path)
+
+        for entry, relative_path in subdirectories:
+            yield from walk(Path(entry.path), relative_path, rules)
+
+    yield from walk(Path(root), "", IgnoreRules())
+
+
+def iter_search_files(root: Path, file_pattern: str) -> Iterator[Path]:
+    """Files under root matching file_pattern, in sorted path order"""
+    for _, path in walk_search_files(root, file_pattern):
+        yield path
+
+
+def is_search_file(root: Path, relative_path: str, file_pattern: str = "*") -> bool:
+    """Whether walk_search_files(root, file_pattern) includes a relative path"""
+    file_pattern = normalize_file_pattern(file_pattern)
+    *directory_names, name = relative_path.split("/")
+    rules = IgnoreRules()
+    directory = Path(root)
+    relative_directory = ""
+    for directory_name in directory_names:
+        rules = rules.extended(directory, relative_directory)
+        relative_directory = (
+            f"{relative_directory}/{directory_name}"
+            if relative_directory
+            else directory_name
+        )
+        if _is_excluded_directory(directory_name, relative_directory, rules):
+            return False
+        directory = directory / directory_name
+    rules = rules.extended(directory, relative_directory)
+    return not _is_excluded_file(name, relative_path, file_pattern, rules)
+
+
+def read_search_text(file_path: Path) -> Optional[str]:
+    """
+    Text of a file as it is searched, with universal newlines.
+
+    Returns None for files that are not searched: unreadable, binary or not UTF-8.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.warning(f"Error searching file {file_path}: {e}")
+        return None
+    if b"\0" in data[:BINARY_SAMPLE_BYTES]:
+        return None
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if "\r" in text:
+        # Universal newlines, as text-mode reads do
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def search_file(
+    file_path: Path,
+    scan_pattern: Optional["re.Pattern"],
+    line_pattern: "re.Pattern",
+    max_matches: int = SEARCH_MAX_MATCHES,
+) -> Optional[List[Tuple[int, str]]]:
+    """
+    Matching (line number, line) pairs of one file.
+
+    Lines are matched without their newline, as grep does, so "$" is the end
+    of the line's text.
+
+    Returns None for files that are not searched (see read_search_text).
+    """
+    text = read_search_text(file_path)
+    if text is None:
+        return None
+
+    if scan_pattern is None:
+        return _search_lines(text, line_pattern, max_matches)
+
+    results = []
+    line_number = 1
+    counted_to = 0
+    position = 0
+    while len(results) < max_matches:
+        match = scan_pattern.search(text, position)
+        if match is None:
+            break
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        if line_start >= len(text):
+            # Empty match after the final newline, which ends no line
+            break
+        line_end = text.find("\n", match.start())
+        if line_end == -1:
+            line_end = len(text)
+
+        # A match spanning lines is not a line match; the line may still have one
+        line = text[line_start:line_end]
+        if line_pattern.search(line):
+            line_number += text.count("\n", counted_to, line_start)
+            counted_to = line_start
+            results.append((line_number, line))
+        if line_end >= len(text):
+            break
+        position = line_end + 1
+    return results
+
+
+def _search_lines(
+    text: str, line_pattern: "re.Pattern", max_matches: int
+) -> List[Tuple[int, str]]:
+    lines = text.split("\n")
+    if lines[-1] == "":
+        # Text ending with a newline (or empty): no line follows it
+        lines.pop()
+
+    results = []
+    for line_number, line in enumerate(lines, 1):
+        if line_pattern.search(line):
+            results.append((line_number, line))
+            if len(results) >= max_matches:
+                break
+    return results
+
+
+def search_tree(
+    root: Path,
+    pattern: str,
+    file_pattern: str = "*",
+    use_regex: bool = False,
+    max_matches: int = SEARCH_MAX_MATCHES,
+    max_workers: Optional[int] = None,
+) -> SearchResult:
+    """
+    Search files under root for lines matching a pattern.
+
+    Raises:
+        re.error: Invalid regular expression
+    """
+    return search_files(
+        root,
+        lambda: iter_search_files(root, file_pattern),
+        pattern,
+        use_regex=use_regex,
+        max_matches=max_matches,
+        max_workers=max_workers,
+    )
+
+
+def search_files(
+    root: Path,
+    files: Callable[[], Iterable[Path]],
+    pattern: str,
+    use_regex: bool = False,
+    max_matches: int = SEARCH_MAX_MATCHES,
+    max_workers: Optional[int] = None,
+) -> SearchResult:
+    """
+    Search the given files for lines matching a pattern.
+
+    files returns the files to search, in the order results are wanted; it is
+    called once the pattern has compiled. Files are read and scanned on a
+    thread pool, a bounded number ahead of the file whose results are being
+    collected, so the first max_matches matches are the same as a sequential
+    search and at most that many files past the limit are read.
+
+    Raises:
+        re.error: Invalid regular expression
+    """
+    scan_pattern, line_pattern = compile_search_pattern(pattern, use_regex)
+    match_type = "regex" if use_regex else "substring"
+    root = Path(root)
+    result = SearchResult()
+
+    max_workers = max_workers or min(8, (os.cpu_count() or 1) + 4)
+    files = iter(files())
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+
+        def submit_next() -> bool:
+            file_path = next(files, None)
+            if file_path is None:
+                return False
+            pending.append(
+                (
+                    file_path,
+                    executor.submit(
+                        search_file, file_path, scan_pattern, line_pattern, max_matches
+                    ),
+                )
+            )
+            return True
+
+        for _ in range(max_workers * SEARCH_PREFETCH_PER_WORKER):
+            if not submit_next():
+                break
+
+        while pending:
+            file_path, future = pending.popleft()
+            file_matches = future.result()
+            submit_next()
+            if file_matches is None:
+                continue
+
+            result.files_searched += 1
+            relative_path = os.path.relpath(file_path, root)
+            for line_number, line in file_matches:
+                result.matches.append(
+                    {
+                        "file": relative_path,
+                        "line_number": line_number,
+                        "line_content": line.strip(),
+                        "match_type": match_type,
+                    }
+                )
+                if len(result.matches) >= max_matches:
+                    result.limit_reached = True
+                    break
+            if result.limit_reached:
+                for _, queued in pending:
+                    queued.cancel()
+                break
+
+    return result
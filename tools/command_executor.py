@@ -14,6 +14,8 @@ import mcp.types as types
 from mcp.server import NotificationOptions, Server
 import mcp.server.stdio
 
+from tools.process_runner import SPILL_DIRECTORY_NAME, ProcessResult, run_process
+
 # 创建MCP服务器实例 / Create MCP server instance
 app = Server("command-executor")
 
@@ -148,13 +150,13 @@ async def execute_command_batch(
         for i, command in enumerate(command_lines, 1):
             try:
                 # 执行命令 / Execute command
-                result = subprocess.run(
+                result = await run_process(
                     command,
-                    shell=True,
                     cwd=working_directory,
-                    capture_output=True,
-                    text=True,
                     timeout=30,  # 30秒超时
+                    shell=True,
+                    spill_dir=Path(working_directory) / SPILL_DIRECTORY_NAME,
+                    label="execute_commands",
                 )
 
                 if result.returncode == 0:
@@ -167,6 +169,7 @@ async def execute_command_batch(
                     if result.stderr.strip():
                         results.append(f"   错误 / Error: {result.stderr.strip()}")
                     stats["failed"] += 1
+                results.extend(f"   {line}" for line in format_truncation_notes(result))
 
             except subprocess.TimeoutExpired:
                 results.append(f"⏱️ Command {i} 超时 / timeout: {command}")
@@ -208,13 +211,13 @@ async def execute_single_command(
         Path(working_directory).mkdir(parents=True, exist_ok=True)
 
         # 执行命令 / Execute command
-        result = subprocess.run(
+        result = await run_process(
             command,
-            shell=True,
             cwd=working_directory,
-            capture_output=True,
-            text=True,
             timeout=30,
+            shell=True,
+            spill_dir=Path(working_directory) / SPILL_DIRECTORY_NAME,
+            label="execute_single_command",
         )
 
         # 格式化输出 / Format output
@@ -263,8 +266,26 @@ def generate_execution_summary(
 {'-'*50}"""
 
 
+def format_truncation_notes(result: ProcessResult) -> List[str]:
+    """
+    截断输出说明 / Notes for output streams that were cut to their head and tail
+
+    Args:
+        result: 执行结果 / Execution result
+
+    Returns:
+        每个被截断输出流一行 / One line per truncated stream
+    """
+    return [
+        f"截断 / Truncated {stream}: {report['omitted_bytes']} of "
+        f"{report['total_bytes']} bytes omitted, "
+        f"完整输出 / full output: {report['full_output_path']}"
+        for stream, report in result.truncation.items()
+    ]
+
+
 def format_single_command_result(
-    command: str, working_directory: str, result: subprocess.CompletedProcess
+    command: str, working_directory: str, result: ProcessResult
 ) -> str:
     """
     格式化单命令执行结果 / Format single command execution result
@@ -295,6 +316,9 @@ def format_single_command_result(
         if result.stderr.strip():
             output += f"错误 / Error:\n{result.stderr.strip()}\n"
 
+    for note in format_truncation_notes(result):
+        output += f"{note}\n"
+
     return output
 
 
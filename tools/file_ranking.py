@@ -0,0 +1,348 @@
+"""
+Lexical File Ranking for the Code Indexer
+
+Scores repository files against the target project structure without any LLM
+call, so the indexer can shortlist relevant files on repositories of any size.
+
+Features:
+- Identifier-aware tokenization (snake_case, camelCase, paths)
+- BM25 scoring over path tokens, symbols, dependencies and docstrings, with
+  postings lists so queries only touch matching documents
+- Query extraction from the target structure tree (file names and comments)
+- Top-k target file candidates per repository file from a token-overlap matrix
+  (vectorized with NumPy when available)
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+
+from tools.source_analysis import extract_leading_docstring, extract_static_structure
+
+# NumPy speeds up the repository x target similarity matrix
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Bytes of each file read to extract symbols and docstrings for ranking
+RANKING_READ_BYTES = 16384
+
+# Tree line: drawing characters, then a file or directory name, then an optional comment
+_TREE_LINE_RE = re.compile(
+    r"^(?P<prefix>[\s│├└─|`+\-]*)(?P<name>[^\s#│├└]+)[^#]*(?:#\s*(?P<comment>.*))?$"
+)
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+_SUBWORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+[0-9]*|[0-9]+")
+
+# Tokens that appear everywhere in paths and trees and carry no signal
+_RANKING_STOP_WORDS = {
+    "py", "js", "ts", "md", "txt", "yaml", "yml", "json", "toml", "xml", "cfg",
+    "src", "lib", "the", "and", "for", "with", "from", "import", "init", "main",
+    "file", "files", "of", "to", "in", "a", "an", "is", "etc", "self",
+}  # fmt: skip
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase identifier subwords (snake_case and camelCase aware)"""
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        for subword in _SUBWORD_RE.findall(word):
+            token = subword.lower()
+            # Light plural folding so "losses"/"loss" and "models"/"model" meet
+            if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+                token = token[:-1]
+            if len(token) > 1 and token not in _RANKING_STOP_WORDS:
+                tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 scorer over a fixed collection of token lists, with postings lists"""
+
+    def __init__(
+        self, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75
+    ):
+        self.k1 = k1
+        self.b = b
+        self.document_count = len(documents)
+        self.document_lengths = [len(document) for document in documents]
+        self.average_length = (
+            sum(self.document_lengths) / len(self.document_lengths)
+            if self.document_lengths
+            else 0.0
+        )
+
+        # term -> [(document index, term frequency)], so a query only touches
+        # the documents that contain its terms
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for index, document in enumerate(documents):
+            for term, frequency in Counter(document).items():
+                self.postings[term].append((index, frequency))
+        self.postings = dict(self.postings)
+
+        self.idf = {
+            term: math.log(
+                1 + (self.document_count - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for term, postings in self.postings.items()
+        }
+        self._length_norms = [
+            k1 * (1 - b + b * length / (self.average_length or 1.0))
+            for length in self.document_lengths
+        ]
+
+    def score_documents(self, query_tokens: Sequence[str]) -> Dict[int, float]:
+        """BM25 scores of the documents matching at least one query term"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(query_tokens):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            weight = self.idf[term] * (self.k1 + 1)
+            for index, frequency in postings:
+                scores[index] += (
+                    weight * frequency / (frequency + self._length_norms[index])
+                )
+        return dict(scores)
+
+    def score(self, query_tokens: Sequence[str]) -> List[float]:
+        """BM25 score of every document for the query"""
+        scores = [0.0] * self.document_count
+        for index, score in self.score_documents(query_tokens).items():
+            scores[index] = score
+        return scores
+
+    def top_k(self, query_tokens: Sequence[str], k: int) -> List[Tuple[int, float]]:
+        """The k best (document index, score) pairs, selected with a heap"""
+        return heapq.nlargest(
+            k, self.score_documents(query_tokens).items(), key=lambda item: item[1]
+        )
+
+    def full_match_score(self, query_tokens: Sequence[str]) -> float:
+        """
+        Score of an average-length document containing every query term once,
+        for normalizing scores to roughly [0, 1]
+        """
+        # At tf=1 and average length, each term contributes exactly its idf
+        return sum(self.idf[term] for term in set(query_tokens) if term in self.idf)
+
+    def documents_containing(self, tokens: Sequence[str]) -> Set[int]:
+        """Indexes of documents containing any of the tokens"""
+        return {
+            index for token in set(tokens) for index, _ in self.postings.get(token, ())
+        }
+
+
+def build_file_document(relative_path: str, content: str) -> List[str]:
+    """
+    Token list describing a repository file for ranking.
+
+    Path tokens are weighted highest since file and directory names are the
+    most reliable signal, followed by symbol names, then docstring words.
+    """
+    path = Path(relative_path)
+    structure = extract_static_structure(path, content)
+    symbol_text = " ".join(structure["main_functions"] + structure["dependencies"])
+    docstring = extract_leading_docstring(path, content)
+
+    path_tokens = tokenize(relative_path.replace("\\", "/"))
+    return path_tokens * 3 + tokenize(symbol_text) * 2 + tokenize(docstring)
+
+
+def extract_target_query(target_structure: str) -> List[str]:
+    """Query tokens from the target structure: file/directory names and comments"""
+    return tokenize(target_structure or "")
+
+
+def read_file_head(file_path: Path, max_bytes: int = RANKING_READ_BYTES) -> str:
+    """Read the beginning of a file for ranking, returning '' if unreadable"""
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read(max_bytes)
+    except (OSError, PermissionError):
+        return ""
+
+
+def rank_files_for_target(
+    files: Dict[str, str], target_structure: str
+) -> List[Tuple[str, float]]:
+    """
+    Rank files by BM25 relevance to the target structure.
+
+    Args:
+        files: Mapping of relative file path to (a prefix of) its content
+        target_structure: Target project structure text
+
+    Returns:
+        (relative_path, score) pairs sorted by descending score
+    """
+    relative_paths = list(files)
+    documents = [build_file_document(path, files[path]) for path in relative_paths]
+    scores = BM25Index(documents).score(extract_target_query(target_structure))
+    return sorted(zip(relative_paths, scores), key=lambda item: item[1], reverse=True)
+
+
+def parse_target_structure(target_structure: str) -> List[Dict[str, str]]:
+    """
+    Extract target files from a tree-style project structure.
+
+    Returns one entry per file with its path, the line to show in prompts
+    (path plus comment) and the text used for matching, which also includes
+    the comments of its parent directories.
+    """
+    entries = []
+    directories: List[Tuple[int, str, str]] = []  # (column, name, comment)
+
+    for line in (target_structure or "").splitlines():
+        match = _TREE_LINE_RE.match(line.rstrip())
+        if not match:
+            continue
+        column = len(match.group("prefix"))
+        name = match.group("name")
+        comment = (match.group("comment") or "").strip()
+
+        while directories and directories[-1][0] >= column:
+            directories.pop()
+
+        if name.endswith("/") or not Path(name).suffix:
+            directories.append((column, name.rstrip("/"), comment))
+            continue
+
+        path = "/".join([directory[1] for directory in directories] + [name])
+        context = " ".join(directory[2] for directory in directories)
+        entries.append(
+            {
+                "path": path,
+                "line": f"{path}  # {comment}" if comment else path,
+                "match_text": f"{path} {comment} {context}",
+            }
+        )
+
+    # A single root folder (e.g. "project/") adds nothing to target paths
+    roots = {entry["path"].split("/", 1)[0] for entry in entries}
+    if len(roots) == 1 and all("/" in entry["path"] for entry in entries):
+        root_prefix = roots.pop() + "/"
+        for entry in entries:
+            entry["path"] = entry["path"][len(root_prefix) :]
+            entry["line"] = entry["line"][len(root_prefix) :]
+
+    return entries
+
+
+def select_target_candidates(
+    file_documents: Dict[str, List[str]],
+    target_entries: List[Dict[str, str]],
+    top_k: int,
+) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Pick the k most plausible target files for every repository file.
+
+    Similarity is the token overlap between each file document and each target
+    entry, weighted by inverse document frequency over the target entries and
+    normalized by target length. Files sharing no token with any target get no
+    candidates.
+
+    Args:
+        file_documents: Mapping of file path to its token list
+        target_entries: Entries from parse_target_structure
+        top_k: Number of candidates per file
+
+    Returns:
+        Mapping of file path to its candidate target entries, best first
+    """
+    if not file_documents or not target_entries or top_k <= 0:
+        return {}
+
+    target_tokens = [set(tokenize(entry["match_text"])) for entry in target_entries]
+    vocabulary = {
+        token: index for index, token in enumerate(sorted(set().union(*target_tokens)))
+    }
+    if not vocabulary:
+        return {}
+
+    document_frequency = Counter(token for tokens in target_tokens for token in tokens)
+    idf = {
+        token: math.log(1 + len(target_entries) / document_frequency[token])
+        for token in vocabulary
+    }
+
+    file_paths = list(file_documents)
+    if NUMPY_AVAILABLE:
+        scores = _overlap_matrix_numpy(
+            [file_documents[path] for path in file_paths],
+            target_tokens,
+            vocabulary,
+            idf,
+        )
+        k = min(top_k, len(target_entries))
+        candidates = {}
+        for row, file_path in enumerate(file_paths):
+            file_scores = scores[row]
+            top = np.argpartition(-file_scores, k - 1)[:k]
+            top = top[np.argsort(-file_scores[top], kind="stable")]
+            candidates[file_path] = [
+                target_entries[index] for index in top if file_scores[index] > 0
+            ]
+        return candidates
+
+    target_norms = [
+        math.sqrt(sum(idf[token] ** 2 for token in tokens)) or 1.0
+        for tokens in target_tokens
+    ]
+    candidates = {}
+    for file_path in file_paths:
+        counts = Counter(
+            token for token in file_documents[file_path] if token in vocabulary
+        )
+        weights = {
+            token: math.log1p(count) * idf[token] for token, count in counts.items()
+        }
+        file_scores = [
+            (
+                sum(weights.get(token, 0.0) * idf[token] for token in tokens) / norm,
+                index,
+            )
+            for index, (tokens, norm) in enumerate(zip(target_tokens, target_norms))
+        ]
+        file_scores.sort(key=lambda item: (-item[0], item[1]))
+        candidates[file_path] = [
+            target_entries[index] for score, index in file_scores[:top_k] if score > 0
+        ]
+    return candidates
+
+
+def _overlap_matrix_numpy(
+    documents: List[List[str]],
+    target_tokens: List[set],
+    vocabulary: Dict[str, int],
+    idf: Dict[str, float],
+) -> "np.ndarray":
+    """Repository files x target files similarity matrix, in one matrix product"""
+    idf_vector = np.zeros(len(vocabulary), dtype=np.float32)
+    for token, index in vocabulary.items():
+        idf_vector[index] = idf[token]
+
+    # Only target vocabulary columns are kept, so the matrix stays narrow
+    file_matrix = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+    for row, document in enumerate(documents):
+        for token, count in Counter(document).items():
+            index = vocabulary.get(token)
+            if index is not None:
+                file_matrix[row, index] = count
+    file_matrix = np.log1p(file_matrix) * idf_vector
+
+    target_matrix = np.zeros((len(target_tokens), len(vocabulary)), dtype=np.float32)
+    for row, tokens in enumerate(target_tokens):
+        target_matrix[row, [vocabulary[token] for token in tokens]] = 1.0
+    target_matrix *= idf_vector
+    target_norms = np.linalg.norm(target_matrix, axis=1, keepdims=True)
+    target_matrix /= np.where(target_norms > 0, target_norms, 1.0)
+
+    return file_matrix @ target_matrix.T
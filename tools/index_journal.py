@@ -0,0 +1,111 @@
+"""
+Index Journal for the Code Indexer
+
+Append-only JSONL log of finished file analyses, written while a repository is
+being indexed so that a crashed or pre-empted run can resume where it stopped.
+
+Features:
+- One line per finished file: summary, relationships and content hash
+- Header line fingerprinting the analyzer version and target structure, so a
+  journal from an incompatible run is discarded instead of resumed
+- Tolerates a truncated last line left behind by a killed process
+- Removed once the repository index JSON has been written (compaction)
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class IndexJournal:
+    """Append-only JSONL journal of per-file results for one repository"""
+
+    JOURNAL_VERSION = 1
+
+    def __init__(
+        self,
+        path: Path,
+        fingerprint: Dict[str, str],
+        content_hashes: Dict[str, Optional[str]],
+    ):
+        self.path = Path(path)
+        self.fingerprint = dict(fingerprint, journal_version=self.JOURNAL_VERSION)
+        self.content_hashes = content_hashes
+        self._handle = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Read finished entries from an existing journal.
+
+        Returns a mapping of file path to its latest entry, or an empty mapping
+        when there is no journal or it was written by an incompatible run.
+        """
+        if not self.path.exists():
+            return {}
+
+        entries = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            header_line = f.readline()
+            try:
+                header = json.loads(header_line)
+            except json.JSONDecodeError:
+                return {}
+            if header.get("fingerprint") != self.fingerprint:
+                return {}
+
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Line cut short by a killed process; entries appended
+                    # after a resume follow it
+                    continue
+                entries[entry["file_summary"]["file_path"]] = entry
+
+        return entries
+
+    def open(self, resume: bool):
+        """Open the journal for appending, starting a new one unless resuming"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists() and self._truncate_partial_line():
+            self._handle = open(self.path, "a", encoding="utf-8")
+            return
+
+        self._handle = open(self.path, "w", encoding="utf-8")
+        self._write_line({"fingerprint": self.fingerprint})
+
+    def _truncate_partial_line(self) -> bool:
+        """
+        Cut off a last line left unfinished by a killed process, so appended
+        entries start on a line of their own.
+
+        Returns False when not even the header line is complete.
+        """
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                f.truncate(complete)
+        return complete > 0
+
+    def append(self, file_summary: Dict[str, Any], relationships: List[Dict[str, Any]]):
+        """Record a finished file, flushed so it survives the process being killed"""
+        if self._handle is None:
+            return
+        self._write_line(
+            {
+                "file_summary": file_summary,
+                "relationships": relationships,
+                "content_hash": self.content_hashes.get(file_summary["file_path"]),
+            }
+        )
+
+    def _write_line(self, record: Dict[str, Any]):
+        self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._handle.flush()
+
+    def close(self):
+        """Close the journal file, keeping it on disk"""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
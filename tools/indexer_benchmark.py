@@ -0,0 +1,439 @@
+"""
+Offline Benchmark for the Code Indexer
+
+Measures CodeIndexer throughput on synthetic repositories with a simulated LLM,
+so regressions in process_repository can be caught without API credit or
+network access.
+
+Features:
+- Synthetic repositories of configurable size and language mix
+- Simulated LLM with configurable latency, jitter and error (429) rate, driven
+  by CodeIndexer._generate_mock_response and the real retry/concurrency path
+- Files/sec, LLM calls per file, peak RSS and wall-clock per mode
+- Sequential vs concurrent comparison, each mode in a fresh child process
+
+Usage (from the repository root):
+    python -m tools.indexer_benchmark --files 200 --latency 0.05 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# resource is POSIX-only; peak RSS is reported as unavailable elsewhere
+try:
+    import resource
+
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+DEFAULT_LANGUAGE_MIX = "py=0.6,js=0.15,go=0.1,yaml=0.1,json=0.05"
+
+BENCHMARK_TARGET_STRUCTURE = """
+project/
+├── src/
+│   ├── core/
+│   │   ├── encoder.py     # graph encoder layers
+│   │   ├── diffusion.py   # forward/reverse diffusion processes
+│   │   └── trainer.py     # training loop
+│   ├── data/
+│   │   ├── loader.py      # dataset loading & batching
+│   │   └── transforms.py  # preprocessing transforms
+│   └── utils/
+│       ├── metrics.py     # NDCG, Recall
+│       ├── config.py      # configuration parsing
+│       └── logging.py     # experiment logging
+├── configs/
+│   └── default.yaml       # hyperparameters
+└── tests/
+    └── test_encoder.py
+"""
+
+_TOPICS = [
+    "encoder",
+    "diffusion",
+    "trainer",
+    "loader",
+    "transform",
+    "metric",
+    "config",
+    "logger",
+    "sampler",
+    "scheduler",
+    "optimizer",
+    "cache",
+]
+
+
+class SimulatedLLMError(Exception):
+    """Provider error raised by the simulated LLM"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_language_mix(spec: str) -> Dict[str, float]:
+    """Parse "py=0.6,js=0.4" into {".py": 0.6, ".js": 0.4}"""
+    mix = {}
+    for part in spec.split(","):
+        extension, _, weight = part.partition("=")
+        if extension.strip():
+            mix["." + extension.strip().lstrip(".")] = float(weight or 1)
+    if not mix:
+        raise ValueError(f"Empty language mix: {spec!r}")
+    return mix
+
+
+def _render_file(extension: str, topic: str, index: int, rng: random.Random) -> str:
+    """Source text for one synthetic file; sizes vary from tiny to a few KB"""
+    units = rng.choice([1, 1, 2, 4, 8, 16])
+    name = f"{topic.capitalize()}{index}"
+
+    if extension == ".py":
+        body = [f'"""{topic} utilities for module {index}."""', "import os", ""]
+        for unit in range(units):
+            body += [
+                f"class {name}Part{unit}:",
+                f'    """Handles {topic} step {unit}."""',
+                "",
+                "    def run(self, values):",
+                "        return [value * 2 for value in values]",
+                "",
+                f"def {topic}_helper_{unit}(path):",
+                "    return os.path.join(path, 'out')",
+                "",
+            ]
+        return "\n".join(body)
+
+    if extension in (".js", ".ts"):
+        body = ["import path from 'path';", ""]
+        for unit in range(units):
+            body += [
+                f"export function {topic}Step{unit}(items) {{",
+                "  return items.map((item) => item * 2);",
+                "}",
+                "",
+            ]
+        return "\n".join(body)
+
+    if extension == ".go":
+        body = ["package main", "", 'import "fmt"', ""]
+        for unit in range(units):
+            body += [
+                f"func {name}Step{unit}(n int) int {{",
+                '    fmt.Println("step")',
+                "    return n * 2",
+                "}",
+                "",
+            ]
+        return "\n".join(body)
+
+    if extension in (".yaml", ".yml"):
+        return "\n".join(
+            f"{topic}_{unit}:\n  enabled: true\n  size: {unit * 8}"
+            for unit in range(units)
+        )
+
+    if extension == ".json":
+        return json.dumps(
+            {
+                f"{topic}_{unit}": {"enabled": True, "size": unit}
+                for unit in range(units)
+            },
+            indent=2,
+        )
+
+    return "\n".join(f"{topic} line {unit}" for unit in range(units * 4))
+
+
+def generate_synthetic_repo(
+    root: Path,
+    repo_name: str,
+    num_files: int,
+    language_mix: Dict[str, float],
+    seed: int,
+) -> Path:
+    """Write a synthetic repository with num_files files drawn from the language mix"""
+    rng = random.Random(seed)
+    repo_path = root / repo_name
+    extensions = list(language_mix)
+    weights = [language_mix[extension] for extension in extensions]
+
+    for index in range(num_files):
+        extension = rng.choices(extensions, weights)[0]
+        topic = rng.choice(_TOPICS)
+        package = rng.choice(["core", "data", "utils", "models", "io"])
+        file_path = repo_path / package / f"{topic}_{index}{extension}"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(
+            _render_file(extension, topic, index, rng), encoding="utf-8"
+        )
+
+    return repo_path
+
+
+def _peak_rss_mb() -> float:
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _create_benchmark_indexer(settings: Dict[str, Any]):
+    """CodeIndexer whose provider requests are served by the simulated LLM"""
+    from tools.code_indexer import CodeIndexer
+
+    work_dir = Path(settings["work_dir"])
+
+    class BenchmarkCodeIndexer(CodeIndexer):
+        llm_calls = 0
+
+        def _load_indexer_config(self) -> Dict[str, Any]:
+            config = super()._load_indexer_config()
+            # A configured log file goes to the work dir, not the caller's cwd
+            config.setdefault("logging", {})["log_file"] = str(work_dir / "indexer.log")
+            return config
+
+        async def _initialize_llm_client(self):
+            return "benchmark", "benchmark"
+
+        async def _send_llm_request(
+            self,
+            client,
+            client_type,
+            prompt,
+            system_prompt,
+            max_tokens,
+            prompt_prefix="",
+        ) -> Tuple[str, Dict[str, int]]:
+            self.llm_calls += 1
+            latency = settings["latency"] * (
+                1 + random.uniform(-settings["jitter"], settings["jitter"])
+            )
+            await asyncio.sleep(max(latency, 0.0))
+            if random.random() < settings["error_rate"]:
+                raise SimulatedLLMError("Simulated rate limit (429)", status_code=429)
+
+            full_prompt = prompt_prefix + prompt
+            return self._generate_mock_response(full_prompt), {
+                "prompt_tokens": len(full_prompt) // 4,
+                "cached_tokens": 0,
+                "cache_write_tokens": 0,
+            }
+
+    indexer = BenchmarkCodeIndexer(
+        code_base_path=str(work_dir / "code_base"),
+        target_structure=BENCHMARK_TARGET_STRUCTURE,
+        output_dir=str(work_dir / f"indexes_{settings['mode']}"),
+        indexer_config_path=settings["indexer_config"],
+    )
+
+    # Every run must do the full amount of work
+    indexer.code_base_path = work_dir / "code_base"
+    indexer.output_dir = work_dir / f"indexes_{settings['mode']}"
+    indexer.output_dir.mkdir(parents=True, exist_ok=True)
+    indexer.enable_concurrent_analysis = settings["mode"] == "concurrent"
+    if settings["mode"] == "sequential":
+        # Repositories too, or --repos N would still be indexed in parallel
+        indexer.max_concurrent_repos = 1
+    indexer.enable_pre_filtering = settings["pre_filter"]
+    indexer.enable_persistent_cache = False
+    indexer.enable_incremental_indexing = False
+    indexer.enable_index_journal = False
+    indexer.mock_llm_responses = False
+    indexer.offline_mode = False
+    indexer.save_raw_responses = False
+    indexer.verbose_output = False
+    indexer.retry_delay = settings["retry_delay"]
+    indexer.logger.setLevel(logging.ERROR)
+    return indexer
+
+
+def run_mode(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Index the synthetic code base once in the given mode and return its metrics"""
+    random.seed(settings["seed"])
+    indexer = _create_benchmark_indexer(settings)
+
+    started = time.perf_counter()
+    output_files = asyncio.run(indexer.build_all_indexes())
+    wall_clock = time.perf_counter() - started
+
+    files_indexed = 0
+    error_files = 0
+    for index_file in output_files.values():
+        with open(index_file, "r", encoding="utf-8") as f:
+            summaries = json.load(f)["file_summaries"]
+        files_indexed += len(summaries)
+        error_files += sum(
+            1 for summary in summaries if summary["file_type"] == "error"
+        )
+
+    limiter_stats = indexer._get_concurrency_limiter().stats()
+    return {
+        "mode": settings["mode"],
+        "repositories": len(output_files),
+        "files_indexed": files_indexed,
+        "error_files": error_files,
+        "llm_calls": indexer.llm_calls,
+        "llm_calls_per_file": round(indexer.llm_calls / files_indexed, 3)
+        if files_indexed
+        else 0,
+        "wall_clock_seconds": round(wall_clock, 3),
+        "files_per_second": round(files_indexed / wall_clock, 2) if wall_clock else 0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_concurrency_window": limiter_stats["peak_window"],
+        "rate_limited_requests": limiter_stats["rate_limited"],
+    }
+
+
+def _run_mode_in_subprocess(settings: Dict[str, Any]) -> Dict[str, Any]:
+    # A fresh interpreter per mode keeps peak RSS and caches independent
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "tools.indexer_benchmark",
+            "--run-mode",
+            json.dumps(settings),
+        ],
+        capture_output=True,
+        text=True,
+        cwd=str(Path(__file__).resolve().parent.parent),
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f"{settings['mode']} benchmark failed:\n{completed.stderr[-2000:]}"
+        )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Render benchmark results as a fixed-width table"""
+    columns = [
+        ("mode", "Mode"),
+        ("files_indexed", "Files"),
+        ("wall_clock_seconds", "Wall (s)"),
+        ("files_per_second", "Files/s"),
+        ("llm_calls_per_file", "Calls/file"),
+        ("peak_rss_mb", "Peak RSS (MB)"),
+        ("peak_concurrency_window", "Peak window"),
+        ("rate_limited_requests", "429s"),
+    ]
+    header = " | ".join(f"{title:>13}" for _, title in columns)
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            " | ".join(
+                f"{'n/a' if result.get(key) is None else result.get(key):>13}"
+                for key, _ in columns
+            )
+        )
+    return "\n".join(lines)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark CodeIndexer offline with a simulated LLM"
+    )
+    parser.add_argument("--files", type=int, default=100, help="Files per repository")
+    parser.add_argument("--repos", type=int, default=1, help="Number of repositories")
+    parser.add_argument(
+        "--languages",
+        default=DEFAULT_LANGUAGE_MIX,
+        help=f"Language mix as ext=weight pairs (default: {DEFAULT_LANGUAGE_MIX})",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Mean LLM latency in seconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.5, help="Latency jitter as a fraction"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of calls failing with 429",
+    )
+    parser.add_argument(
+        "--retry-delay", type=float, default=0.05, help="Retry delay of the indexer"
+    )
+    parser.add_argument(
+        "--modes",
+        default="sequential,concurrent",
+        help="Comma-separated modes to run (sequential, concurrent)",
+    )
+    parser.add_argument(
+        "--pre-filter",
+        action="store_true",
+        help="Keep pre-filtering on (by default every generated file is analyzed)",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument(
+        "--config",
+        default=str(Path(__file__).resolve().parent / "indexer_config.yaml"),
+        help="Indexer configuration file",
+    )
+    parser.add_argument("--output", "-o", help="Write results as JSON to this file")
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(json.loads(args.run_mode))))
+        return 0
+
+    language_mix = parse_language_mix(args.languages)
+    with tempfile.TemporaryDirectory(prefix="indexer_benchmark_") as work_dir:
+        for repo_number in range(args.repos):
+            generate_synthetic_repo(
+                Path(work_dir) / "code_base",
+                f"repo_{repo_number}",
+                args.files,
+                language_mix,
+                args.seed + repo_number,
+            )
+
+        print(
+            f"🏁 Benchmarking {args.repos} repo(s) x {args.files} files, "
+            f"latency {args.latency}s ±{args.jitter:.0%}, error rate {args.error_rate:.1%}"
+        )
+        results = []
+        for mode in [mode.strip() for mode in args.modes.split(",") if mode.strip()]:
+            settings = {
+                "mode": mode,
+                "work_dir": work_dir,
+                "indexer_config": args.config,
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "error_rate": args.error_rate,
+                "retry_delay": args.retry_delay,
+                "pre_filter": args.pre_filter,
+                "seed": args.seed,
+            }
+            results.append(_run_mode_in_subprocess(settings))
+
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,172 @@
+"""
+Analysis Cache for the Code Indexer
+
+Persists per-file LLM analysis results so that repositories indexed in earlier
+runs (or for earlier papers) do not pay for the same LLM calls again.
+
+Features:
+- Content-addressed keys (file content + model + prompt template version)
+- SQLite storage in WAL mode, safe to share between concurrent indexer processes;
+  reads never write, and a database locked past the busy timeout reads as a miss
+- Survives across runs and papers
+- In-process LRU cache bounded by total entry size, with hit/miss/eviction counters
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+class PersistentAnalysisCache:
+    """SQLite-backed, content-addressed store of file analysis results"""
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: str, timeout: float = 5.0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        # The busy timeout lets several indexer processes share the file
+        self._conn = sqlite3.connect(
+            str(self.db_path), timeout=timeout, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                cache_key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(content: str, model: str, prompt_version: str) -> str:
+        """Build a cache key from file content, model name and prompt version"""
+        digest = hashlib.sha256()
+        digest.update(prompt_version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(content.encode("utf-8", errors="ignore"))
+        return digest.hexdigest()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached payload for a key, or None on a miss"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT payload FROM analysis_cache WHERE cache_key = ?",
+                    (cache_key,),
+                ).fetchone()
+        except sqlite3.OperationalError:
+            # Database locked by another process past the busy timeout
+            return None
+        if row is None:
+            return None
+
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return None
+
+    def contains(self, cache_key: str) -> bool:
+        """Check whether a key is cached"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT 1 FROM analysis_cache WHERE cache_key = ?", (cache_key,)
+                ).fetchone()
+        except sqlite3.OperationalError:
+            return False
+        return row is not None
+
+    def put(self, cache_key: str, payload: Dict[str, Any]):
+        """Store a payload under a key, replacing any existing entry"""
+        now = time.time()
+        serialized = json.dumps(payload, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache "
+                "(cache_key, payload, created_at, last_accessed) VALUES (?, ?, ?, ?)",
+                (cache_key, serialized, now, now),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[
+                0
+            ]
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class LRUAnalysisCache:
+    """In-memory LRU cache bounded by the total byte size of its entries"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value and mark it most recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, value: Any, size_bytes: int):
+        """Insert a value, evicting least recently used entries to fit the budget"""
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+
+        # Entries larger than the whole budget are never cached
+        if size_bytes > self.max_bytes:
+            return
+
+        self._entries[key] = (value, size_bytes)
+        self.current_bytes += size_bytes
+
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters describing cache effectiveness"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,343 @@
+"""
+Async Process Runner
+
+Runs commands for the MCP execution tools without blocking the server's event
+loop, so other tool calls keep making progress while a test or training
+script runs.
+
+Features:
+- asyncio subprocesses for argument lists and shell command lines
+- Timeout that kills the whole process group, not only the direct child
+- Cancelling the awaiting tool call kills the process as well
+- subprocess.TimeoutExpired (ProcessTimeout) on timeout, as with subprocess.run,
+  carrying the output produced before the kill
+- stdin detached from the server, whose own stdin carries the MCP protocol
+- Bounded output capture: the first and last bytes of each stream are kept in
+  memory and the full stream is spilled to a log file once it overflows
+"""
+
+import asyncio
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+# Children get their own process group on POSIX so a timeout can kill
+# everything a shell command started
+_USE_PROCESS_GROUPS = os.name == "posix"
+
+# Bytes of each stream returned to the caller: the start and the end, where
+# usage errors and final results / tracebacks are
+OUTPUT_HEAD_BYTES = 8 * 1024
+OUTPUT_TAIL_BYTES = 24 * 1024
+
+# Full output of overflowing streams goes to this directory of the workspace;
+# only the newest MAX_SPILL_FILES logs are kept
+SPILL_DIRECTORY_NAME = ".execution_logs"
+MAX_SPILL_FILES = 50
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class OutputCapture:
+    """
+    Head and tail of one output stream.
+
+    Output up to head_bytes + tail_bytes is kept whole. Past that the middle
+    is dropped from memory, and everything (including what was already seen)
+    is written to a spill file in spill_dir for paged reading.
+    """
+
+    def __init__(
+        self,
+        stream_name: str,
+        spill_dir: Optional[Union[str, Path]] = None,
+        label: str = "output",
+        head_bytes: int = OUTPUT_HEAD_BYTES,
+        tail_bytes: int = OUTPUT_TAIL_BYTES,
+    ):
+        self.stream_name = stream_name
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self.label = label
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.spill_path: Optional[Path] = None
+        self._spill_file = None
+        self._spill_attempted = False
+
+    @property
+    def omitted_bytes(self) -> int:
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    def feed(self, data: bytes):
+        self.total_bytes += len(data)
+        if self._spill_file is not None:
+            self._spill_file.write(data)
+
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+
+        self.tail += data
+        if len(self.tail) > self.tail_bytes:
+            if not self._spill_attempted:
+                # Nothing has been dropped yet: head + tail is the whole stream
+                self._spill_attempted = True
+                self._open_spill_file()
+            del self.tail[: len(self.tail) - self.tail_bytes]
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def text(self) -> str:
+        """Decoded output, with a marker where bytes were left out"""
+        if not self.omitted_bytes:
+            return bytes(self.head + self.tail).decode("utf-8", errors="replace")
+
+        tail = bytes(self.tail)
+        # Do not start the tail in the middle of a UTF-8 sequence
+        start = 0
+        while start < min(len(tail), 3) and 0x80 <= tail[start] < 0xC0:
+            start += 1
+        location = (
+            f"full output: {self.spill_path}"
+            if self.spill_path is not None
+            else "full output not saved"
+        )
+        return (
+            bytes(self.head).decode("utf-8", errors="replace")
+            + f"\n... [{self.omitted_bytes} bytes omitted; {location}] ...\n"
+            + tail[start:].decode("utf-8", errors="replace")
+        )
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        """Truncation details for tool responses, None if nothing was dropped"""
+        if not self.omitted_bytes:
+            return None
+        return {
+            "total_bytes": self.total_bytes,
+            "omitted_bytes": self.omitted_bytes,
+            "full_output_path": str(self.spill_path) if self.spill_path else None,
+        }
+
+    def _open_spill_file(self):
+        if self.spill_dir is None:
+            return
+        try:
+            descriptor, path = _create_spill_file(
+                self.spill_dir, self.label, self.stream_name
+            )
+            self._spill_file = os.fdopen(descriptor, "wb")
+            self._spill_file.write(self.head)
+            self._spill_file.write(self.tail)
+            self.spill_path = path
+        except OSError:
+            self._spill_file = None
+
+    @classmethod
+    def from_file(
+        cls,
+        path: Union[str, Path],
+        stream_name: str,
+        spill_dir: Optional[Union[str, Path]] = None,
+        label: str = "output",
+    ) -> "OutputCapture":
+        """
+        Capture output a process wrote to a file.
+
+        Only the head and tail are read; an overflowing file is moved into
+        spill_dir instead of being copied.
+        """
+        capture = cls(stream_name, spill_dir, label)
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= capture.head_bytes + capture.tail_bytes:
+                    capture.feed(f.read())
+                    return capture
+                capture.head += f.read(capture.head_bytes)
+                f.seek(size - capture.tail_bytes)
+                capture.tail += f.read(capture.tail_bytes)
+                capture.total_bytes = size
+        except OSError:
+            return capture
+
+        if capture.spill_dir is not None:
+            try:
+                descriptor, spill_path = _create_spill_file(
+                    capture.spill_dir, label, stream_name
+                )
+                os.close(descriptor)
+                shutil.move(str(path), str(spill_path))
+                capture.spill_path = spill_path
+            except OSError:
+                pass
+        return capture
+
+
+def _create_spill_file(
+    spill_dir: Path, label: str, stream_name: str
+) -> Tuple[int, Path]:
+    """New uniquely named log file in spill_dir, as (descriptor, path)"""
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    _prune_spill_files(spill_dir)
+    descriptor, path = tempfile.mkstemp(
+        prefix=f"{label}_{time.strftime('%Y%m%d-%H%M%S')}_",
+        suffix=f".{stream_name}.log",
+        dir=spill_dir,
+    )
+    return descriptor, Path(path)
+
+
+def _prune_spill_files(spill_dir: Path):
+    """Remove the oldest logs so a new one keeps the directory at the cap"""
+    try:
+        logs = sorted(spill_dir.glob("*.log"), key=lambda path: path.stat().st_mtime)
+    except OSError:
+        return
+    for old_log in logs[: max(0, len(logs) - MAX_SPILL_FILES + 1)]:
+        try:
+            old_log.unlink()
+        except OSError:
+            pass
+
+
+@dataclass
+class ProcessResult:
+    """Exit status and decoded output of a finished process"""
+
+    returncode: int
+    stdout: str
+    stderr: str
+    # Served by a pre-forked warm interpreter (tools/python_worker_pool.py)
+    warm_start: bool = False
+    # Stream name -> OutputCapture.report() for streams that were cut
+    truncation: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @classmethod
+    def from_captures(
+        cls,
+        returncode: int,
+        stdout: OutputCapture,
+        stderr: OutputCapture,
+        warm_start: bool = False,
+    ) -> "ProcessResult":
+        truncation = {}
+        for capture in (stdout, stderr):
+            report = capture.report()
+            if report is not None:
+                truncation[capture.stream_name] = report
+        return cls(
+            returncode=returncode,
+            stdout=stdout.text(),
+            stderr=stderr.text(),
+            warm_start=warm_start,
+            truncation=truncation,
+        )
+
+
+class ProcessTimeout(subprocess.TimeoutExpired):
+    """Timeout with the (bounded) output the process produced before it was killed"""
+
+    def __init__(self, command, timeout: float, result: ProcessResult):
+        super().__init__(command, timeout, output=result.stdout, stderr=result.stderr)
+        self.result = result
+
+
+def _kill_process_tree(process: asyncio.subprocess.Process):
+    if process.returncode is not None:
+        return
+    try:
+        if _USE_PROCESS_GROUPS:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _drain(stream: asyncio.StreamReader, capture: OutputCapture):
+    while True:
+        chunk = await stream.read(STREAM_CHUNK_BYTES)
+        if not chunk:
+            return
+        capture.feed(chunk)
+
+
+async def run_process(
+    command: Union[str, Sequence[str]],
+    cwd: Optional[Union[str, Path]] = None,
+    timeout: Optional[float] = None,
+    shell: bool = False,
+    spill_dir: Optional[Union[str, Path]] = None,
+    label: str = "output",
+) -> ProcessResult:
+    """
+    Run a command to completion without blocking the event loop.
+
+    Args:
+        command: Argument list, or a command line when shell is True
+        cwd: Working directory
+        timeout: Seconds before the process (group) is killed
+        shell: Run command through the platform shell, like subprocess's shell=True
+        spill_dir: Where full output of overflowing streams is written
+        label: Prefix of spill file names, usually the tool name
+
+    Raises:
+        ProcessTimeout: The process was killed after timeout seconds
+    """
+    kwargs = {
+        "cwd": str(cwd) if cwd is not None else None,
+        "stdin": asyncio.subprocess.DEVNULL,
+        "stdout": asyncio.subprocess.PIPE,
+        "stderr": asyncio.subprocess.PIPE,
+    }
+    if _USE_PROCESS_GROUPS:
+        kwargs["start_new_session"] = True
+
+    if shell:
+        process = await asyncio.create_subprocess_shell(command, **kwargs)
+    else:
+        process = await asyncio.create_subprocess_exec(*command, **kwargs)
+
+    stdout = OutputCapture("stdout", spill_dir, label)
+    stderr = OutputCapture("stderr", spill_dir, label)
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                _drain(process.stdout, stdout),
+                _drain(process.stderr, stderr),
+                process.wait(),
+            ),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        _kill_process_tree(process)
+        await process.wait()
+        stdout.close()
+        stderr.close()
+        partial = ProcessResult.from_captures(process.returncode, stdout, stderr)
+        raise ProcessTimeout(command, timeout, partial)
+    except asyncio.CancelledError:
+        _kill_process_tree(process)
+        await process.wait()
+        raise
+    finally:
+        stdout.close()
+        stderr.close()
+
+    return ProcessResult.from_captures(process.returncode, stdout, stderr)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Python Fork Server
+
+Long-lived interpreter that imports heavy modules once and forks a fresh child
+for every script it is asked to run, so execute_python does not pay the
+numpy/torch import cost on each call. Started and driven by
+tools/python_worker_pool.py; only uses the standard library so it runs without
+the repository on sys.path.
+
+Protocol (JSON lines over stdin/stdout):
+- server -> client: {"ready": true, "preloaded": [...]} once imports finish
+- client -> server: {"id", "script", "cwd", "stdout_path", "stderr_path"}
+- server -> client: {"id", "pid"} when the child is forked
+- server -> client: {"id", "returncode"} when the child exits (negative for signals)
+
+Each child runs in its own session, so the client can kill a script and
+everything it started with one killpg. Closing stdin stops the server and
+kills any children still running.
+
+Usage:
+python tools/python_fork_server.py [module ...]
+"""
+
+import atexit
+import importlib
+import importlib.util
+import json
+import os
+import runpy
+import select
+import signal
+import sys
+
+
+def _preload(module_names):
+    """Import the modules that are installed, ignoring any that fail"""
+    loaded = []
+    for name in module_names:
+        try:
+            if importlib.util.find_spec(name) is None:
+                continue
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            continue
+    return loaded
+
+
+def _reseed_random_state():
+    """Children must not share the random streams they inherited from the server"""
+    random_module = sys.modules.get("random")
+    if random_module is not None:
+        random_module.seed()
+    numpy_module = sys.modules.get("numpy")
+    if numpy_module is not None:
+        try:
+            numpy_module.random.seed()
+        except Exception:
+            pass
+
+
+def _exit_code(exit_request: SystemExit) -> int:
+    code = exit_request.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _run_child(request, inherited_fds):
+    """Body of a forked child: behave like `python <script>` run in cwd"""
+    os.setsid()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    for fd in inherited_fds:
+        os.close(fd)
+
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    for target_fd, path in ((1, request["stdout_path"]), (2, request["stderr_path"])):
+        fd = os.open(path, flags, 0o600)
+        os.dup2(fd, target_fd)
+        os.close(fd)
+
+    script = request["script"]
+    os.chdir(request["cwd"])
+    sys.argv = [script]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    _reseed_random_state()
+
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as exit_request:
+        code = _exit_code(exit_request)
+    except BaseException as error:
+        # Start the traceback at the script, as a plain interpreter would
+        tb = error.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        tb = tb or error.__traceback__
+        sys.excepthook(type(error), error.with_traceback(tb), tb)
+        code = 1
+
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        pass
+    os._exit(code & 0xFF)
+
+
+def serve(module_names):
+    # The control channel gets private descriptors; fds 0/1 are pointed away
+    # from it so nothing a module or child prints can corrupt the protocol
+    control_in = os.dup(0)
+    control_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    os.dup2(2, 1)
+
+    def send(message):
+        os.write(control_out, (json.dumps(message) + "\n").encode("utf-8"))
+
+    # Drop this script's directory; children see the sys.path of a plain run
+    if sys.path and os.path.abspath(sys.path[0] or ".") == os.path.dirname(
+        os.path.abspath(__file__)
+    ):
+        del sys.path[0]
+    send({"ready": True, "preloaded": _preload(module_names)})
+
+    # SIGCHLD wakes the select loop so exits are reported promptly
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    inherited_fds = (control_in, control_out, wakeup_read, wakeup_write)
+
+    children = {}  # pid -> request id
+    buffer = b""
+    while True:
+        ready, _, _ = select.select([control_in, wakeup_read], [], [])
+
+        if wakeup_read in ready:
+            os.read(wakeup_read, 4096)
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            request_id = children.pop(pid, None)
+            if request_id is not None:
+                send(
+                    {"id": request_id, "returncode": os.waitstatus_to_exitcode(status)}
+                )
+
+        if control_in not in ready:
+            continue
+        data = os.read(control_in, 65536)
+        if not data:
+            break
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    _run_child(request, inherited_fds)
+                finally:
+                    os._exit(1)
+            children[pid] = request["id"]
+            send({"id": request["id"], "pid": pid})
+
+    # Client went away: take any running scripts down with the server
+    for pid in children:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1:])
@@ -0,0 +1,297 @@
+"""
+Warm Python Worker Pool
+
+Runs execute_python scripts in children forked from a warm fork server
+(tools/python_fork_server.py) that has already imported the heavy ML modules,
+instead of starting a fresh interpreter for every call.
+
+Features:
+- One fork server per workspace, started in the background on first use
+- Per-call isolation: every script runs in its own freshly forked process
+- Timeout and cancellation kill the script's whole process group
+- Cold-process fallback while the server is starting, on platforms without
+  fork, and when the server crashes before forking the script (disabled after
+  repeated crashes); a script whose server dies under it is killed, never re-run
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import signal
+import sys
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+from tools.process_runner import (
+    OutputCapture,
+    ProcessResult,
+    ProcessTimeout,
+    run_process,
+)
+
+logger = logging.getLogger(__name__)
+
+FORK_SERVER_SCRIPT = Path(__file__).with_name("python_fork_server.py")
+
+# Imported once by the fork server when installed
+DEFAULT_PRELOAD_MODULES = ["numpy", "torch"]
+
+# The fork server is abandoned for the session after this many crashes
+MAX_FORK_SERVER_FAILURES = 3
+
+# Seconds to wait for a killed child's exit to be reported
+KILL_REPORT_TIMEOUT = 5
+
+
+class ForkServerError(Exception):
+    """The fork server died or stopped answering"""
+
+
+class PythonWorkerPool:
+    """Warm fork server for execute_python, with cold-process fallback"""
+
+    def __init__(self, preload_modules: Sequence[str] = DEFAULT_PRELOAD_MODULES):
+        self.preload_modules = list(preload_modules)
+        self.available = hasattr(os, "fork") and FORK_SERVER_SCRIPT.exists()
+        self.failures = 0
+        self.preloaded: List[str] = []
+        self.workspace: Optional[Path] = None
+
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._request_ids = itertools.count(1)
+        # request id -> futures for the child's pid and its return code
+        self._started: Dict[int, asyncio.Future] = {}
+        self._finished: Dict[int, asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.available and self.failures < MAX_FORK_SERVER_FAILURES
+
+    def warm_up(self, workspace: Union[str, Path]):
+        """Start (or move) the fork server for a workspace without waiting for it"""
+        if not self.enabled:
+            return
+        workspace = Path(workspace)
+        starting_or_running = self._reader is not None and not self._reader.done()
+        if starting_or_running and self.workspace == workspace:
+            return
+        self._stop()
+        self.workspace = workspace
+        self._ready = asyncio.Event()
+        self._reader = asyncio.ensure_future(self._start_and_read(workspace))
+
+    async def run(
+        self,
+        script: Union[str, Path],
+        cwd: Union[str, Path],
+        timeout: float,
+        spill_dir: Optional[Union[str, Path]] = None,
+    ) -> ProcessResult:
+        """
+        Run a Python script like `python <script>` in cwd.
+
+        Uses a warm worker when the workspace's fork server is ready, a cold
+        interpreter otherwise. Output is captured as in run_process, with the
+        full output of overflowing streams kept in spill_dir.
+
+        Only a script the fork server never forked is retried cold. If the
+        server dies while the script runs, the script is killed and returned
+        as failed with its output so far, since re-running it could repeat
+        its side effects.
+
+        Raises:
+            ProcessTimeout: The script was killed after timeout seconds
+        """
+        self.warm_up(cwd)
+        if self.enabled and self._ready is not None and self._ready.is_set():
+            try:
+                return await self._run_warm(str(script), str(cwd), timeout, spill_dir)
+            except ForkServerError as e:
+                logger.warning(f"Python fork server failed, running cold: {e}")
+
+        return await run_process(
+            [sys.executable, str(script)],
+            cwd=cwd,
+            timeout=timeout,
+            spill_dir=spill_dir,
+            label="execute_python",
+        )
+
+    async def _start_and_read(self, workspace: Path):
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                str(FORK_SERVER_SCRIPT),
+                *self.preload_modules,
+                cwd=str(workspace),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            self._process = process
+
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                self._dispatch(json.loads(line))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Python fork server error: {e}")
+
+        # The server exited: fail everything still waiting on it and start a
+        # replacement unless it keeps crashing
+        self._fail_pending(ForkServerError("fork server exited"))
+        if self._process is process:
+            self.failures += 1
+            self._process = None
+            self._ready = None
+            self._reader = None
+            self.warm_up(workspace)
+
+    def _dispatch(self, message: Dict):
+        if message.get("ready"):
+            self.preloaded = message.get("preloaded", [])
+            logger.info(f"Python fork server ready, preloaded: {self.preloaded}")
+            self._ready.set()
+            return
+
+        request_id = message.get("id")
+        if "pid" in message:
+            future = self._started.pop(request_id, None)
+            if future is not None and not future.done():
+                future.set_result(message["pid"])
+        elif "returncode" in message:
+            future = self._finished.pop(request_id, None)
+            if future is not None and not future.done():
+                future.set_result(message["returncode"])
+
+    def _fail_pending(self, error: Exception):
+        for future in [*self._started.values(), *self._finished.values()]:
+            if not future.done():
+                future.set_exception(error)
+        self._started.clear()
+        self._finished.clear()
+
+    def _stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._process is not None:
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            self._process = None
+        self._ready = None
+        self._fail_pending(ForkServerError("fork server stopped"))
+
+    async def _run_warm(
+        self,
+        script: str,
+        cwd: str,
+        timeout: float,
+        spill_dir: Optional[Union[str, Path]],
+    ) -> ProcessResult:
+        loop = asyncio.get_running_loop()
+        request_id = next(self._request_ids)
+        started = self._started[request_id] = loop.create_future()
+        finished = self._finished[request_id] = loop.create_future()
+
+        output_dir = tempfile.mkdtemp(prefix="execute_python_")
+        stdout_path = os.path.join(output_dir, "stdout")
+        stderr_path = os.path.join(output_dir, "stderr")
+        request = {
+            "id": request_id,
+            "script": script,
+            "cwd": cwd,
+            "stdout_path": stdout_path,
+            "stderr_path": stderr_path,
+        }
+
+        pid = None
+        try:
+            process = self._process
+            if process is None:
+                raise ForkServerError("fork server not running")
+            try:
+                process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+                await process.stdin.drain()
+            except (ConnectionError, RuntimeError) as e:
+                raise ForkServerError(str(e))
+
+            pid = await started
+            try:
+                returncode = await asyncio.wait_for(asyncio.shield(finished), timeout)
+            except asyncio.TimeoutError:
+                self._kill_child(pid)
+                returncode = await self._await_killed(finished)
+                partial = self._collect_output(
+                    returncode, stdout_path, stderr_path, spill_dir
+                )
+                raise ProcessTimeout(script, timeout, partial)
+            except ForkServerError:
+                # The server died under a running script: take the orphan down
+                # and report it as failed. Re-running could repeat side effects.
+                self._kill_child(pid)
+                partial = self._collect_output(
+                    -signal.SIGKILL, stdout_path, stderr_path, spill_dir
+                )
+                note = (
+                    "[execute_python] The Python fork server exited while the "
+                    "script was running; the script was killed and not re-run.\n"
+                )
+                return replace(partial, stderr=partial.stderr + note)
+
+            return self._collect_output(returncode, stdout_path, stderr_path, spill_dir)
+        except asyncio.CancelledError:
+            if pid is not None:
+                self._kill_child(pid)
+            raise
+        finally:
+            self._started.pop(request_id, None)
+            self._finished.pop(request_id, None)
+            if finished.done() and not finished.cancelled():
+                # Retrieve a server failure nobody awaited
+                finished.exception()
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    @staticmethod
+    def _kill_child(pid: int):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    @staticmethod
+    async def _await_killed(finished: asyncio.Future) -> Optional[int]:
+        """Return code of a killed child, None if the server does not report it"""
+        try:
+            return await asyncio.wait_for(finished, KILL_REPORT_TIMEOUT)
+        except (asyncio.TimeoutError, ForkServerError):
+            return None
+
+    @staticmethod
+    def _collect_output(
+        returncode: Optional[int],
+        stdout_path: str,
+        stderr_path: str,
+        spill_dir: Optional[Union[str, Path]],
+    ) -> ProcessResult:
+        """Head and tail of the child's output files; overflowing files are kept"""
+        return ProcessResult.from_captures(
+            returncode,
+            OutputCapture.from_file(stdout_path, "stdout", spill_dir, "execute_python"),
+            OutputCapture.from_file(stderr_path, "stderr", spill_dir, "execute_python"),
+            warm_start=True,
+        )
@@ -0,0 +1,325 @@
+"""
+Compiled Reference Indexes
+
+Search structures derived from a repository index (*_index.json), shared by
+the code indexer, which precompiles them, and the code reference indexer MCP
+server, which searches them.
+
+Features:
+- CodeReference / RelationshipInfo records extracted from index JSON
+- BM25 postings over reference paths, symbols, concepts and summaries
+- Relationship maps keyed by normalized target path and its suffixes
+- Reference file stems for name-substring lookups
+- Versioned binary artifact (<repo>_index.refidx) written next to the JSON
+  index, so the server can start without parsing and re-deriving everything
+"""
+
+import logging
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from tools.file_ranking import BM25Index, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever CompiledReferenceIndex or the structures it holds change shape
+REFERENCE_ARTIFACT_VERSION = 2
+REFERENCE_ARTIFACT_SUFFIX = ".refidx"
+
+
+@dataclass
+class CodeReference:
+    """Code reference information structure"""
+
+    file_path: str
+    file_type: str
+    main_functions: List[str]
+    key_concepts: List[str]
+    dependencies: List[str]
+    summary: str
+    lines_of_code: int
+    repo_name: str
+    confidence_score: float = 0.0
+
+
+@dataclass
+class RelationshipInfo:
+    """Relationship information structure"""
+
+    repo_file_path: str
+    target_file_path: str
+    relationship_type: str
+    confidence_score: float
+    helpful_aspects: List[str]
+    potential_contributions: List[str]
+    usage_suggestions: str
+
+
+def extract_code_references(index_data: Dict) -> List[CodeReference]:
+    """Extract code reference information from index data"""
+    references = []
+
+    repo_name = index_data.get("repo_name", "Unknown")
+    file_summaries = index_data.get("file_summaries", [])
+
+    for file_summary in file_summaries:
+        reference = CodeReference(
+            file_path=file_summary.get("file_path", ""),
+            file_type=file_summary.get("file_type", ""),
+            main_functions=file_summary.get("main_functions", []),
+            key_concepts=file_summary.get("key_concepts", []),
+            dependencies=file_summary.get("dependencies", []),
+            summary=file_summary.get("summary", ""),
+            lines_of_code=file_summary.get("lines_of_code", 0),
+            repo_name=repo_name,
+        )
+        references.append(reference)
+
+    return references
+
+
+def extract_relationships(index_data: Dict) -> List[RelationshipInfo]:
+    """Extract relationship information from index data"""
+    relationships = []
+
+    relationship_list = index_data.get("relationships", [])
+
+    for rel in relationship_list:
+        relationship = RelationshipInfo(
+            repo_file_path=rel.get("repo_file_path", ""),
+            target_file_path=rel.get("target_file_path", ""),
+            relationship_type=rel.get("relationship_type", ""),
+            confidence_score=rel.get("confidence_score", 0.0),
+            helpful_aspects=rel.get("helpful_aspects", []),
+            potential_contributions=rel.get("potential_contributions", []),
+            usage_suggestions=rel.get("usage_suggestions", ""),
+        )
+        relationships.append(relationship)
+
+    return relationships
+
+
+def build_reference_search_index(references: List[CodeReference]) -> BM25Index:
+    """
+    BM25 index over the searchable fields of each reference.
+
+    Path stems, function names and key concepts are weighted above summary and
+    file type words, mirroring how reliably each field names what a file does.
+    """
+    documents = []
+    for reference in references:
+        path = Path(reference.file_path)
+        strong_text = " ".join(
+            [*path.parent.parts[-2:], path.stem]
+            + reference.main_functions
+            + reference.key_concepts
+        )
+        weak_text = f"{reference.summary} {reference.file_type}"
+        documents.append(tokenize(strong_text) * 2 + tokenize(weak_text))
+    return BM25Index(documents)
+
+
+# Leading directories that target structures and relationships add inconsistently
+COMMON_PATH_PREFIXES = ["src/", "core/", "lib/", "main/", "./"]
+
+
+def normalize_target_path(target_path: str) -> str:
+    """Strip slashes and one common leading directory from a target file path"""
+    normalized = target_path.replace("\\", "/").strip("/")
+    for prefix in COMMON_PATH_PREFIXES:
+        if normalized.startswith(prefix):
+            return normalized[len(prefix) :]
+    return normalized
+
+
+def path_suffixes(normalized_path: str) -> List[str]:
+    """ "a/b/c.py" -> ["a/b/c.py", "b/c.py", "c.py"]"""
+    parts = normalized_path.split("/")
+    return ["/".join(parts[i:]) for i in range(len(parts))]
+
+
+def build_relationship_lookup(
+    relationships: List[RelationshipInfo],
+) -> Tuple[Dict[str, List[RelationshipInfo]], Dict[str, List[RelationshipInfo]]]:
+    """
+    Hash maps from normalized target paths to relationships.
+
+    Returns:
+        (full normalized path -> relationships,
+         every path suffix, basename included -> relationships)
+    """
+    by_full_path: Dict[str, List[RelationshipInfo]] = {}
+    by_path_suffix: Dict[str, List[RelationshipInfo]] = {}
+    for rel in relationships:
+        normalized = normalize_target_path(rel.target_file_path)
+        if not normalized:
+            continue
+        by_full_path.setdefault(normalized, []).append(rel)
+        for suffix in path_suffixes(normalized):
+            by_path_suffix.setdefault(suffix, []).append(rel)
+    return by_full_path, by_path_suffix
+
+
+@dataclass
+class CompiledReferenceIndex:
+    """Everything the reference server needs from one index file"""
+
+    repo_name: str
+    references: List[CodeReference]
+    relationships: List[RelationshipInfo]
+    # BM25 postings over the references, in the same order
+    search_index: BM25Index
+    # (lowercased stem, suffix) of each reference path, in the same order
+    reference_names: List[Tuple[str, str]]
+    # Distinct stems joined by newlines, and stem -> reference indexes
+    reference_stems_text: str
+    references_by_stem: Dict[str, List[int]]
+    # Normalized target path (and its suffixes) -> relationships
+    relationships_by_full_path: Dict[str, List[RelationshipInfo]]
+    relationships_by_path_suffix: Dict[str, List[RelationshipInfo]]
+    # Repository summary for get_indexes_overview
+    overview: Dict[str, Any]
+
+
+def build_stem_lookup(
+    reference_names: List[Tuple[str, str]],
+) -> Tuple[str, Dict[str, List[int]]]:
+    """Stem lookup structures for references_matching_name"""
+    by_stem: Dict[str, List[int]] = {}
+    for index, (stem, _) in enumerate(reference_names):
+        by_stem.setdefault(stem, []).append(index)
+    return "\n".join(by_stem), by_stem
+
+
+def references_matching_name(compiled: "CompiledReferenceIndex", name: str) -> Set[int]:
+    """Indexes of references whose stem contains name or is contained in it"""
+    by_stem = compiled.references_by_stem
+    if not name:
+        return set(range(len(compiled.references)))
+
+    matches = set()
+    # Stems contained in the name are among its substrings
+    substrings = {
+        name[start:end]
+        for start in range(len(name) + 1)
+        for end in range(start, len(name) + 1)
+    }
+    for substring in substrings:
+        matches.update(by_stem.get(substring, ()))
+
+    # Stems containing the name: scan the joined stems
+    text = compiled.reference_stems_text
+    position = text.find(name)
+    while position != -1:
+        line_start = text.rfind("\n", 0, position) + 1
+        line_end = text.find("\n", position)
+        if line_end == -1:
+            line_end = len(text)
+        matches.update(by_stem[text[line_start:line_end]])
+        position = text.find(name, line_end)
+    return matches
+
+
+def summarize_index(index_data: Dict, default_name: str = "") -> Dict[str, Any]:
+    """Repository-level overview: file types, main concepts, relationship count"""
+    file_types = set()
+    concepts = set()
+    for file_summary in index_data.get("file_summaries", []):
+        file_types.add(file_summary.get("file_type", "Unknown"))
+        concepts.update(file_summary.get("key_concepts", []))
+
+    return {
+        "repo_name": index_data.get("repo_name", default_name),
+        "total_files": index_data.get("total_files", 0),
+        "file_types": sorted(file_types),
+        "main_concepts": sorted(concepts)[:20],  # Limit concept count
+        "total_relationships": len(index_data.get("relationships", [])),
+    }
+
+
+def compile_reference_index(
+    index_data: Dict, default_name: str = ""
+) -> CompiledReferenceIndex:
+    """Derive the search structures of one parsed index file"""
+    references = extract_code_references(index_data)
+    relationships = extract_relationships(index_data)
+    by_full_path, by_path_suffix = build_relationship_lookup(relationships)
+    reference_names = [
+        (Path(ref.file_path).stem.lower(), Path(ref.file_path).suffix)
+        for ref in references
+    ]
+    stems_text, by_stem = build_stem_lookup(reference_names)
+    return CompiledReferenceIndex(
+        repo_name=index_data.get("repo_name", default_name),
+        references=references,
+        relationships=relationships,
+        search_index=build_reference_search_index(references),
+        reference_names=reference_names,
+        reference_stems_text=stems_text,
+        references_by_stem=by_stem,
+        relationships_by_full_path=by_full_path,
+        relationships_by_path_suffix=by_path_suffix,
+        overview=summarize_index(index_data, default_name),
+    )
+
+
+def reference_artifact_path(index_file: Path) -> Path:
+    """<repo>_index.json -> <repo>_index.refidx"""
+    return Path(index_file).with_suffix(REFERENCE_ARTIFACT_SUFFIX)
+
+
+def write_reference_artifact(index_file: Path, index_data: Dict) -> Path:
+    """
+    Compile an index and store it next to its JSON file.
+
+    The artifact records the JSON file's mtime and size, so it is ignored once
+    the JSON is rewritten without it. Write the JSON first.
+    """
+    index_file = Path(index_file)
+    stat = index_file.stat()
+    artifact = {
+        "version": REFERENCE_ARTIFACT_VERSION,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_size": stat.st_size,
+        "index": compile_reference_index(index_data, index_file.stem),
+    }
+
+    artifact_path = reference_artifact_path(index_file)
+    temporary_path = artifact_path.with_name(artifact_path.name + ".tmp")
+    with open(temporary_path, "wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, artifact_path)
+    return artifact_path
+
+
+def load_reference_artifact(
+    index_file: Path, stat: os.stat_result
+) -> Optional[CompiledReferenceIndex]:
+    """
+    Load the compiled form of an index file if it is current.
+
+    Returns None when there is no artifact, it has another version, or it was
+    compiled from a different revision of the JSON file.
+    """
+    artifact_path = reference_artifact_path(index_file)
+    if not artifact_path.exists():
+        return None
+
+    try:
+        with open(artifact_path, "rb") as f:
+            artifact = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable reference artifact {artifact_path}: {e}")
+        return None
+
+    if (
+        not isinstance(artifact, dict)
+        or artifact.get("version") != REFERENCE_ARTIFACT_VERSION
+        or artifact.get("source_mtime_ns") != stat.st_mtime_ns
+        or artifact.get("source_size") != stat.st_size
+    ):
+        return None
+    return artifact["index"]
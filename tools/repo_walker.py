@@ -0,0 +1,404 @@
+"""
+Repository Walker for the Code Indexer
+
+Walks a repository once with os.scandir and produces both the list of files to
+analyze and the file tree shown to the LLM, skipping everything that is not
+hand-written source.
+
+Features:
+- Early pruning of hidden, skipped and ignored directories (nothing below them is read)
+- .gitignore / .ignore rules per directory, plus .git/info/exclude at the root
+- Binary detection (NUL bytes, non-text ratio) from a small byte sample
+- Minified and generated file detection (long lines, "@generated"-style markers,
+  lock files, *.min.js, protobuf output)
+- Depth-limited file tree with a per-directory entry cap, built in the same pass
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Files whose contents are never read: weights, archives, media, data dumps
+BINARY_EXTENSIONS = {
+    ".pt", ".pth", ".ckpt", ".bin", ".safetensors", ".onnx", ".pb", ".h5", ".hdf5",
+    ".npy", ".npz", ".pkl", ".pickle", ".joblib", ".parquet", ".feather", ".arrow",
+    ".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".whl", ".egg",
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".tif", ".tiff", ".webp",
+    ".mp3", ".wav", ".flac", ".mp4", ".avi", ".mov", ".mkv", ".pdf",
+    ".so", ".dll", ".dylib", ".o", ".a", ".pyc", ".pyo", ".class", ".jar", ".exe",
+    ".db", ".sqlite", ".sqlite3", ".lmdb", ".tfrecord", ".ttf", ".woff", ".woff2",
+}  # fmt: skip
+
+# Generated files recognizable by name alone
+GENERATED_FILE_NAMES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock",
+    "Pipfile.lock", "Cargo.lock", "go.sum", "composer.lock", "Gemfile.lock",
+}  # fmt: skip
+_GENERATED_NAME_RE = re.compile(
+    r"(\.min\.(js|css)|\.bundle\.js|_pb2(_grpc)?\.py|\.pb\.go|\.generated\.\w+)$"
+)
+
+# Markers that code generators put in a comment near the top of their output
+_GENERATED_MARKER_RE = re.compile(
+    rb"(?m)^[ \t]*(?:#|//|/?\*|<!--|--|;)[^\n]*"
+    rb"(?:@generated|DO NOT EDIT|Code generated by|[Aa]uto-?generated (?:file|code|by))"
+)
+
+# Bytes at the start of a file inspected for the generated marker
+GENERATED_MARKER_WINDOW = 1024
+
+# A sample with a line this long and long lines on average is treated as minified
+MINIFIED_LINE_LENGTH = 1000
+MINIFIED_AVERAGE_LINE_LENGTH = 200
+
+# Share of control bytes above which a sample without NUL bytes is still binary
+BINARY_CONTROL_RATIO = 0.3
+
+# Control bytes that do not occur in text (tab, newlines, form feed, escape excluded)
+_CONTROL_BYTES = bytes(byte for byte in range(32) if byte not in (8, 9, 10, 12, 13, 27))
+
+IGNORE_FILE_NAMES = (".gitignore", ".ignore")
+
+
+def _ignore_pattern_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob (without negation or trailing slash) to a regex"""
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif char == "*":
+            regex += "[^/]*"
+            i += 1
+        elif char == "?":
+            regex += "[^/]"
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+                i += 1
+            else:
+                body = pattern[i + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end + 1
+        elif char == "\\" and i + 1 < len(pattern):
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += re.escape(char)
+            i += 1
+
+    # A pattern without a slash matches at any depth below its ignore file
+    return regex if anchored else f"(?:.*/)?{regex}"
+
+
+@dataclass(frozen=True)
+class IgnoreRule:
+    """One compiled line of an ignore file"""
+
+    base: str  # directory of the ignore file, relative to the repository root
+    regex: "re.Pattern"
+    negate: bool
+    directory_only: bool
+
+
+class IgnoreRules:
+    """Ignore rules in effect for a directory (its own and its ancestors')"""
+
+    def __init__(self, rules: Tuple[IgnoreRule, ...] = ()):
+        self.rules = rules
+
+    @staticmethod
+    def parse(lines: Iterable[str], base: str) -> List[IgnoreRule]:
+        """Compile ignore file lines whose paths are relative to base"""
+        rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip("\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+
+            try:
+                regex = re.compile(_ignore_pattern_to_regex(line))
+            except re.error:
+                continue
+            rules.append(IgnoreRule(base, regex, negate, directory_only))
+        return rules
+
+    def extended(self, directory: Path, relative_directory: str) -> "IgnoreRules":
+        """Rules for a directory, adding its own ignore files if it has any"""
+        new_rules = []
+        for name in IGNORE_FILE_NAMES:
+            ignore_file = directory / name
+            try:
+                with open(ignore_file, "r", encoding="utf-8", errors="ignore") as f:
+                    new_rules.extend(self.parse(f, relative_directory))
+            except OSError:
+                continue
+        if not new_rules:
+            return self
+        return IgnoreRules(self.rules + tuple(new_rules))
+
+    def is_ignored(self, relative_path: str, is_directory: bool) -> bool:
+        """Whether a path relative to the repository root is ignored (last match wins)"""
+        ignored = False
+        for rule in self.rules:
+            if rule.directory_only and not is_directory:
+                continue
+            if rule.base:
+                if not relative_path.startswith(rule.base + "/"):
+                    continue
+                path = relative_path[len(rule.base) + 1 :]
+            else:
+                path = relative_path
+            if rule.regex.fullmatch(path):
+                ignored = not rule.negate
+        return ignored
+
+
+def classify_sample(file_name: str, sample: bytes) -> Optional[str]:
+    """
+    Classify a file from its name and first bytes.
+
+    Returns "binary", "generated" or "minified" for files that should not be
+    analyzed, or None for regular source text.
+    """
+    if b"\0" in sample:
+        return "binary"
+    if sample:
+        control = len(sample) - len(sample.translate(None, _CONTROL_BYTES))
+        if control / len(sample) > BINARY_CONTROL_RATIO:
+            return "binary"
+
+    if file_name in GENERATED_FILE_NAMES or _GENERATED_NAME_RE.search(file_name):
+        return "generated"
+    if _GENERATED_MARKER_RE.search(sample[:GENERATED_MARKER_WINDOW]):
+        return "generated"
+
+    lines = sample.split(b"\n")
+    longest = max((len(line) for line in lines), default=0)
+    if (
+        longest >= MINIFIED_LINE_LENGTH
+        and len(sample) / len(lines) >= MINIFIED_AVERAGE_LINE_LENGTH
+    ):
+        return "minified"
+    return None
+
+
+def _format_size(size: int) -> str:
+    return f" ({size // 1024}KB)" if size > 1024 else f" ({size}B)"
+
+
+@dataclass
+class RepoWalkResult:
+    """Files to analyze and tree lines collected in one walk"""
+
+    files: List[Path] = field(default_factory=list)
+    # (depth, line) pairs; the tree is rendered by keeping lines up to a depth
+    tree_lines: List[Tuple[int, str]] = field(default_factory=list)
+    # Number of entries left out, by reason
+    skipped: Dict[str, int] = field(default_factory=dict)
+
+    def render_tree(self, root_name: str, max_depth: int) -> str:
+        """File tree text down to max_depth directory levels"""
+        lines = [f"{root_name}/"]
+        lines.extend(line for depth, line in self.tree_lines if depth <= max_depth)
+        return "\n".join(lines)
+
+
+class RepoWalker:
+    """Single-pass, ignore-aware repository traversal"""
+
+    def __init__(
+        self,
+        supported_extensions: Set[str],
+        skip_directories: Set[str],
+        respect_ignore_files: bool = True,
+        skip_binary_files: bool = True,
+        skip_generated_files: bool = True,
+        sample_bytes: int = 8192,
+        max_tree_depth: int = 5,
+        max_tree_entries_per_directory: int = 50,
+    ):
+        self.supported_extensions = {ext.lower() for ext in supported_extensions}
+        self.skip_directories = set(skip_directories)
+        self.respect_ignore_files = respect_ignore_files
+        self.skip_binary_files = skip_binary_files
+        self.skip_generated_files = skip_generated_files
+        self.sample_bytes = sample_bytes
+        self.max_tree_depth = max_tree_depth
+        self.max_tree_entries_per_directory = max_tree_entries_per_directory
+
+    def walk(self, repo_path: Path) -> RepoWalkResult:
+        """Collect analyzable files and tree lines for a repository"""
+        repo_path = Path(repo_path)
+        result = RepoWalkResult()
+
+        rules = IgnoreRules()
+        if self.respect_ignore_files:
+            exclude_file = repo_path / ".git" / "info" / "exclude"
+            try:
+                with open(exclude_file, "r", encoding="utf-8", errors="ignore") as f:
+                    rules = IgnoreRules(tuple(IgnoreRules.parse(f, "")))
+            except OSError:
+                pass
+
+        self._walk_directory(repo_path, "", rules, "", 0, result)
+        return result
+
+    def _walk_directory(
+        self,
+        directory: Path,
+        relative_directory: str,
+        rules: IgnoreRules,
+        prefix: str,
+        depth: int,
+        result: RepoWalkResult,
+    ):
+        if self.respect_ignore_files:
+            rules = rules.extended(directory, relative_directory)
+
+        try:
+            with os.scandir(directory) as iterator:
+                entries = list(iterator)
+        except PermissionError:
+            result.tree_lines.append((depth, f"{prefix}├── [Permission Denied]"))
+            return
+        except OSError as e:
+            result.tree_lines.append((depth, f"{prefix}├── [Error: {e}]"))
+            return
+
+        # (is_file, entry, analyzable) for everything that survives pruning
+        kept: List[Tuple[bool, os.DirEntry, bool]] = []
+        for entry in entries:
+            name = entry.name
+            try:
+                # d_type from the directory listing, no stat call
+                is_directory = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_directory and name.startswith("."):
+                continue
+            if is_directory and name in self.skip_directories:
+                self._count_skip(result, "skipped_directory")
+                continue
+
+            relative_path = (
+                f"{relative_directory}/{name}" if relative_directory else name
+            )
+            if rules.rules and rules.is_ignored(relative_path, is_directory):
+                self._count_skip(result, "ignored")
+                continue
+            analyzable = False
+            if not is_directory:
+                extension = os.path.splitext(name)[1].lower()
+                if extension in BINARY_EXTENSIONS and self.skip_binary_files:
+                    self._count_skip(result, "binary")
+                    continue
+                if extension in self.supported_extensions:
+                    kind = self._classify_file(entry)
+                    if kind is not None:
+                        self._count_skip(result, kind)
+                        continue
+                    analyzable = True
+                if name.startswith("."):
+                    # Hidden files (.pre-commit-config.yaml, ...) are analyzed
+                    # but not listed in the tree
+                    if analyzable:
+                        result.files.append(Path(entry.path))
+                    continue
+            kept.append((not is_directory, entry, analyzable))
+
+        kept.sort(key=lambda item: (item[0], item[1].name.lower()))
+
+        # Files that are not analyzed still show in the tree, up to the cap
+        tree_budget = self.max_tree_entries_per_directory
+        shown = kept
+        if tree_budget and len(kept) > tree_budget:
+            shown = kept[:tree_budget]
+
+        for index, (is_file, entry, analyzable) in enumerate(kept):
+            name = entry.name
+            in_tree = depth <= self.max_tree_depth and index < len(shown)
+            is_last = index == len(shown) - 1 and len(shown) == len(kept)
+            connector = "└── " if is_last else "├── "
+
+            if not is_file:
+                if in_tree:
+                    result.tree_lines.append((depth, f"{prefix}{connector}{name}"))
+                self._walk_directory(
+                    Path(entry.path),
+                    f"{relative_directory}/{name}" if relative_directory else name,
+                    rules,
+                    prefix + ("    " if is_last else "│   "),
+                    depth + 1,
+                    result,
+                )
+                continue
+
+            size_text = ""
+            if analyzable:
+                result.files.append(Path(entry.path))
+                if in_tree:
+                    try:
+                        size_text = _format_size(entry.stat().st_size)
+                    except OSError:
+                        pass
+            if in_tree:
+                result.tree_lines.append(
+                    (depth, f"{prefix}{connector}{name}{size_text}")
+                )
+
+        if depth <= self.max_tree_depth and len(shown) < len(kept):
+            result.tree_lines.append(
+                (depth, f"{prefix}└── ... ({len(kept) - len(shown)} more entries)")
+            )
+
+    def _classify_file(self, entry: os.DirEntry) -> Optional[str]:
+        """Sample a source file's first bytes; None if it should be analyzed"""
+        if not (self.skip_binary_files or self.skip_generated_files):
+            return None
+        try:
+            with open(entry.path, "rb") as f:
+                sample = f.read(self.sample_bytes)
+        except OSError:
+            return None
+
+        kind = classify_sample(entry.name, sample)
+        if kind == "binary" and self.skip_binary_files:
+            return kind
+        if kind in ("generated", "minified") and self.skip_generated_files:
+            return kind
+        return None
+
+    @staticmethod
+    def _count_skip(result: RepoWalkResult, reason: str):
+        result.skipped[reason] = result.skipped.get(reason, 0) + 1
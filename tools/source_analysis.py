@@ -0,0 +1,792 @@
+"""
+Static Source Analysis for the Code Indexer
+
+Deterministic, LLM-free extraction of structural facts from source files so the
+indexer only needs the LLM for the parts that require understanding.
+
+Features:
+- Python functions, classes and imports via the ast module
+- Fast lexical (regex) parsers for the other languages the indexer supports
+- Top-level keys for configuration and data files (YAML, JSON, TOML, XML)
+- File type descriptions, docstring summaries and key term extraction for
+  offline (no-LLM) indexing
+- Budget-aware excerpts of large files that keep signatures, class headers,
+  docstrings and the densest function bodies
+"""
+
+import ast
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Upper bounds keep index entries (and anything later sent to an LLM) compact
+MAX_SYMBOLS = 40
+MAX_DEPENDENCIES = 30
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": ("Python", "module"),
+    ".js": ("JavaScript", "module"),
+    ".jsx": ("JavaScript", "module"),
+    ".ts": ("TypeScript", "module"),
+    ".tsx": ("TypeScript", "module"),
+    ".java": ("Java", "source file"),
+    ".cpp": ("C++", "source file"),
+    ".cc": ("C++", "source file"),
+    ".c": ("C", "source file"),
+    ".h": ("C", "header"),
+    ".hpp": ("C++", "header"),
+    ".cs": ("C#", "source file"),
+    ".php": ("PHP", "script"),
+    ".rb": ("Ruby", "script"),
+    ".go": ("Go", "source file"),
+    ".rs": ("Rust", "source file"),
+    ".scala": ("Scala", "source file"),
+    ".kt": ("Kotlin", "source file"),
+    ".swift": ("Swift", "source file"),
+    ".m": ("MATLAB", "script"),
+    ".matlab": ("MATLAB", "script"),
+    ".mm": ("Objective-C++", "source file"),
+    ".r": ("R", "script"),
+    ".sql": ("SQL", "script"),
+    ".sh": ("Shell", "script"),
+    ".bat": ("Batch", "script"),
+    ".ps1": ("PowerShell", "script"),
+    ".yaml": ("YAML", "configuration"),
+    ".yml": ("YAML", "configuration"),
+    ".json": ("JSON", "data file"),
+    ".xml": ("XML", "document"),
+    ".toml": ("TOML", "configuration"),
+    ".md": ("Markdown", "document"),
+    ".txt": ("Text", "document"),
+}
+
+_C_LIKE_KEYWORDS = {
+    "if",
+    "for",
+    "while",
+    "switch",
+    "return",
+    "catch",
+    "sizeof",
+    "else",
+    "do",
+    "new",
+    "delete",
+    "throw",
+}
+
+_JS_PATTERNS = {
+    "symbols": [
+        r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)",
+        r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)",
+        r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*=>",
+    ],
+    "dependencies": [
+        r"""^\s*import\s+(?:[^'"]*?\s+from\s+)?['"]([^'"]+)['"]""",
+        r"""^\s*export\s+[^'"]*?\s+from\s+['"]([^'"]+)['"]""",
+        r"""require\(\s*['"]([^'"]+)['"]\s*\)""",
+    ],
+}
+
+_C_PATTERNS = {
+    "symbols": [
+        r"^\s*(?:typedef\s+)?(?:class|struct|enum|union)\s+([A-Za-z_]\w*)\s*(?::[^;{]*)?\{?\s*$",
+        r"^[A-Za-z_][\w\s\*&:<>,]*?\b([A-Za-z_]\w*(?:::~?\w+)?)\s*\([^;]*\)\s*(?:const\s*)?(?:noexcept\s*)?\{?\s*$",
+    ],
+    "dependencies": [r"""^\s*#\s*(?:include|import)\s*[<"]([^>"]+)[>"]"""],
+}
+
+_LEXICAL_PATTERNS = {
+    "JavaScript": _JS_PATTERNS,
+    "TypeScript": {
+        "symbols": _JS_PATTERNS["symbols"]
+        + [
+            r"^\s*(?:export\s+)?(?:declare\s+)?(?:interface|type|enum)\s+([A-Za-z_$][\w$]*)"
+        ],
+        "dependencies": _JS_PATTERNS["dependencies"],
+    },
+    "Java": {
+        "symbols": [
+            r"^\s*(?:(?:public|protected|private|static|final|abstract|sealed)\s+)*(?:class|interface|enum|record)\s+(\w+)",
+            r"^\s*(?:(?:public|protected|private|static|final|abstract|synchronized|native|default)\s+)+[\w<>\[\],.?\s]+?\s+(\w+)\s*\([^;]*$",
+        ],
+        "dependencies": [r"^\s*import\s+(?:static\s+)?([\w.]+)"],
+    },
+    "C#": {
+        "symbols": [
+            r"^\s*(?:(?:public|protected|private|internal|static|sealed|abstract|partial)\s+)*(?:class|interface|struct|enum|record)\s+(\w+)",
+            r"^\s*(?:(?:public|protected|private|internal|static|virtual|override|async|abstract)\s+)+[\w<>\[\],.?\s]+?\s+(\w+)\s*\([^;]*$",
+        ],
+        "dependencies": [r"^\s*using\s+(?:static\s+)?([\w.]+)\s*;"],
+    },
+    "Kotlin": {
+        "symbols": [
+            r"^\s*(?:[\w]+\s+)*fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?(\w+)",
+            r"^\s*(?:[\w]+\s+)*(?:class|object|interface)\s+(\w+)",
+        ],
+        "dependencies": [r"^\s*import\s+([\w.]+)"],
+    },
+    "Scala": {
+        "symbols": [
+            r"^\s*(?:[\w]+\s+)*def\s+(\w+)",
+            r"^\s*(?:[\w]+\s+)*(?:class|object|trait)\s+(\w+)",
+        ],
+        "dependencies": [r"^\s*import\s+([\w.]+)"],
+    },
+    "C": _C_PATTERNS,
+    "C++": _C_PATTERNS,
+    "Objective-C++": _C_PATTERNS,
+    "Go": {
+        "symbols": [
+            r"^func\s+(?:\([^)]*\)\s*)?(\w+)",
+            r"^type\s+(\w+)\s+(?:struct|interface)",
+        ],
+        # Import blocks are handled separately in _extract_lexical
+        "dependencies": [r'^\s*import\s+(?:[\w.]+\s+)?"([^"]+)"'],
+    },
+    "Rust": {
+        "symbols": [
+            r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+(\w+)",
+            r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait)\s+(\w+)",
+        ],
+        "dependencies": [
+            r"^\s*(?:pub\s+)?use\s+(\w+)",
+            r"^\s*extern\s+crate\s+(\w+)",
+        ],
+    },
+    "Ruby": {
+        "symbols": [
+            r"^\s*def\s+(?:self\.)?([\w]+[?!=]?)",
+            r"^\s*(?:class|module)\s+([A-Z][\w:]*)",
+        ],
+        "dependencies": [r"""^\s*require(?:_relative)?\s*\(?\s*['"]([^'"]+)['"]"""],
+    },
+    "PHP": {
+        "symbols": [
+            r"^\s*(?:(?:public|protected|private|static|abstract|final)\s+)*function\s+&?(\w+)",
+            r"^\s*(?:abstract\s+|final\s+)?(?:class|interface|trait)\s+(\w+)",
+        ],
+        "dependencies": [
+            r"^\s*use\s+([\w\\]+)",
+            r"""^\s*(?:require|include)(?:_once)?\s*\(?\s*['"]([^'"]+)['"]""",
+        ],
+    },
+    "Swift": {
+        "symbols": [
+            r"^\s*(?:[\w]+\s+)*func\s+(\w+)",
+            r"^\s*(?:[\w]+\s+)*(?:class|struct|enum|protocol|extension)\s+(\w+)",
+        ],
+        "dependencies": [r"^\s*import\s+(\w+)"],
+    },
+    "MATLAB": {
+        "symbols": [r"^\s*function\s+(?:\[?[^=\n]*\]?\s*=\s*)?(\w+)"],
+        "dependencies": [],
+    },
+    "R": {
+        "symbols": [r"^\s*([A-Za-z.][\w.]*)\s*(?:<-|=)\s*function\s*\("],
+        "dependencies": [r"^\s*(?:library|require)\(\s*['\"]?([\w.]+)['\"]?\s*\)"],
+    },
+    "SQL": {
+        "symbols": [
+            r"(?i)^\s*create\s+(?:or\s+replace\s+)?(?:temporary\s+)?(?:table|view|function|procedure|index|trigger)\s+(?:if\s+not\s+exists\s+)?([\w.\"`\[\]]+)"
+        ],
+        "dependencies": [],
+    },
+    "Shell": {
+        "symbols": [r"^\s*(?:function\s+)?([A-Za-z_][\w-]*)\s*\(\)\s*\{?"],
+        "dependencies": [r"^\s*(?:source|\.)\s+([^\s;]+)"],
+    },
+    "Batch": {
+        "symbols": [r"^:([A-Za-z_]\w*)"],
+        "dependencies": [r"(?i)^\s*call\s+([^\s]+)"],
+    },
+    "PowerShell": {
+        "symbols": [r"(?i)^\s*function\s+([\w-]+)"],
+        "dependencies": [r"(?i)^\s*Import-Module\s+([^\s;]+)"],
+    },
+}
+
+_COMPILED_PATTERNS = {
+    language: {
+        kind: [re.compile(pattern, re.MULTILINE) for pattern in patterns]
+        for kind, patterns in language_patterns.items()
+    }
+    for language, language_patterns in _LEXICAL_PATTERNS.items()
+}
+
+_GO_IMPORT_BLOCK_RE = re.compile(r"^import\s*\(([^)]*)\)", re.MULTILINE)
+# Line breaks as ast and the tokenizer count them; str.splitlines() also splits
+# on form feeds, \x1c-\x1e, \x85, \u2028 and \u2029
+_SOURCE_LINE_BREAK_RE = re.compile(r"\r\n|\r|\n")
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+_SUBWORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+_STOP_WORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "import", "return",
+    "self", "def", "class", "none", "true", "false", "not", "elif", "else",
+    "try", "except", "finally", "raise", "lambda", "pass", "yield", "async",
+    "await", "while", "break", "continue", "print", "len", "str", "int", "float",
+    "list", "dict", "set", "tuple", "bool", "var", "let", "const", "function",
+    "public", "private", "protected", "static", "void", "new", "null", "this",
+    "args", "kwargs", "init", "get", "are", "use", "you", "can", "file", "all",
+    "type", "value", "data", "item", "name", "path", "result", "config",
+}  # fmt: skip
+
+
+def describe_file_type(file_path: Path, content: str = "") -> str:
+    """Describe a file's type from its extension (and, for Python, its content)"""
+    language, kind = LANGUAGE_BY_EXTENSION.get(
+        file_path.suffix.lower(), (file_path.suffix.lstrip(".").upper(), "file")
+    )
+    if language == "Python":
+        if file_path.name == "__init__.py":
+            kind = "package initializer"
+        elif file_path.name.startswith("test_") or file_path.stem.endswith("_test"):
+            kind = "test module"
+        elif re.search(r"""^if\s+__name__\s*==\s*['"]__main__['"]""", content, re.M):
+            kind = "script"
+    return f"{language} {kind}".strip()
+
+
+def _dedupe(items: List[str], limit: int) -> List[str]:
+    """Remove duplicates while preserving order, up to a limit"""
+    seen = set()
+    result = []
+    for item in items:
+        if item and item not in seen:
+            seen.add(item)
+            result.append(item)
+            if len(result) >= limit:
+                break
+    return result
+
+
+def _extract_python(content: str) -> Optional[Dict[str, List[str]]]:
+    """Extract functions, classes and imports from Python source using ast"""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    symbols = []
+    methods = []
+    dependencies = []
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            symbols.append(node.name)
+            for child in node.body:
+                if isinstance(
+                    child, (ast.FunctionDef, ast.AsyncFunctionDef)
+                ) and not child.name.startswith("_"):
+                    methods.append(f"{node.name}.{child.name}")
+
+    # Imports may appear anywhere (inside functions, try/except blocks)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            dependencies.extend(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            dependencies.append(node.module.split(".")[0])
+
+    return {
+        "main_functions": _dedupe(symbols + methods, MAX_SYMBOLS),
+        "dependencies": _dedupe(dependencies, MAX_DEPENDENCIES),
+    }
+
+
+def _extract_lexical(language: str, content: str) -> Dict[str, List[str]]:
+    """Extract symbols and dependencies with the regex table for a language"""
+    patterns = _COMPILED_PATTERNS.get(language)
+    if patterns is None:
+        return {"main_functions": [], "dependencies": []}
+
+    symbols = []
+    for pattern in patterns["symbols"]:
+        for match in pattern.finditer(content):
+            name = match.group(1)
+            if name.split("::")[-1] not in _C_LIKE_KEYWORDS:
+                symbols.append(name)
+
+    dependencies = []
+    for pattern in patterns["dependencies"]:
+        dependencies.extend(match.group(1) for match in pattern.finditer(content))
+    if language == "Go":
+        for block in _GO_IMPORT_BLOCK_RE.findall(content):
+            dependencies.extend(re.findall(r'"([^"]+)"', block))
+
+    return {
+        "main_functions": _dedupe(symbols, MAX_SYMBOLS),
+        "dependencies": _dedupe(dependencies, MAX_DEPENDENCIES),
+    }
+
+
+def _extract_config_keys(language: str, content: str) -> List[str]:
+    """Top-level keys of configuration and data files"""
+    if language == "JSON":
+        try:
+            data = json.loads(content)
+        except (json.JSONDecodeError, ValueError):
+            return []
+        return list(data.keys())[:MAX_SYMBOLS] if isinstance(data, dict) else []
+
+    if language == "YAML":
+        pattern = r"^([A-Za-z_][\w.-]*)\s*:"
+    elif language == "TOML":
+        pattern = r"^\s*\[+\s*([\w.-]+)\s*\]+"
+    elif language == "XML":
+        pattern = r"<([A-Za-z_][\w.-]*)[\s>]"
+    else:
+        return []
+    return _dedupe(re.findall(pattern, content, re.MULTILINE), MAX_SYMBOLS)
+
+
+def extract_static_structure(file_path: Path, content: str) -> Dict[str, Any]:
+    """
+    Deterministically extract the structural fields of a file summary.
+
+    Args:
+        file_path: Path of the file (only the name and extension are used)
+        content: Full file content
+
+    Returns:
+        Dict with "file_type", "main_functions" and "dependencies"
+    """
+    language = LANGUAGE_BY_EXTENSION.get(file_path.suffix.lower(), ("", ""))[0]
+
+    structure = None
+    if language == "Python":
+        structure = _extract_python(content)
+        if structure is None:
+            # Python 2 code or syntax errors: fall back to a lexical scan
+            structure = {
+                "main_functions": _dedupe(
+                    re.findall(
+                        r"^(?:async\s+)?(?:def|class)\s+(\w+)", content, re.MULTILINE
+                    ),
+                    MAX_SYMBOLS,
+                ),
+                "dependencies": _dedupe(
+                    re.findall(
+                        r"^\s*(?:from|import)\s+([A-Za-z_]\w*)", content, re.MULTILINE
+                    ),
+                    MAX_DEPENDENCIES,
+                ),
+            }
+    elif language in ("JSON", "YAML", "TOML", "XML"):
+        structure = {
+            "main_functions": _extract_config_keys(language, content),
+            "dependencies": [],
+        }
+    else:
+        structure = _extract_lexical(language, content)
+
+    return {"file_type": describe_file_type(file_path, content), **structure}
+
+
+def extract_leading_docstring(file_path: Path, content: str) -> str:
+    """Return the first paragraph of the module docstring or leading comment"""
+    if file_path.suffix.lower() == ".py":
+        try:
+            docstring = ast.get_docstring(ast.parse(content)) or ""
+        except (SyntaxError, ValueError):
+            docstring = ""
+        if docstring:
+            return " ".join(docstring.strip().split("\n\n")[0].split())
+
+    comment_lines = []
+    for line in content.splitlines()[:40]:
+        stripped = line.strip()
+        if not stripped:
+            if comment_lines:
+                break
+            continue
+        match = re.match(r"^(?:#!.*|#|//|--|/\*+|\*+/?|;|%|')\s?(.*)$", stripped)
+        if not match:
+            break
+        if stripped.startswith("#!"):
+            continue
+        text = match.group(1).strip().rstrip("*/").strip()
+        if text:
+            comment_lines.append(text)
+    return " ".join(comment_lines)
+
+
+def extract_key_terms(content: str, symbols: List[str], limit: int = 8) -> List[str]:
+    """
+    Rank descriptive terms by frequency of identifier subwords.
+
+    Subwords of the file's own symbols are weighted up, since they usually name
+    the concepts the file implements.
+    """
+    counts = Counter()
+    for identifier in _IDENTIFIER_RE.findall(content):
+        for subword in _SUBWORD_RE.findall(identifier):
+            subword = subword.lower()
+            if len(subword) > 2 and subword not in _STOP_WORDS:
+                counts[subword] += 1
+
+    for symbol in symbols:
+        for subword in _SUBWORD_RE.findall(symbol.split(".")[-1]):
+            subword = subword.lower()
+            if len(subword) > 2 and subword not in _STOP_WORDS:
+                counts[subword] += 3
+
+    return [term for term, _ in counts.most_common(limit)]
+
+
+def build_offline_analysis(file_path: Path, content: str) -> Dict[str, Any]:
+    """Build a complete file analysis without any LLM call"""
+    structure = extract_static_structure(file_path, content)
+    symbols = structure["main_functions"]
+
+    summary = extract_leading_docstring(file_path, content)
+    if not summary:
+        summary = structure["file_type"]
+        if symbols:
+            summary += f" defining {', '.join(symbols[:5])}"
+        if structure["dependencies"]:
+            summary += f"; uses {', '.join(structure['dependencies'][:5])}"
+        summary += "."
+
+    return {
+        **structure,
+        "key_concepts": extract_key_terms(content, symbols),
+        "summary": summary[:500],
+    }
+
+
+# Approximate length of an elision marker line ("    # ... 12 lines omitted")
+_EXCERPT_MARKER_COST = 32
+
+# Lines of a docstring or leading comment kept before its body is considered
+_EXCERPT_DOCSTRING_LINES = 8
+
+_COMMENT_PREFIX_BY_LANGUAGE = {
+    "Python": "#",
+    "Ruby": "#",
+    "Shell": "#",
+    "R": "#",
+    "PowerShell": "#",
+    "SQL": "--",
+    "MATLAB": "%",
+    "Batch": "REM",
+}
+
+_BRACE_LANGUAGES = {
+    "JavaScript",
+    "TypeScript",
+    "Java",
+    "C#",
+    "C",
+    "C++",
+    "Go",
+    "Rust",
+    "Scala",
+    "Kotlin",
+    "Swift",
+    "PHP",
+    "Objective-C++",
+}
+
+
+@dataclass
+class _ExcerptUnit:
+    """A line range competing for the excerpt budget"""
+
+    tier: int  # 0 = signatures, 1 = docstrings and imports, 2 = bodies
+    start: int  # first line, 0-based
+    end: int  # last line, inclusive
+    score: float = 0.0  # density, used to order bodies
+
+
+def _body_density(lines: List[str]) -> float:
+    """Distinct identifiers per square root of size: how much a body says per char"""
+    text = "\n".join(lines)
+    identifiers = {
+        identifier
+        for identifier in _IDENTIFIER_RE.findall(text)
+        if identifier.lower() not in _STOP_WORDS
+    }
+    return len(identifiers) / math.sqrt(len(text) + 1)
+
+
+def _python_excerpt_units(
+    content: str, lines: List[str]
+) -> Optional[List[_ExcerptUnit]]:
+    """Signature, docstring, import and body units from the Python ast"""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    units = []
+
+    def add_docstring(node: ast.AST):
+        body = getattr(node, "body", None)
+        if (
+            body
+            and isinstance(body[0], ast.Expr)
+            and isinstance(getattr(body[0], "value", None), ast.Constant)
+            and isinstance(body[0].value.value, str)
+        ):
+            start = body[0].lineno - 1
+            end = min(body[0].end_lineno - 1, start + _EXCERPT_DOCSTRING_LINES - 1)
+            tier = 0 if isinstance(node, ast.Module) else 1
+            units.append(_ExcerptUnit(tier, start, end))
+            return body[0].end_lineno
+        return None
+
+    def visit(nodes: List[ast.stmt], in_class: bool):
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = (
+                    min(
+                        [decorator.lineno for decorator in node.decorator_list]
+                        + [node.lineno]
+                    )
+                    - 1
+                )
+                body_start = node.body[0].lineno - 1
+                header_end = max(node.lineno - 1, body_start - 1)
+                units.append(_ExcerptUnit(0, start, header_end))
+                docstring_end = add_docstring(node)
+
+                if isinstance(node, ast.ClassDef):
+                    visit(node.body, in_class=True)
+                    continue
+
+                body_start = docstring_end if docstring_end else header_end + 1
+                if body_start <= node.end_lineno - 1:
+                    units.append(
+                        _ExcerptUnit(
+                            2,
+                            body_start,
+                            node.end_lineno - 1,
+                            _body_density(lines[body_start : node.end_lineno]),
+                        )
+                    )
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                units.append(_ExcerptUnit(1, node.lineno - 1, node.end_lineno - 1))
+            elif isinstance(node, ast.Expr) and isinstance(
+                getattr(node, "value", None), ast.Constant
+            ):
+                # Docstrings are added with their owner
+                continue
+            else:
+                # Module constants, class attributes, __main__ blocks
+                block = lines[node.lineno - 1 : node.end_lineno]
+                units.append(
+                    _ExcerptUnit(
+                        1 if in_class and len(block) <= 2 else 2,
+                        node.lineno - 1,
+                        node.end_lineno - 1,
+                        _body_density(block),
+                    )
+                )
+
+    add_docstring(tree)
+    visit(tree.body, in_class=False)
+    return units
+
+
+def _block_end(lines: List[str], start: int, brace_language: bool) -> int:
+    """Last line of the block opened at start (brace matching or indentation)"""
+    if brace_language:
+        depth = 0
+        opened = False
+        for index in range(start, len(lines)):
+            depth += lines[index].count("{") - lines[index].count("}")
+            opened = opened or "{" in lines[index]
+            if opened and depth <= 0:
+                return index
+            if not opened and index > start + 3:
+                # Declaration without a body (prototype, abstract method)
+                return start
+        return len(lines) - 1
+
+    indent = len(lines[start]) - len(lines[start].lstrip())
+    end = start
+    for index in range(start + 1, len(lines)):
+        stripped = lines[index].strip()
+        if not stripped:
+            continue
+        if len(lines[index]) - len(lines[index].lstrip()) <= indent:
+            break
+        end = index
+    return end
+
+
+def _lexical_excerpt_units(language: str, lines: List[str]) -> List[_ExcerptUnit]:
+    """Signature, doc comment, import and body units from the regex tables"""
+    patterns = _COMPILED_PATTERNS.get(language)
+    units = []
+
+    # Leading comment block (module description, often preceded by a license)
+    leading_end = -1
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped and not re.match(r"^(?:#|//|--|/\*|\*|;|%|')", stripped):
+            break
+        leading_end = index
+    if leading_end >= 0:
+        units.append(_ExcerptUnit(1, 0, min(leading_end, _EXCERPT_DOCSTRING_LINES - 1)))
+
+    if patterns is None:
+        return units
+
+    line_starts = []
+    offset = 0
+    for line in lines:
+        line_starts.append(offset)
+        offset += len(line) + 1
+
+    def line_of(position: int) -> int:
+        low, high = 0, len(line_starts) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if line_starts[middle] <= position:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    content = "\n".join(lines)
+    for pattern in patterns["dependencies"]:
+        for match in pattern.finditer(content):
+            line = line_of(match.start(1))
+            units.append(_ExcerptUnit(1, line, line))
+
+    signature_lines = set()
+    for pattern in patterns["symbols"]:
+        for match in pattern.finditer(content):
+            if match.group(1).split("::")[-1] not in _C_LIKE_KEYWORDS:
+                signature_lines.add(line_of(match.start(1)))
+
+    brace_language = language in _BRACE_LANGUAGES
+    for start in sorted(signature_lines):
+        units.append(_ExcerptUnit(0, start, start))
+
+        # Doc comment directly above the signature
+        comment_start = start
+        while comment_start > 0 and re.match(
+            r"^\s*(?:#|//|/\*|\*|--|%)", lines[comment_start - 1]
+        ):
+            comment_start -= 1
+        if comment_start < start:
+            units.append(
+                _ExcerptUnit(
+                    1,
+                    max(comment_start, start - _EXCERPT_DOCSTRING_LINES),
+                    start - 1,
+                )
+            )
+
+        end = _block_end(lines, start, brace_language)
+        if end > start:
+            units.append(
+                _ExcerptUnit(
+                    2, start + 1, end, _body_density(lines[start + 1 : end + 1])
+                )
+            )
+    return units
+
+
+# Appended to sources cut at the budget without structure to excerpt
+_TRUNCATION_MARKER = "..."
+
+
+def excerpt_source(file_path: Path, content: str, max_chars: int) -> str:
+    """
+    Shrink a source file to about max_chars while keeping its structure.
+
+    Signatures and class headers are kept first, then docstrings, doc comments
+    and imports, then whole function bodies in order of identifier density.
+    Omitted line ranges are replaced by a one-line comment. Files without a
+    recognizable structure (data, documents) are cut at max_chars.
+
+    Args:
+        file_path: Path of the file (only the extension is used)
+        content: Full file content
+        max_chars: Character budget of the excerpt (about 4 characters per token)
+
+    Returns:
+        The content itself if it fits, otherwise the excerpt
+    """
+    if len(content) <= max_chars:
+        return content
+
+    language = LANGUAGE_BY_EXTENSION.get(file_path.suffix.lower(), ("", ""))[0]
+    # Indexed with ast line numbers, so split the way the tokenizer does
+    lines = _SOURCE_LINE_BREAK_RE.split(content)
+    if lines and not lines[-1]:
+        lines.pop()
+
+    units = None
+    if language == "Python":
+        units = _python_excerpt_units(content, lines)
+    if units is None and (language in _COMPILED_PATTERNS or language == "Python"):
+        units = _lexical_excerpt_units(language, lines)
+    if not units or not any(unit.tier == 0 for unit in units):
+        # The marker counts against the budget
+        if max_chars <= len(_TRUNCATION_MARKER):
+            return content[:max_chars]
+        return content[: max_chars - len(_TRUNCATION_MARKER)] + _TRUNCATION_MARKER
+
+    # Greedy fill: tiers in order, signatures and docstrings in source order,
+    # bodies densest first; units that do not fit are skipped, smaller ones may
+    units.sort(
+        key=lambda unit: (unit.tier, -unit.score if unit.tier == 2 else unit.start)
+    )
+    kept = [False] * len(lines)
+    used = _EXCERPT_MARKER_COST  # everything omitted: a single marker
+    for unit in units:
+        new_lines = [
+            index for index in range(unit.start, unit.end + 1) if not kept[index]
+        ]
+        if not new_lines:
+            continue
+        cost = sum(len(lines[index]) + 1 for index in new_lines)
+        # A unit inside a gap splits it (one more marker), one bridging two kept
+        # ranges closes it (one fewer)
+        kept_before = unit.start == 0 or kept[unit.start - 1]
+        kept_after = unit.end == len(lines) - 1 or kept[unit.end + 1]
+        if not kept_before and not kept_after:
+            cost += _EXCERPT_MARKER_COST
+        elif kept_before and kept_after:
+            cost -= _EXCERPT_MARKER_COST
+        if used + cost > max_chars:
+            continue
+        for index in new_lines:
+            kept[index] = True
+        used += cost
+
+    comment = _COMMENT_PREFIX_BY_LANGUAGE.get(language, "//")
+    excerpt = []
+    index = 0
+    while index < len(lines):
+        if kept[index]:
+            excerpt.append(lines[index])
+            index += 1
+            continue
+        gap_start = index
+        while index < len(lines) and not kept[index]:
+            index += 1
+        if all(not lines[gap].strip() for gap in range(gap_start, index)):
+            excerpt.extend(lines[gap_start:index])
+            continue
+        first = next(
+            lines[gap] for gap in range(gap_start, index) if lines[gap].strip()
+        )
+        indent = first[: len(first) - len(first.lstrip())]
+        omitted = index - gap_start
+        excerpt.append(
+            f"{indent}{comment} ... {omitted} line{'s' if omitted > 1 else ''} omitted"
+        )
+
+    return "\n".join(excerpt)[:max_chars]
@@ -0,0 +1,610 @@
+"""
+Workspace Trigram Index
+
+Optional trigram index over the workspace for the search_code tool of the code
+implementation server, so substring and regex searches only open the files
+that can contain a match.
+
+Features:
+- Trigrams of the case-folded identifier and number runs of each searchable
+  file (the files search_tree would search), kept as in-memory postings
+- Candidate files from the trigrams of a query's literal parts: the whole
+  substring, or the literals every regex match must contain; queries without
+  usable literals search every indexed file
+- Built lazily in a background thread on the first search; searches scan the
+  tree until it is ready
+- Incremental updates: files written by the server's write tools are
+  re-indexed before the next search, and a stat-only walk on the background
+  thread picks up changes made by commands and other processes
+- On-disk snapshot (<workspace>/.search_index/trigrams.idx), written by the
+  background thread, so a restarted server revalidates the index instead of
+  rebuilding it
+"""
+
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import re._parser as _regex_parser  # Python 3.11+
+except ImportError:
+    import sre_parse as _regex_parser
+
+from tools.code_search import (
+    SEARCH_MAX_MATCHES,
+    SearchResult,
+    compile_search_pattern,
+    is_search_file,
+    matches_file_pattern,
+    normalize_file_pattern,
+    read_search_text,
+    search_files,
+    search_tree,
+    walk_search_files,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the snapshot or the trigram extraction changes
+TRIGRAM_INDEX_VERSION = 1
+SNAPSHOT_DIRECTORY_NAME = ".search_index"
+SNAPSHOT_FILE_NAME = "trigrams.idx"
+
+# Changes the server is not told about (other processes) are found by a
+# stat-only walk of the workspace at most this many seconds apart
+REVALIDATE_INTERVAL_SECONDS = 10
+
+# A search right after a command waits this long for the walk the command
+# started, then answers from the index as it is
+REVALIDATE_WAIT_SECONDS = 1.0
+
+# Minimum seconds between snapshot writes after incremental updates
+SNAPSHOT_INTERVAL_SECONDS = 60
+
+# Postings are rewritten once the ids of re-indexed and removed files reach
+# this share of the live files
+COMPACT_DEAD_RATIO = 0.5
+
+# re.IGNORECASE matches these with ASCII letters, str.lower() does not
+# (dotted capital I, dotless small i, long s, Kelvin sign)
+_ASCII_CASE_FOLDS = str.maketrans(
+    {"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"}
+)
+
+# Runs of ASCII word characters; trigrams never span anything else, so
+# punctuation-heavy literals still filter on their identifiers
+_TOKEN_RE = re.compile(r"[a-z0-9_]{3,}")
+
+_REGEX_REPEATS = {
+    getattr(_regex_parser, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(_regex_parser, name)
+}
+_REGEX_ATOMIC_GROUP = getattr(_regex_parser, "ATOMIC_GROUP", None)
+
+
+def fold_case(text: str) -> str:
+    """Lower-case text so that case-insensitive matches fold to the same ASCII"""
+    if text.isascii():
+        return text.lower()
+    return text.translate(_ASCII_CASE_FOLDS).lower()
+
+
+def text_trigrams(text: str) -> Set[str]:
+    """Trigrams of the ASCII identifier and number runs of case-folded text"""
+    trigrams = set()
+    for token in set(_TOKEN_RE.findall(fold_case(text))):
+        if len(token) == 3:
+            trigrams.add(token)
+        else:
+            trigrams.update(token[i : i + 3] for i in range(len(token) - 2))
+    return trigrams
+
+
+def _regex_literals(items) -> List[str]:
+    """Literal strings every match of a parsed regex contains"""
+    literals = []
+    run = []
+    for op, argument in items:
+        if op is _regex_parser.LITERAL:
+            run.append(chr(argument))
+            continue
+        if run:
+            literals.append("".join(run))
+            run = []
+        if op is _regex_parser.SUBPATTERN:
+            literals.extend(_regex_literals(argument[-1]))
+        elif op in _REGEX_REPEATS and argument[0] >= 1:
+            literals.extend(_regex_literals(argument[2]))
+        elif _REGEX_ATOMIC_GROUP is not None and op is _REGEX_ATOMIC_GROUP:
+            literals.extend(_regex_literals(argument))
+    if run:
+        literals.append("".join(run))
+    return literals
+
+
+def query_trigrams(pattern: str, use_regex: bool) -> Set[str]:
+    """
+    Trigrams any file with a matching line contains.
+
+    Empty when the query has no literal part long enough to filter on. Call
+    after the pattern compiled.
+    """
+    if use_regex:
+        literals = _regex_literals(_regex_parser.parse(pattern))
+    else:
+        literals = [pattern]
+
+    trigrams = set()
+    for literal in literals:
+        trigrams |= text_trigrams(literal)
+    return trigrams
+
+
+def _walk_order(relative_path: str) -> List[Tuple[int, str]]:
+    """Sort key reproducing walk_search_files order: files before subdirectories"""
+    *directories, name = relative_path.split("/")
+    return [(1, directory) for directory in directories] + [(0, name)]
+
+
+class TrigramIndex:
+    """Trigram postings for the searchable files under one directory"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        # relative path -> (file id, or None if not searchable; mtime_ns; size)
+        self.files: Dict[str, Tuple[Optional[int], int, int]] = {}
+        # file id -> relative path, for files whose postings are current
+        self.paths: Dict[int, str] = {}
+        self.postings: Dict[str, array] = {}
+        self.next_id = 0
+        self.dead_ids = 0
+        # Changed since the last snapshot
+        self.unsaved_changes = False
+
+    def update_file(
+        self, relative_path: str, stat: Optional[os.stat_result] = None
+    ) -> bool:
+        """(Re)index one file if it changed; returns whether the index changed"""
+        full_path = self.root / relative_path
+        try:
+            stat = stat or os.stat(full_path)
+        except OSError:
+            return self.remove_file(relative_path)
+
+        entry = self.files.get(relative_path)
+        if entry is not None and entry[1:] == (stat.st_mtime_ns, stat.st_size):
+            return False
+        self.remove_file(relative_path)
+
+        file_id = None
+        text = read_search_text(full_path)
+        if text is not None:
+            file_id = self.next_id
+            self.next_id += 1
+            self.paths[file_id] = relative_path
+            for trigram in text_trigrams(text):
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    self.postings[trigram] = array("I", (file_id,))
+                else:
+                    posting.append(file_id)
+        self.files[relative_path] = (file_id, stat.st_mtime_ns, stat.st_size)
+        self.unsaved_changes = True
+        return True
+
+    def remove_file(self, relative_path: str) -> bool:
+        entry = self.files.pop(relative_path, None)
+        if entry is None:
+            return False
+        if entry[0] is not None:
+            # Its postings entries are skipped until the next compaction
+            del self.paths[entry[0]]
+            self.dead_ids += 1
+        self.unsaved_changes = True
+        return True
+
+    def revalidate(self) -> bool:
+        """
+        Bring the index in line with the tree by comparing file stats.
+
+        Only new and changed files are read. Returns whether the index changed.
+        """
+        return self.apply_changes(*self.scan_changes())
+
+    def scan_changes(self) -> Tuple[List[Tuple[str, os.stat_result]], Set[str]]:
+        """
+        Stat-only walk of the tree, leaving the index untouched.
+
+        Returns the new and changed files with their stats, and every
+        searchable path seen. Safe to run while another thread updates the
+        index; apply_changes() must not be.
+        """
+        changed = []
+        seen = set()
+        for relative_path, path in walk_search_files(self.root, "*"):
+            seen.add(relative_path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = self.files.get(relative_path)
+            if entry is None or entry[1:] != (stat.st_mtime_ns, stat.st_size):
+                changed.append((relative_path, stat))
+        return changed, seen
+
+    def apply_changes(
+        self, changed: List[Tuple[str, os.stat_result]], seen: Set[str]
+    ) -> bool:
+        """Apply a scan_changes() result; returns whether the index changed"""
+        updated = False
+        for relative_path, stat in changed:
+            updated |= self.update_file(relative_path, stat)
+        for relative_path in [path for path in self.files if path not in seen]:
+            # Written after the walk passed its directory, or gone
+            if is_search_file(self.root, relative_path):
+                updated |= self.update_file(relative_path)
+            else:
+                updated |= self.remove_file(relative_path)
+        return updated
+
+    def candidates(self, trigrams: Set[str]) -> List[str]:
+        """Relative paths of the searchable files containing all trigrams"""
+        if not trigrams:
+            return list(self.paths.values())
+
+        postings = []
+        for trigram in trigrams:
+            posting = self.postings.get(trigram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        file_ids = set(postings[0])
+        for posting in postings[1:]:
+            file_ids.intersection_update(posting)
+            if not file_ids:
+                return []
+        return [self.paths[i] for i in file_ids if i in self.paths]
+
+    def compact(self, force: bool = False):
+        """Drop postings entries of re-indexed and removed files"""
+        if not self.dead_ids:
+            return
+        if not force and self.dead_ids < COMPACT_DEAD_RATIO * len(self.paths):
+            return
+        live = self.paths
+        postings = {}
+        for trigram, posting in self.postings.items():
+            kept = array("I", (i for i in posting if i in live))
+            if kept:
+                postings[trigram] = kept
+        self.postings = postings
+        self.dead_ids = 0
+
+    def snapshot_path(self) -> Path:
+        return self.root / SNAPSHOT_DIRECTORY_NAME / SNAPSHOT_FILE_NAME
+
+    def save_snapshot(self):
+        self.write_snapshot(self.snapshot_state())
+
+    def snapshot_state(self) -> Dict:
+        """
+        Copy of the index for write_snapshot().
+
+        Cheap next to pickling, so a shared index is only locked for the copy.
+        Marks the index saved.
+        """
+        self.unsaved_changes = False
+        return {
+            "version": TRIGRAM_INDEX_VERSION,
+            "root": str(self.root),
+            "files": dict(self.files),
+            "postings": {
+                trigram: posting[:] for trigram, posting in self.postings.items()
+            },
+            "next_id": self.next_id,
+        }
+
+    def write_snapshot(self, snapshot: Dict):
+        snapshot_path = self.snapshot_path()
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+        with open(temporary_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, snapshot_path)
+
+    @classmethod
+    def load_snapshot(cls, root: Path) -> Optional["TrigramIndex"]:
+        """
+        Index saved for root, None if there is none or it is unusable.
+
+        The snapshot may be older than the tree; revalidate() before use.
+        """
+        index = cls(root)
+        snapshot_path = index.snapshot_path()
+        if not snapshot_path.exists():
+            return None
+        try:
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable search index {snapshot_path}: {e}")
+            return None
+
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != TRIGRAM_INDEX_VERSION
+            or snapshot.get("root") != str(index.root)
+        ):
+            return None
+        index.files = snapshot["files"]
+        index.postings = snapshot["postings"]
+        index.next_id = snapshot["next_id"]
+        index.paths = {
+            entry[0]: relative_path
+            for relative_path, entry in index.files.items()
+            if entry[0] is not None
+        }
+        # Snapshots are not compacted; every id that is not live is dead
+        index.dead_ids = index.next_id - len(index.paths)
+        return index
+
+
+class WorkspaceSearchIndex:
+    """
+    Trigram index of the current workspace, shared by search_code calls.
+
+    Tool handlers only record what happened (note_written, invalidate). Files
+    written by the server are re-indexed on the thread that runs the next
+    search; walks of the tree and snapshot writes run on a background
+    maintenance thread, so search latency does not grow with the workspace.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.root: Optional[Path] = None
+
+        self._index: Optional[TrigramIndex] = None
+        self._maintainer: Optional[threading.Thread] = None
+        # Wakes the maintenance thread of the current root
+        self._wakeup = threading.Event()
+        # Held while the index is updated or queried
+        self._lock = threading.Lock()
+        # Guards the pending changes below; never held for long
+        self._pending_lock = threading.Lock()
+        self._dirty_paths: Set[str] = set()
+        self._revalidation_requested = False
+        self._invalidations = 0
+        # Set while no walk requested by invalidate() is outstanding
+        self._revalidated = threading.Event()
+        self._revalidated.set()
+        self._validated_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def note_written(self, paths: Iterable[Path]):
+        """Files written under the workspace, re-indexed before the next search"""
+        if self.root is None:
+            return
+        relative_paths = []
+        for path in paths:
+            try:
+                relative_paths.append(Path(path).relative_to(self.root).as_posix())
+            except ValueError:
+                continue
+        with self._pending_lock:
+            self._dirty_paths.update(relative_paths)
+
+    def invalidate(self):
+        """
+        Files may have changed anywhere, e.g. after running a command.
+
+        Starts a walk of the tree in the background right away; the next
+        search waits briefly for it.
+        """
+        with self._pending_lock:
+            self._revalidation_requested = True
+            self._invalidations += 1
+            self._revalidated.clear()
+        self._wakeup.set()
+
+    def search(
+        self,
+        root: Path,
+        pattern: str,
+        file_pattern: str = "*",
+        use_regex: bool = False,
+        max_matches: int = SEARCH_MAX_MATCHES,
+    ) -> SearchResult:
+        """
+        search_tree(root, ...) answered from the index once it is built.
+
+        Starts building the index for root on first use and scans the tree
+        until it is ready. Hidden-file patterns always scan, since hidden
+        files are not indexed.
+
+        Raises:
+            re.error: Invalid regular expression
+        """
+        root = Path(root)
+        compile_search_pattern(pattern, use_regex)
+        index = self._index_for(root) if self.enabled else None
+        if index is None or normalize_file_pattern(file_pattern).startswith("."):
+            return search_tree(
+                root,
+                pattern,
+                file_pattern=file_pattern,
+                use_regex=use_regex,
+                max_matches=max_matches,
+            )
+
+        if time.monotonic() - self._validated_at > REVALIDATE_INTERVAL_SECONDS:
+            with self._pending_lock:
+                self._revalidation_requested = True
+            self._wakeup.set()
+        self._revalidated.wait(REVALIDATE_WAIT_SECONDS)
+
+        trigrams = query_trigrams(pattern, use_regex)
+        with self._lock:
+            self._apply_written(index)
+            candidates = index.candidates(trigrams)
+        candidates = [
+            relative_path
+            for relative_path in candidates
+            if matches_file_pattern(relative_path, file_pattern)
+        ]
+        candidates.sort(key=_walk_order)
+        result = search_files(
+            root,
+            lambda: (root / relative_path for relative_path in candidates),
+            pattern,
+            use_regex=use_regex,
+            max_matches=max_matches,
+        )
+        result.indexed = True
+        return result
+
+    def _index_for(self, root: Path) -> Optional[TrigramIndex]:
+        """The built index of root; starts building it if there is none yet"""
+        with self._lock:
+            if self.root != root:
+                self._reset(root)
+            if self._index is None and self._maintainer is None:
+                self._maintainer = threading.Thread(
+                    target=self._maintain,
+                    args=(root, self._wakeup),
+                    name="workspace-trigram-index",
+                    daemon=True,
+                )
+                self._maintainer.start()
+            return self._index
+
+    def _reset(self, root: Path):
+        # The old root's maintenance thread saves its snapshot and exits
+        self._wakeup.set()
+        self._wakeup = threading.Event()
+        self.root = root
+        self._index = None
+        self._maintainer = None
+        with self._pending_lock:
+            self._dirty_paths.clear()
+            self._revalidation_requested = False
+            self._revalidated.set()
+
+    def _maintain(self, root: Path, wakeup: threading.Event):
+        """Build the index of root, then keep it current until root changes"""
+        index = self._build(root)
+        if index is None:
+            return
+
+        snapshot_at = time.monotonic()
+        while True:
+            wakeup.wait(SNAPSHOT_INTERVAL_SECONDS)
+            wakeup.clear()
+            if self.root != root:
+                break
+            try:
+                self._revalidate(index)
+            except Exception as e:
+                logger.warning(f"Failed to revalidate search index for {root}: {e}")
+            if (
+                index.unsaved_changes
+                and time.monotonic() - snapshot_at > SNAPSHOT_INTERVAL_SECONDS
+            ):
+                self._save_snapshot(index)
+                snapshot_at = time.monotonic()
+
+        if index.unsaved_changes:
+            self._save_snapshot(index)
+
+    def _build(self, root: Path) -> Optional[TrigramIndex]:
+        started = time.monotonic()
+        with self._pending_lock:
+            # Covered by the walk below; later requests stay pending
+            self._revalidation_requested = False
+            generation = self._invalidations
+        try:
+            index = TrigramIndex.load_snapshot(root)
+            from_snapshot = index is not None
+            if index is None:
+                index = TrigramIndex(root)
+            index.revalidate()
+            if index.unsaved_changes:
+                index.save_snapshot()
+        except Exception as e:
+            logger.warning(f"Failed to build search index for {root}: {e}")
+            with self._lock:
+                if self.root == root:
+                    # Keep scanning; the next search tries again
+                    self._maintainer = None
+            return None
+
+        with self._lock:
+            if self.root != root:
+                return None
+            self._index = index
+            self._validated_at = time.monotonic()
+        self._mark_revalidated(generation)
+        logger.info(
+            f"Search index ready for {root}: {len(index.paths)} files "
+            f"({'snapshot' if from_snapshot else 'built'} in "
+            f"{time.monotonic() - started:.2f}s)"
+        )
+        return index
+
+    def _revalidate(self, index: TrigramIndex):
+        """Walk the tree if a search or command asked for it"""
+        with self._pending_lock:
+            if not self._revalidation_requested:
+                return
+            self._revalidation_requested = False
+            generation = self._invalidations
+
+        try:
+            # Searches keep running during the stat walk; only applying its
+            # result takes the lock
+            changes = index.scan_changes()
+            with self._lock:
+                if index.apply_changes(*changes):
+                    index.compact()
+            self._validated_at = time.monotonic()
+        finally:
+            self._mark_revalidated(generation)
+
+    def _mark_revalidated(self, generation: int):
+        with self._pending_lock:
+            if self._invalidations == generation:
+                self._revalidated.set()
+
+    def _apply_written(self, index: TrigramIndex):
+        """Re-index the files written by the server's tools since the last search"""
+        with self._pending_lock:
+            dirty_paths, self._dirty_paths = self._dirty_paths, set()
+
+        changed = False
+        for relative_path in dirty_paths:
+            if is_search_file(index.root, relative_path):
+                changed |= index.update_file(relative_path)
+            else:
+                changed |= index.remove_file(relative_path)
+        if changed:
+            index.compact()
+
+    def _save_snapshot(self, index: TrigramIndex):
+        with self._lock:
+            snapshot = index.snapshot_state()
+        try:
+            index.write_snapshot(snapshot)
+        except OSError as e:
+            logger.warning(f"Failed to save search index snapshot: {e}")
+            index.unsaved_changes = True
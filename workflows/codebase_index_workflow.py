@@ -329,10 +329,12 @@ project/
                 "request_delay": 0.5,  # Increase request delay
                 "max_retries": 3,
                 "retry_delay": 1.0,
+                "enable_prompt_caching": True,
             },
             "file_analysis": {
                 "max_file_size": 1048576,  # 1MB
                 "max_content_length": 3000,
+                "content_excerpt_strategy": "structure",
                 "supported_extensions": [
                     ".py",
                     ".js",
@@ -370,6 +372,13 @@ project/
                     "data",
                     "datasets",
                 ],
+                "pre_filter_strategy": "lexical",
+                "pre_filter_top_n": 60,
+                "respect_ignore_files": True,
+                "skip_binary_files": True,
+                "skip_generated_files": True,
+                "content_sample_bytes": 8192,
+                "max_tree_entries_per_directory": 50,
             },
             "relationships": {
                 "min_confidence_score": 0.3,
@@ -380,12 +389,23 @@ project/
                     "reference": 0.6,
                     "utility": 0.4,
                 },
+                "target_candidates_top_k": 8,
             },
             "performance": {
-                "enable_concurrent_analysis": False,  # Disable concurrency to avoid API limits
+                "enable_concurrent_analysis": True,  # Adaptive window backs off on API limits
                 "max_concurrent_files": 3,
+                "enable_adaptive_concurrency": True,
+                "max_concurrent_requests": 16,
+                "concurrency_decrease_factor": 0.5,
+                "max_concurrent_repos": 4,
+                "enable_combined_analysis": True,
+                "enable_batch_analysis": True,
+                "enable_incremental_indexing": True,
+                "enable_index_journal": True,
                 "enable_content_caching": True,
-                "max_cache_size": 100,
+                "max_cache_bytes": 16777216,  # 16MB
+                "enable_persistent_cache": True,
+                "persistent_cache_path": "deepcode_lab/cache/code_indexer_cache.db",
             },
             "debug": {
                 "verbose_output": True,
@@ -396,6 +416,7 @@ project/
                 "generate_summary": True,
                 "generate_statistics": True,
                 "include_metadata": True,
+                "emit_reference_artifact": True,
                 "json_indent": 2,
             },
             "logging": {"level": "INFO", "log_to_file": False},
@@ -491,6 +512,34 @@ project/
                 self.indexer.max_content_length = file_config.get(
                     "max_content_length", self.indexer.max_content_length
                 )
+                self.indexer.content_excerpt_strategy = file_config.get(
+                    "content_excerpt_strategy", self.indexer.content_excerpt_strategy
+                )
+                self.indexer.enable_static_extraction = file_config.get(
+                    "enable_static_extraction", self.indexer.enable_static_extraction
+                )
+                self.indexer.pre_filter_strategy = file_config.get(
+                    "pre_filter_strategy", self.indexer.pre_filter_strategy
+                )
+                self.indexer.pre_filter_top_n = file_config.get(
+                    "pre_filter_top_n", self.indexer.pre_filter_top_n
+                )
+                self.indexer.respect_ignore_files = file_config.get(
+                    "respect_ignore_files", self.indexer.respect_ignore_files
+                )
+                self.indexer.skip_binary_files = file_config.get(
+                    "skip_binary_files", self.indexer.skip_binary_files
+                )
+                self.indexer.skip_generated_files = file_config.get(
+                    "skip_generated_files", self.indexer.skip_generated_files
+                )
+                self.indexer.content_sample_bytes = file_config.get(
+                    "content_sample_bytes", self.indexer.content_sample_bytes
+                )
+                self.indexer.max_tree_entries_per_directory = file_config.get(
+                    "max_tree_entries_per_directory",
+                    self.indexer.max_tree_entries_per_directory,
+                )
 
             if "llm" in indexer_config:
                 llm_config = indexer_config["llm"]
@@ -512,6 +561,12 @@ project/
                 self.indexer.retry_delay = llm_config.get(
                     "retry_delay", self.indexer.retry_delay
                 )
+                self.indexer.offline_mode = llm_config.get(
+                    "offline_mode", self.indexer.offline_mode
+                )
+                self.indexer.enable_prompt_caching = llm_config.get(
+                    "enable_prompt_caching", self.indexer.enable_prompt_caching
+                )
 
             if "relationships" in indexer_config:
                 rel_config = indexer_config["relationships"]
@@ -524,6 +579,9 @@ project/
                 self.indexer.relationship_types = rel_config.get(
                     "relationship_types", self.indexer.relationship_types
                 )
+                self.indexer.target_candidates_top_k = rel_config.get(
+                    "target_candidates_top_k", self.indexer.target_candidates_top_k
+                )
 
             if "performance" in indexer_config:
                 perf_config = indexer_config["performance"]
@@ -534,11 +592,53 @@ project/
                 self.indexer.max_concurrent_files = perf_config.get(
                     "max_concurrent_files", self.indexer.max_concurrent_files
                 )
+                self.indexer.enable_adaptive_concurrency = perf_config.get(
+                    "enable_adaptive_concurrency",
+                    self.indexer.enable_adaptive_concurrency,
+                )
+                self.indexer.max_concurrent_requests = perf_config.get(
+                    "max_concurrent_requests", self.indexer.max_concurrent_requests
+                )
+                self.indexer.concurrency_decrease_factor = perf_config.get(
+                    "concurrency_decrease_factor",
+                    self.indexer.concurrency_decrease_factor,
+                )
+                self.indexer.max_concurrent_repos = perf_config.get(
+                    "max_concurrent_repos", self.indexer.max_concurrent_repos
+                )
+                self.indexer.enable_combined_analysis = perf_config.get(
+                    "enable_combined_analysis", self.indexer.enable_combined_analysis
+                )
+                self.indexer.enable_batch_analysis = perf_config.get(
+                    "enable_batch_analysis", self.indexer.enable_batch_analysis
+                )
+                self.indexer.batch_max_file_bytes = perf_config.get(
+                    "batch_max_file_bytes", self.indexer.batch_max_file_bytes
+                )
+                self.indexer.batch_token_budget = perf_config.get(
+                    "batch_token_budget", self.indexer.batch_token_budget
+                )
+                self.indexer.batch_max_files = perf_config.get(
+                    "batch_max_files", self.indexer.batch_max_files
+                )
+                self.indexer.enable_incremental_indexing = perf_config.get(
+                    "enable_incremental_indexing",
+                    self.indexer.enable_incremental_indexing,
+                )
+                self.indexer.enable_index_journal = perf_config.get(
+                    "enable_index_journal", self.indexer.enable_index_journal
+                )
                 self.indexer.enable_content_caching = perf_config.get(
                     "enable_content_caching", self.indexer.enable_content_caching
                 )
-                self.indexer.max_cache_size = perf_config.get(
-                    "max_cache_size", self.indexer.max_cache_size
+                self.indexer.max_cache_bytes = perf_config.get(
+                    "max_cache_bytes", self.indexer.max_cache_bytes
+                )
+                self.indexer.enable_persistent_cache = perf_config.get(
+                    "enable_persistent_cache", self.indexer.enable_persistent_cache
+                )
+                self.indexer.persistent_cache_path = perf_config.get(
+                    "persistent_cache_path", self.indexer.persistent_cache_path
                 )
 
             if "debug" in indexer_config:
@@ -564,6 +664,9 @@ project/
                 self.indexer.include_metadata = output_config.get(
                     "include_metadata", self.indexer.include_metadata
                 )
+                self.indexer.emit_reference_artifact = output_config.get(
+                    "emit_reference_artifact", self.indexer.emit_reference_artifact
+                )
 
             self.logger.info("🔧 Indexer configuration completed")
             self.logger.info(f"🤖 Model provider: {self.indexer.model_provider}")